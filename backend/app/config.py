@@ -16,6 +16,10 @@ class Settings:
     prometheus_url: str = os.getenv("PROMETHEUS_URL", "http://prometheus:9090")
     docker_control_enabled: bool = os.getenv("DOCKER_CONTROL_ENABLED", "true").lower() == "true"
     file_storage_path: Path = Path(os.getenv("FILE_STORAGE_PATH", "/data/uploads"))
+    storage_mode: str = os.getenv("STORAGE_MODE", "plain").lower()
+    replication_factor: int = int(os.getenv("REPLICATION_FACTOR", "1"))
+    upload_chunk_size: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    upload_session_ttl_hours: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
     operations_db_path: Path = Path(os.getenv("OPERATIONS_DB_PATH", "/app/data/demo.db"))
     auto_scheduler_interval: int = int(os.getenv("AUTO_SCHEDULER_INTERVAL", "15"))
     scheduler_threshold: int = int(os.getenv("SCHEDULER_THRESHOLD", "5"))
@@ -26,6 +30,17 @@ class Settings:
     zk_root_path: str = os.getenv("ZK_FILE_ROOT", "/demo/files")
     zk_command_timeout: float = float(os.getenv("ZK_COMMAND_TIMEOUT", "2.5"))
     zk_command_retries: int = int(os.getenv("ZK_COMMAND_RETRIES", "2"))
+    zk_probe_timeout: float = float(os.getenv("ZK_PROBE_TIMEOUT", "0.5"))
+    node_health_base_backoff: float = float(os.getenv("NODE_HEALTH_BASE_BACKOFF", "1"))
+    node_health_max_backoff: float = float(os.getenv("NODE_HEALTH_MAX_BACKOFF", "60"))
+    file_lock_timeout: float = float(os.getenv("FILE_LOCK_TIMEOUT", "10"))
+    zk_session_timeout: float = float(os.getenv("ZK_SESSION_TIMEOUT", "10"))
+    zk_pending_writes_limit: int = int(os.getenv("ZK_PENDING_WRITES_LIMIT", "5000"))
+    zk_bulk_concurrency: int = int(os.getenv("ZK_BULK_CONCURRENCY", "256"))
+    reconcile_interval: int = int(os.getenv("RECONCILE_INTERVAL", "300"))
+    reconcile_batch_size: int = int(os.getenv("RECONCILE_BATCH_SIZE", "500"))
+    reconcile_rate: float = float(os.getenv("RECONCILE_RATE", "2000"))
+    reconcile_grace_seconds: int = int(os.getenv("RECONCILE_GRACE_SECONDS", "300"))
     auto_scheduler_enabled: bool = os.getenv("AUTO_SCHEDULER_ENABLED", "true").lower() == "true"
     demo_workload_enabled: bool = os.getenv("DEMO_WORKLOAD_ENABLED", "false").lower() == "true"
     demo_workload_interval: int = int(os.getenv("DEMO_WORKLOAD_INTERVAL", "20"))
@@ -33,19 +48,47 @@ class Settings:
     demo_workload_max_files: int = int(os.getenv("DEMO_WORKLOAD_MAX_FILES", "18"))
     demo_workload_file_size_kb: int = int(os.getenv("DEMO_WORKLOAD_FILE_SIZE_KB", "128"))
     demo_workload_extra_clients: int = int(os.getenv("DEMO_WORKLOAD_EXTRA_CLIENTS", "2"))
+    demo_payload_mode: str = os.getenv("DEMO_PAYLOAD_MODE", "random").lower()
     demo_workload_max_znodes: int = int(os.getenv("DEMO_WORKLOAD_MAX_ZNODES", "24"))
     demo_workload_max_tasks: int = int(os.getenv("DEMO_WORKLOAD_MAX_TASKS", "50"))
+    task_queue_enabled: bool = os.getenv("TASK_QUEUE_ENABLED", "false").lower() == "true"
+    task_queue_concurrency: int = int(os.getenv("TASK_QUEUE_CONCURRENCY", "2"))
+    task_queue_heartbeat_interval: float = float(os.getenv("TASK_QUEUE_HEARTBEAT_INTERVAL", "2"))
+    task_queue_lease_timeout: float = float(os.getenv("TASK_QUEUE_LEASE_TIMEOUT", "15"))
+    task_queue_max_retries: int = int(os.getenv("TASK_QUEUE_MAX_RETRIES", "3"))
+    job_max_running: int = int(os.getenv("JOB_MAX_RUNNING", "2"))
+    job_max_queued: int = int(os.getenv("JOB_MAX_QUEUED", "20"))
+    job_history: int = int(os.getenv("JOB_HISTORY", "50"))
+    profile_mode: str = os.getenv("PROFILE_MODE", "off").lower()
+    profile_threshold_ms: float = float(os.getenv("PROFILE_THRESHOLD_MS", "500"))
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "1"))
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    profile_store_size: int = int(os.getenv("PROFILE_STORE_SIZE", "20"))
+    cluster_history_capacity: int = int(os.getenv("CLUSTER_HISTORY_CAPACITY", "2880"))
+    cluster_history_interval: float = float(os.getenv("CLUSTER_HISTORY_INTERVAL", "5"))
+    prometheus_multiproc_dir: str = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+    # Multi-worker deployments elect one owner for the scheduler, demo workload and log indexer.
+    leader_election_enabled: bool = os.getenv(
+        "LEADER_ELECTION_ENABLED", "true" if os.getenv("PROMETHEUS_MULTIPROC_DIR") else "false"
+    ).lower() == "true"
     elasticsearch_url: str = os.getenv("ELASTICSEARCH_URL", "")
     logs_directory: Path = Path(os.getenv("BACKEND_LOG_DIR", "/app/logs"))
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_index_path: Path = Path(os.getenv("LOG_INDEX_PATH", "/app/data/log_index.db"))
+    log_index_interval: int = int(os.getenv("LOG_INDEX_INTERVAL", "5"))
+    log_index_retention_days: int = int(os.getenv("LOG_INDEX_RETENTION_DAYS", "7"))
 
     zk_nodes: List[str] = field(init=False)
 
     def __post_init__(self) -> None:
         self.zk_nodes = _split_nodes(self.zk_nodes_raw)
+
+    def ensure_directories(self) -> None:
         self.file_storage_path.mkdir(parents=True, exist_ok=True)
         self.operations_db_path.parent.mkdir(parents=True, exist_ok=True)
         self.operations_log_path.parent.mkdir(parents=True, exist_ok=True)
         self.logs_directory.mkdir(parents=True, exist_ok=True)
+        self.log_index_path.parent.mkdir(parents=True, exist_ok=True)
         # ensure per-node directories exist
         for node in self.zk_nodes:
             host = node.split(":")[0]
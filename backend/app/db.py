@@ -6,7 +6,7 @@ import sqlite3
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from .config import get_settings
 
@@ -15,6 +15,8 @@ logger = logging.getLogger(__name__)
 
 SETTINGS = get_settings()
 DB_PATH = SETTINGS.operations_db_path
+OPERATION_FILTERS = ("action", "node", "actor", "status")
+MIGRATION_ACTIONS = ("auto_migrate", "demo_migrate")
 
 
 @contextmanager
@@ -45,6 +47,12 @@ def init_db() -> None:
             )
             """
         )
+        # Migrations store where the file came from; `node` is where it went.
+        _ensure_column(conn, "operations", "source_node", "TEXT")
+        # One (column, timestamp) index per audit filter, newest-first scans included.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_operations_timestamp ON operations(timestamp)")
+        for column in OPERATION_FILTERS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_operations_{column}_timestamp ON operations({column}, timestamp)")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS files (
@@ -59,6 +67,67 @@ def init_db() -> None:
             )
             """
         )
+        _ensure_column(conn, "files", "content_hash", "TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_uuid ON files(uuid)")
+        # Covering index for the per-node counts read on every metrics refresh.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_node ON files(node)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                node TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                path TEXT NOT NULL UNIQUE,
+                refcount INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (node, content_hash)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_replicas (
+                file_id INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                lag_ms REAL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (file_id, node)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_file_replicas_node ON file_replicas(node)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                total_chunks INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                status TEXT NOT NULL,
+                file_id INTEGER,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_chunks (
+                session_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                received_at TEXT NOT NULL,
+                PRIMARY KEY (session_id, idx)
+            )
+            """
+        )
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS tasks (
@@ -79,6 +148,9 @@ def init_db() -> None:
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at)"
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_status_updated_at ON tasks(status, updated_at)"
+        )
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS node_states (
@@ -91,6 +163,12 @@ def init_db() -> None:
         )
 
 
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
 def record_operation(
     *,
     action: str,
@@ -100,6 +178,7 @@ def record_operation(
     before_metrics: Optional[Dict[str, Any]] = None,
     after_metrics: Optional[Dict[str, Any]] = None,
     details: Optional[str] = None,
+    source_node: Optional[str] = None,
 ) -> None:
     entry = (
         datetime.utcnow().isoformat(),
@@ -110,12 +189,13 @@ def record_operation(
         json.dumps(after_metrics) if after_metrics else None,
         status,
         details,
+        source_node,
     )
     with get_conn() as conn:
         conn.execute(
             """
-            INSERT INTO operations (timestamp, actor, action, node, before_metrics, after_metrics, status, details)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO operations (timestamp, actor, action, node, before_metrics, after_metrics, status, details, source_node)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             entry,
         )
@@ -127,6 +207,7 @@ def record_operation(
             "actor": actor,
             "action": action,
             "node": node,
+            "source_node": source_node,
             "status": status,
             "details": details,
             "message": details or action,
@@ -139,15 +220,98 @@ def record_operation(
         logger.debug("Failed to forward operation to Elasticsearch: %s", exc)
 
 
-def list_operations(limit: int = 100) -> List[Dict[str, Any]]:
+def _operation_filters(
+    filters: Dict[str, Optional[Sequence[str]]], start: Optional[datetime], end: Optional[datetime]
+) -> Tuple[str, List[Any]]:
+    """WHERE clause for the audit filters; each filter matches any of its values.
+
+    Timestamps are stored as naive UTC ISO strings, which sort lexically, so the
+    range is compared as text and stays on the (column, timestamp) indexes.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for column in OPERATION_FILTERS:
+        values = filters.get(column)
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start.isoformat())
+    if end is not None:
+        clauses.append("timestamp <= ?")
+        params.append(end.isoformat())
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def list_operations(
+    limit: int = 100,
+    *,
+    action: Optional[Sequence[str]] = None,
+    node: Optional[Sequence[str]] = None,
+    actor: Optional[Sequence[str]] = None,
+    status: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    where, params = _operation_filters(
+        {"action": action, "node": node, "actor": actor, "status": status}, start, end
+    )
     with get_conn() as conn:
         rows = conn.execute(
-            "SELECT * FROM operations ORDER BY datetime(timestamp) DESC LIMIT ?",
-            (limit,),
+            f"SELECT * FROM operations{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*params, limit),
         ).fetchall()
     return [dict(row) for row in rows]
 
 
+def operation_stats(
+    *,
+    bucket_seconds: int,
+    start: datetime,
+    end: datetime,
+    action: Optional[Sequence[str]] = None,
+    node: Optional[Sequence[str]] = None,
+    actor: Optional[Sequence[str]] = None,
+    status: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """Counts per time bucket by action and status, plus migrations per node pair."""
+    where, params = _operation_filters(
+        {"action": action, "node": node, "actor": actor, "status": status}, start, end
+    )
+    with get_conn() as conn:
+        buckets = conn.execute(
+            f"""
+            SELECT CAST(strftime('%s', timestamp) AS INTEGER) / ? * ? AS bucket, action, status, COUNT(*) AS count
+            FROM operations{where}
+            GROUP BY bucket, action, status
+            ORDER BY bucket, action, status
+            """,
+            (bucket_seconds, bucket_seconds, *params),
+        ).fetchall()
+        migration_where = f"{where} AND" if where else " WHERE"
+        migrations = conn.execute(
+            f"""
+            SELECT source_node, node, COUNT(*) AS count
+            FROM operations{migration_where} action IN ({', '.join('?' for _ in MIGRATION_ACTIONS)})
+            GROUP BY source_node, node
+            ORDER BY count DESC
+            """,
+            (*params, *MIGRATION_ACTIONS),
+        ).fetchall()
+    series = [dict(row) for row in buckets]
+    totals: Dict[str, Dict[str, int]] = {}
+    for row in series:
+        by_status = totals.setdefault(row["action"], {})
+        by_status[row["status"]] = by_status.get(row["status"], 0) + row["count"]
+    return {
+        "series": series,
+        "totals": totals,
+        # Rows recorded before source_node existed report a null source.
+        "migrations": [{"source": row["source_node"], "target": row["node"], "count": row["count"]} for row in migrations],
+    }
+
+
 def create_file_record(
     *,
     uuid: str,
@@ -156,6 +320,7 @@ def create_file_record(
     node: str,
     path: str,
     history: Optional[List[Dict[str, Any]]] = None,
+    content_hash: Optional[str] = None,
 ) -> int:
     history = history or []
     record = (
@@ -166,12 +331,13 @@ def create_file_record(
         path,
         datetime.utcnow().isoformat(),
         json.dumps(history),
+        content_hash,
     )
     with get_conn() as conn:
         cursor = conn.execute(
             """
-            INSERT INTO files (uuid, filename, size_bytes, node, path, created_at, history)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO files (uuid, filename, size_bytes, node, path, created_at, history, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
             record,
         )
@@ -206,6 +372,14 @@ def get_files() -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+def count_files_by_node() -> Dict[str, int]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT node, COUNT(*) AS total FROM files GROUP BY node"
+        ).fetchall()
+    return {row["node"]: int(row["total"]) for row in rows}
+
+
 def get_file(file_id: int) -> Optional[Dict[str, Any]]:
     with get_conn() as conn:
         row = conn.execute(
@@ -215,9 +389,109 @@ def get_file(file_id: int) -> Optional[Dict[str, Any]]:
     return dict(row) if row else None
 
 
+def get_files_after(last_id: int, limit: int) -> List[Dict[str, Any]]:
+    """Keyset page of files ordered by id, for incremental scans."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, uuid, filename, size_bytes, node, path, history, content_hash FROM files WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_file_uuids(uuids: Iterable[str]) -> Set[str]:
+    uuids = list(uuids)
+    found: Set[str] = set()
+    with get_conn() as conn:
+        for start in range(0, len(uuids), 500):
+            batch = uuids[start:start + 500]
+            placeholders = ",".join("?" for _ in batch)
+            found.update(row["uuid"] for row in conn.execute(f"SELECT uuid FROM files WHERE uuid IN ({placeholders})", batch))
+    return found
+
+
+def is_path_referenced(path: str) -> bool:
+    """Whether any file or replica record points at a path on disk."""
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM files WHERE path = ? UNION ALL SELECT 1 FROM file_replicas WHERE path = ? LIMIT 1",
+            (path, path),
+        ).fetchone()
+    return row is not None
+
+
 def delete_file_record(file_id: int) -> None:
     with get_conn() as conn:
         conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        conn.execute("DELETE FROM file_replicas WHERE file_id = ?", (file_id,))
+
+
+def add_file_replicas(file_id: int, replicas: List[Dict[str, Any]]) -> None:
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO file_replicas (file_id, node, path, status, lag_ms, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id, node) DO UPDATE SET
+                path=excluded.path,
+                status=excluded.status,
+                lag_ms=excluded.lag_ms
+            """,
+            [
+                (file_id, item["node"], item["path"], item["status"], item.get("lag_ms"), now)
+                for item in replicas
+            ],
+        )
+
+
+def get_file_replicas(file_id: int) -> List[Dict[str, Any]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT node, path, status, lag_ms, created_at FROM file_replicas WHERE file_id = ?",
+            (file_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_replica_map(file_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict[str, Any]]]:
+    replica_map: Dict[int, List[Dict[str, Any]]] = {}
+    query = "SELECT file_id, node, path, status FROM file_replicas"
+    params: List[int] = []
+    if file_ids is not None:
+        params = list(file_ids)
+        if not params:
+            return replica_map
+        query += f" WHERE file_id IN ({','.join('?' for _ in params)})"
+    with get_conn() as conn:
+        for row in conn.execute(query, params):
+            replica_map.setdefault(int(row["file_id"]), []).append(
+                {"node": row["node"], "path": row["path"], "status": row["status"]}
+            )
+    return replica_map
+
+
+def delete_file_replica(file_id: int, node: str) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM file_replicas WHERE file_id = ? AND node = ?", (file_id, node))
+
+
+def count_under_replicated(replicas_required: int) -> int:
+    """Files with fewer ready secondary replicas than required."""
+    if replicas_required <= 0:
+        return 0
+    with get_conn() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) AS total FROM files f
+            WHERE (
+                SELECT COUNT(*) FROM file_replicas r
+                WHERE r.file_id = f.id AND r.status = 'ready' AND r.node != f.node
+            ) < ?
+            """,
+            (replicas_required,),
+        ).fetchone()
+    return int(row["total"])
 
 
 def get_files_by_node(node: str) -> List[Dict[str, Any]]:
@@ -229,6 +503,149 @@ def get_files_by_node(node: str) -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+def acquire_blob(*, node: str, content_hash: str, size_bytes: int, path: str) -> Tuple[str, bool]:
+    """Take a reference on a node's blob; returns its path and whether this call created it."""
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO blobs (node, content_hash, size_bytes, path, refcount, created_at)
+            VALUES (?, ?, ?, ?, 1, ?)
+            ON CONFLICT(node, content_hash) DO UPDATE SET refcount = refcount + 1
+            """,
+            (node, content_hash, size_bytes, path, datetime.utcnow().isoformat()),
+        )
+        row = conn.execute(
+            "SELECT path, refcount FROM blobs WHERE node = ? AND content_hash = ?",
+            (node, content_hash),
+        ).fetchone()
+    return row["path"], int(row["refcount"]) == 1
+
+
+def get_blob(path: str) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT * FROM blobs WHERE path = ?", (path,)).fetchone()
+    return dict(row) if row else None
+
+
+def release_blob(path: str) -> Optional[int]:
+    """Drop one reference; returns the remaining count, or None if the path is not a blob."""
+    with get_conn() as conn:
+        row = conn.execute("SELECT refcount FROM blobs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        remaining = int(row["refcount"]) - 1
+        if remaining <= 0:
+            conn.execute("DELETE FROM blobs WHERE path = ?", (path,))
+            return 0
+        conn.execute("UPDATE blobs SET refcount = ? WHERE path = ?", (remaining, path))
+        return remaining
+
+
+def get_storage_usage() -> Dict[str, Dict[str, int]]:
+    """Logical (per file record) versus physical (on disk) bytes for every node."""
+    usage: Dict[str, Dict[str, int]] = {}
+
+    def entry(node: str) -> Dict[str, int]:
+        return usage.setdefault(node, {"files": 0, "blobs": 0, "logical_bytes": 0, "physical_bytes": 0})
+
+    with get_conn() as conn:
+        for row in conn.execute("SELECT node, COUNT(*) AS files, COALESCE(SUM(size_bytes), 0) AS total FROM files GROUP BY node"):
+            item = entry(row["node"])
+            item["files"] = int(row["files"])
+            item["logical_bytes"] = int(row["total"])
+        for row in conn.execute("SELECT node, COUNT(*) AS blobs, COALESCE(SUM(size_bytes), 0) AS total FROM blobs GROUP BY node"):
+            item = entry(row["node"])
+            item["blobs"] = int(row["blobs"])
+            item["physical_bytes"] += int(row["total"])
+        for row in conn.execute(
+            """
+            SELECT node, COALESCE(SUM(size_bytes), 0) AS total FROM files
+            WHERE path NOT IN (SELECT path FROM blobs) GROUP BY node
+            """
+        ):
+            entry(row["node"])["physical_bytes"] += int(row["total"])
+    return usage
+
+
+def create_upload_session(*, session_id: str, filename: str, size_bytes: int, chunk_size: int, total_chunks: int, node: str) -> None:
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO upload_sessions (id, filename, size_bytes, chunk_size, total_chunks, node, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?)
+            """,
+            (session_id, filename, size_bytes, chunk_size, total_chunks, node, now, now),
+        )
+
+
+def get_upload_session(session_id: str) -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT * FROM upload_sessions WHERE id = ?", (session_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def update_upload_session(session_id: str, *, status: str, file_id: Optional[int] = None) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE upload_sessions SET status = ?, file_id = COALESCE(?, file_id), updated_at = ? WHERE id = ?",
+            (status, file_id, datetime.utcnow().isoformat(), session_id),
+        )
+
+
+def claim_upload_session(session_id: str) -> bool:
+    """Move an open session to "assembling"; False if another call got there first."""
+    with get_conn() as conn:
+        cursor = conn.execute(
+            "UPDATE upload_sessions SET status = 'assembling', updated_at = ? WHERE id = ? AND status = 'open'",
+            (datetime.utcnow().isoformat(), session_id),
+        )
+    return cursor.rowcount == 1
+
+
+def record_upload_chunk(session_id: str, index: int, size_bytes: int, checksum: str) -> None:
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO upload_chunks (session_id, idx, size_bytes, checksum, received_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(session_id, idx) DO UPDATE SET
+                size_bytes=excluded.size_bytes,
+                checksum=excluded.checksum,
+                received_at=excluded.received_at
+            """,
+            (session_id, index, size_bytes, checksum, now),
+        )
+        conn.execute("UPDATE upload_sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+
+
+def list_upload_chunks(session_id: str) -> List[Dict[str, Any]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT idx, size_bytes, checksum FROM upload_chunks WHERE session_id = ? ORDER BY idx",
+            (session_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def delete_upload_session(session_id: str) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM upload_chunks WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM upload_sessions WHERE id = ?", (session_id,))
+
+
+def list_stale_upload_sessions(before: str) -> List[Dict[str, Any]]:
+    # "assembling" is included so a worker that died mid-assembly does not pin the
+    # session, "failed" so the chunks of a session that cannot be retried go away.
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM upload_sessions WHERE status IN ('open', 'assembling', 'failed') AND updated_at < ?",
+            (before,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
 def upsert_task_record(*, task_id: str, node: Optional[str], status: str, payload: Optional[Dict[str, Any]] = None, details: Optional[str] = None) -> None:
     now = datetime.utcnow().isoformat()
     with get_conn() as conn:
@@ -260,23 +677,101 @@ def delete_task(task_id: str) -> None:
         conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
 
 
-def list_tasks(limit: int = 100) -> List[Dict[str, Any]]:
+def _task_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    record = dict(row)
+    payload = record.get("payload")
+    if isinstance(payload, str):
+        try:
+            record["payload"] = json.loads(payload)
+        except json.JSONDecodeError:
+            record["payload"] = None
+    return record
+
+
+def list_tasks(limit: int = 100, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    if status is not None:
+        return list_tasks_by_status(status, limit=limit)
     with get_conn() as conn:
         rows = conn.execute(
-            "SELECT * FROM tasks ORDER BY datetime(updated_at) DESC LIMIT ?",
+            "SELECT * FROM tasks ORDER BY updated_at DESC LIMIT ?",
             (limit,),
         ).fetchall()
-    tasks = []
-    for row in rows:
-        record = dict(row)
-        payload = record.get("payload")
-        if isinstance(payload, str):
-            try:
-                record["payload"] = json.loads(payload)
-            except json.JSONDecodeError:
-                record["payload"] = None
-        tasks.append(record)
-    return tasks
+    return [_task_from_row(row) for row in rows]
+
+
+def list_tasks_by_status(status: str, limit: int = 100, *, oldest_first: bool = False) -> List[Dict[str, Any]]:
+    """List tasks in one state, read through idx_tasks_status_updated_at."""
+    order = "ASC" if oldest_first else "DESC"
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM tasks WHERE status = ? ORDER BY updated_at {order} LIMIT ?",
+            (status, limit),
+        ).fetchall()
+    return [_task_from_row(row) for row in rows]
+
+
+def count_tasks_by_status() -> Dict[str, int]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS total FROM tasks GROUP BY status"
+        ).fetchall()
+    return {row["status"]: int(row["total"]) for row in rows}
+
+
+def task_status_summary() -> Dict[str, Dict[str, Any]]:
+    """Per-status counts and nearest-rank percentiles of seconds since the last state change."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            WITH ranked AS (
+                SELECT
+                    status,
+                    (julianday('now') - julianday(updated_at)) * 86400.0 AS age,
+                    ROW_NUMBER() OVER (PARTITION BY status ORDER BY updated_at DESC) AS rn,
+                    COUNT(*) OVER (PARTITION BY status) AS cnt
+                FROM tasks
+            )
+            SELECT
+                status,
+                MAX(cnt) AS total,
+                MAX(CASE WHEN rn = (cnt * 50 + 99) / 100 THEN age END) AS p50,
+                MAX(CASE WHEN rn = (cnt * 90 + 99) / 100 THEN age END) AS p90,
+                MAX(CASE WHEN rn = (cnt * 99 + 99) / 100 THEN age END) AS p99,
+                MAX(age) AS max_age
+            FROM ranked
+            GROUP BY status
+            """
+        ).fetchall()
+    return {
+        row["status"]: {
+            "count": int(row["total"]),
+            "age_seconds": {
+                "p50": round(row["p50"] or 0.0, 3),
+                "p90": round(row["p90"] or 0.0, 3),
+                "p99": round(row["p99"] or 0.0, 3),
+                "max": round(row["max_age"] or 0.0, 3),
+            },
+        }
+        for row in rows
+    }
+
+
+def delete_oldest_tasks(statuses: Iterable[str], limit: int) -> int:
+    statuses = list(statuses)
+    if limit <= 0 or not statuses:
+        return 0
+    placeholders = ", ".join("?" for _ in statuses)
+    with get_conn() as conn:
+        cursor = conn.execute(
+            f"""
+            DELETE FROM tasks WHERE id IN (
+                SELECT id FROM tasks WHERE status IN ({placeholders})
+                ORDER BY updated_at ASC LIMIT ?
+            )
+            """,
+            (*statuses, limit),
+        )
+        return cursor.rowcount or 0
 
 
 def set_node_state(node: str, *, drained: bool, reason: Optional[str] = None) -> None:
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import logging
 from functools import lru_cache
-from typing import Optional
-
-import docker
-from docker.models.containers import Container
+from typing import TYPE_CHECKING, Optional
 
 from .config import get_settings
 
+if TYPE_CHECKING:
+    import docker
+    from docker.models.containers import Container
+
 logger = logging.getLogger(__name__)
 SETTINGS = get_settings()
 
@@ -17,6 +18,9 @@ SETTINGS = get_settings()
 def _get_client() -> docker.DockerClient:
     if not SETTINGS.docker_control_enabled:
         raise RuntimeError("Docker control is disabled by configuration")
+    # Imported on first use; the docker SDK is only needed for container control.
+    import docker
+
     try:
         return docker.from_env()
     except PermissionError as exc:
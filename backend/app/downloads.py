@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+from uuid import uuid4
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+ByteRange = Tuple[int, int]
+CompletionCallback = Callable[[int, float, int], None]
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """Parse a ``bytes=`` Range header into inclusive (start, end) pairs.
+
+    Returns None when the header is absent or malformed (serve the full body) and
+    raises RangeNotSatisfiable when it is well-formed but no range overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if start > end and last:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return _coalesce(ranges)
+
+
+def _coalesce(ranges: List[ByteRange]) -> List[ByteRange]:
+    merged: List[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def make_etag(record: Dict[str, Any], stat: os.stat_result) -> str:
+    """Strong validator: the content hash when known, else size and mtime."""
+    content_hash = record.get("content_hash")
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored.
+
+    If-Range needs strong comparison instead; see _if_range_allows.
+    """
+    candidates = [_weak(item.strip()) for item in header.split(",")]
+    return "*" in candidates or _weak(etag) in candidates
+
+
+def _not_modified_since(header: Optional[str], mtime: float) -> bool:
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+def _if_range_allows(header: Optional[str], etag: str, last_modified: str) -> bool:
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag
+    return header == last_modified
+
+
+def build_download_response(
+    request: Request,
+    record: Dict[str, Any],
+    path: Path,
+    *,
+    on_complete: Optional[CompletionCallback] = None,
+) -> Response:
+    stat = path.stat()
+    size = stat.st_size
+    etag = make_etag(record, stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        "content-disposition": _content_disposition(record.get("filename") or path.name),
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if (if_none_match and _etag_matches(if_none_match, etag)) or (
+        not if_none_match and _not_modified_since(request.headers.get("if-modified-since"), stat.st_mtime)
+    ):
+        return Response(status_code=304, headers={key: headers[key] for key in ("etag", "last-modified")})
+
+    media_type = guess_type(record.get("filename") or path.name)[0] or "application/octet-stream"
+    ranges: Optional[List[ByteRange]] = None
+    if _if_range_allows(request.headers.get("if-range"), etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+    return RangeFileResponse(
+        path,
+        size=size,
+        ranges=ranges,
+        media_type=media_type,
+        headers=headers,
+        on_complete=on_complete,
+    )
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class RangeFileResponse(Response):
+    """Stream a file, a single byte range, or a multipart/byteranges body.
+
+    When the ASGI server advertises the zero-copy send extension the kernel copies
+    file pages straight to the socket (sendfile); otherwise chunks are read in a
+    worker thread as Starlette's FileResponse does.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        size: int,
+        ranges: Optional[List[ByteRange]],
+        media_type: str,
+        headers: Dict[str, str],
+        on_complete: Optional[CompletionCallback] = None,
+    ) -> None:
+        self.path = path
+        self.on_complete = on_complete
+        self.parts: List[Tuple[bytes, int, int]] = []
+        self.trailer = b""
+        headers = dict(headers)
+        if not ranges:
+            self.parts = [(b"", 0, size)]
+            status_code = 200
+            content_length = size
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts = [(b"", start, end - start + 1)]
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            status_code = 206
+            content_length = end - start + 1
+        else:
+            boundary = uuid4().hex
+            for start, end in ranges:
+                part_header = (
+                    f"--{boundary}\r\ncontent-type: {media_type}\r\n"
+                    f"content-range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                # Every part after the first is preceded by the CRLF that ends the previous body.
+                if self.parts:
+                    part_header = b"\r\n" + part_header
+                self.parts.append((part_header, start, end - start + 1))
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            media_type = f"multipart/byteranges; boundary={boundary}"
+            status_code = 206
+            content_length = sum(len(header) + length for header, _, length in self.parts) + len(self.trailer)
+        headers["content-length"] = str(content_length)
+        super().__init__(content=None, status_code=status_code, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        started = time.perf_counter()
+        sent = 0
+        # on_complete runs for every response, HEAD included, so callers can pair it
+        # with whatever they counted when building the response.
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope.get("method") == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                with open(self.path, "rb") as handle:
+                    sent = await self._send_zerocopy(handle, send)
+            else:
+                async with await anyio.open_file(self.path, mode="rb") as handle:
+                    sent = await self._send_chunked(handle, send)
+        finally:
+            if self.on_complete is not None:
+                self.on_complete(sent, time.perf_counter() - started, self.status_code)
+
+    async def _send_zerocopy(self, handle: Any, send: Send) -> int:
+        sent = 0
+        for index, (part_header, offset, count) in enumerate(self.parts):
+            if part_header:
+                await send({"type": "http.response.body", "body": part_header, "more_body": True})
+            more = bool(self.trailer) or index < len(self.parts) - 1
+            await send({"type": ZEROCOPY_EXTENSION, "file": handle, "offset": offset, "count": count, "more_body": more})
+            sent += count
+        if self.trailer:
+            await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+        return sent
+
+    async def _send_chunked(self, handle: Any, send: Send) -> int:
+        sent = 0
+        for part_header, offset, count in self.parts:
+            if part_header:
+                await send({"type": "http.response.body", "body": part_header, "more_body": True})
+            await handle.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                sent += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+        return sent
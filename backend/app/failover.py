@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import docker_control, stats, zookeeper_utils
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+SERVING_MODES = {"leader", "follower", "observer", "standalone"}
+# Timing envelope of the in-process stand-in, roughly what a 3-node ensemble shows.
+LOCAL_ELECTION_MS = (150, 600)
+LOCAL_REJOIN_MS = (400, 1500)
+
+
+def parse_srvr_mode(output: str) -> str:
+    for line in output.splitlines():
+        if line.startswith("Mode:"):
+            return line.split(":", 1)[1].strip().lower()
+    # "This ZooKeeper instance is not currently serving requests"
+    return "looking"
+
+
+class DockerEnsemble:
+    """Stops and starts real ZooKeeper containers and reads their role with srvr."""
+
+    def __init__(self, nodes: List[str]) -> None:
+        self.nodes = nodes
+
+    def probe(self, node: str) -> str:
+        host, port = node.split(":", 1)
+        try:
+            output = zookeeper_utils.send_four_letter_cmd(host, int(port), "srvr", timeout=SETTINGS.zk_probe_timeout)
+        except Exception:
+            return "down"
+        return parse_srvr_mode(output)
+
+    def stop(self, node: str) -> None:
+        docker_control.stop_container(node.split(":", 1)[0])
+        zookeeper_utils.NODE_HEALTH.mark_down(node, "stopped by failover benchmark")
+
+    def start(self, node: str) -> None:
+        docker_control.start_container(node.split(":", 1)[0])
+        zookeeper_utils.NODE_HEALTH.reset_backoff(node)
+
+
+class LocalEnsemble:
+    """In-process stand-in that elects a new leader after a randomised delay."""
+
+    def __init__(self, nodes: List[str], *, seed: Optional[int] = None) -> None:
+        self.nodes = nodes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stopped: Dict[str, float] = {}
+        self._rejoin_at: Dict[str, float] = {}
+        self._leader: Optional[str] = nodes[0] if nodes else None
+        self._election_at = 0.0
+
+    def probe(self, node: str) -> str:
+        now = time.perf_counter()
+        with self._lock:
+            if node in self._stopped:
+                return "down"
+            if self._leader is None and now >= self._election_at:
+                live = [item for item in self.nodes if item not in self._stopped]
+                if len(live) * 2 > len(self.nodes):
+                    self._leader = self._random.choice(live)
+            if now < self._rejoin_at.get(node, 0.0) or self._leader is None:
+                return "looking"
+            return "leader" if node == self._leader else "follower"
+
+    def stop(self, node: str) -> None:
+        with self._lock:
+            self._stopped[node] = time.perf_counter()
+            if node == self._leader:
+                self._leader = None
+                self._election_at = time.perf_counter() + self._random.uniform(*LOCAL_ELECTION_MS) / 1000.0
+
+    def start(self, node: str) -> None:
+        with self._lock:
+            self._stopped.pop(node, None)
+            self._rejoin_at[node] = time.perf_counter() + self._random.uniform(*LOCAL_REJOIN_MS) / 1000.0
+
+
+def _poll(ensemble: Any, pool: ThreadPoolExecutor, nodes: List[str]) -> Dict[str, str]:
+    return dict(zip(nodes, pool.map(ensemble.probe, nodes)))
+
+
+def _wait_for(ensemble: Any, pool: ThreadPoolExecutor, nodes: List[str], condition: Any, *, interval: float, timeout: float) -> Optional[Dict[str, str]]:
+    deadline = time.perf_counter() + timeout
+    while True:
+        roles = _poll(ensemble, pool, nodes)
+        if condition(roles):
+            return roles
+        if time.perf_counter() >= deadline:
+            return None
+        time.sleep(interval)
+
+
+def _single_leader(roles: Dict[str, str]) -> bool:
+    return sum(1 for role in roles.values() if role == "leader") == 1
+
+
+def _full_quorum(roles: Dict[str, str]) -> bool:
+    return _single_leader(roles) and all(role in SERVING_MODES for role in roles.values())
+
+
+def run_failover_benchmark(
+    *,
+    repeats: int,
+    local: bool = False,
+    poll_interval_ms: int = 20,
+    timeout: float = 60.0,
+    settle_seconds: float = 2.0,
+    nodes: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Stop the leader ``repeats`` times, timing re-election and full quorum recovery.
+
+    ``new_leader_ms`` runs from the moment the stop call returns until another node
+    reports Mode: leader; ``full_quorum_ms`` runs from restarting the old leader
+    until every node is serving again under a single leader.
+    """
+    nodes = list(nodes or SETTINGS.zk_nodes)
+    ensemble: Any = LocalEnsemble(nodes) if local else DockerEnsemble(nodes)
+    interval = poll_interval_ms / 1000.0
+    rounds: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=len(nodes), thread_name_prefix="failover-probe") as pool:
+        for attempt in range(1, repeats + 1):
+            roles = _wait_for(ensemble, pool, nodes, _full_quorum, interval=interval, timeout=timeout)
+            if roles is None:
+                rounds.append({"round": attempt, "status": "error", "error": "ensemble never reached full quorum"})
+                break
+            leader = next(node for node, role in roles.items() if role == "leader")
+            remaining = [node for node in nodes if node != leader]
+            result: Dict[str, Any] = {"round": attempt, "old_leader": leader, "status": "success"}
+            began = time.perf_counter()
+            ensemble.stop(leader)
+            stopped = time.perf_counter()
+            result["stop_ms"] = round((stopped - began) * 1000, 2)
+            elected = _wait_for(ensemble, pool, remaining, _single_leader, interval=interval, timeout=timeout)
+            if elected is None:
+                result.update(status="error", error="no new leader before timeout")
+            else:
+                result["new_leader"] = next(node for node, role in elected.items() if role == "leader")
+                result["new_leader_ms"] = round((time.perf_counter() - stopped) * 1000, 2)
+            restarted = time.perf_counter()
+            ensemble.start(leader)
+            recovered = _wait_for(ensemble, pool, nodes, _full_quorum, interval=interval, timeout=timeout)
+            if recovered is None:
+                result.update(status="error", error=result.get("error") or "quorum not restored before timeout")
+            else:
+                result["full_quorum_ms"] = round((time.perf_counter() - restarted) * 1000, 2)
+            logger.info("Failover round %s: %s", attempt, result)
+            rounds.append(result)
+            if attempt < repeats and not local:
+                time.sleep(settle_seconds)
+
+    return {
+        "mode": "local" if local else "docker",
+        "repeats": repeats,
+        "completed": sum(1 for item in rounds if item["status"] == "success"),
+        "poll_interval_ms": poll_interval_ms,
+        "new_leader_ms": stats.summarize_latencies(item["new_leader_ms"] for item in rounds if "new_leader_ms" in item),
+        "full_quorum_ms": stats.summarize_latencies(item["full_quorum_ms"] for item in rounds if "full_quorum_ms" in item),
+        "rounds": rounds,
+    }
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import db, stats, zookeeper_utils
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+LOCK_ROOT = f"{SETTINGS.zk_root_path}/{zookeeper_utils.LOCKS_CHILD}"
+# Attempts when the lock's parent znode is deleted under a contender; see _acquire.
+ACQUIRE_ATTEMPTS = 3
+_IDENTIFIER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Per-purpose wait/hold histograms, read by the metrics refresh.
+LOCK_STATS: Dict[str, Dict[str, Any]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+class FileLockTimeout(RuntimeError):
+    """Another holder kept the file's lock past the caller's timeout."""
+
+
+def _stats_for(purpose: str) -> Dict[str, Any]:
+    entry = LOCK_STATS.get(purpose)
+    if entry is None:
+        entry = LOCK_STATS[purpose] = {
+            "wait": stats.LatencyHistogram(),
+            "hold": stats.LatencyHistogram(),
+            "acquired": 0,
+            "timeouts": 0,
+        }
+    return entry
+
+
+def _acquire(client: Any, path: str, identifier: str, timeout: float) -> Tuple[Any, bool]:
+    """Acquire a fresh kazoo Lock on ``path``; returns (lock, acquired).
+
+    The last holder deletes the parent znode on release, so a contender can see
+    NoNodeError between kazoo's ensure_path and its sequential create. A Lock
+    only ensures its path once, so each retry uses a new one.
+    """
+    from kazoo.exceptions import NoNodeError
+
+    deadline = time.monotonic() + timeout
+    for attempt in range(ACQUIRE_ATTEMPTS):
+        lock = client.Lock(path, identifier=identifier)
+        try:
+            if timeout <= 0:
+                return lock, lock.acquire(blocking=False)
+            return lock, lock.acquire(timeout=max(deadline - time.monotonic(), 0.001))
+        except NoNodeError:
+            if attempt == ACQUIRE_ATTEMPTS - 1 or (timeout > 0 and time.monotonic() >= deadline):
+                return lock, False
+    return lock, False
+
+
+@contextmanager
+def file_lock(file_uuid: str, *, purpose: str, timeout: Optional[float] = None) -> Iterator[None]:
+    """Hold a kazoo Lock on one file across its disk, DB and znode updates.
+
+    Raises FileLockTimeout if the lock is not acquired within ``timeout`` seconds
+    (0 means try once) and ZooKeeperUnavailable when the session is down, so a
+    file is never moved or deleted without the lock.
+    """
+    timeout = SETTINGS.file_lock_timeout if timeout is None else timeout
+    client = zookeeper_utils.get_kazoo_client()
+    path = f"{LOCK_ROOT}/{file_uuid}"
+    began = time.perf_counter()
+    lock, acquired = _acquire(client, path, f"{_IDENTIFIER}:{purpose}", timeout)
+    waited = time.perf_counter() - began
+    with _STATS_LOCK:
+        entry = _stats_for(purpose)
+        entry["wait"].record(waited * 1_000_000)
+        if acquired:
+            entry["acquired"] += 1
+        else:
+            entry["timeouts"] += 1
+    if not acquired:
+        raise FileLockTimeout(f"file {file_uuid} is locked by another {purpose} or migration")
+    held_from = time.perf_counter()
+    try:
+        yield
+    finally:
+        held = time.perf_counter() - held_from
+        try:
+            lock.release()
+        except Exception as exc:
+            logger.warning("Releasing lock for %s failed: %s", file_uuid, exc)
+        with _STATS_LOCK:
+            _stats_for(purpose)["hold"].record(held * 1_000_000)
+        # Drop the lock's parent znode unless someone is already queued on it.
+        try:
+            client.delete(path)
+        except Exception:
+            pass
+
+
+def reload_if_unchanged(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Re-read a file under its lock; None if it was moved or deleted while waiting."""
+    current = db.get_file(record["id"])
+    if current is None or current["node"] != record["node"] or current["path"] != record["path"]:
+        return None
+    return current
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _STATS_LOCK:
+        return {
+            purpose: {
+                "acquired": entry["acquired"],
+                "timeouts": entry["timeouts"],
+                "wait_ms": entry["wait"].summary_ms(),
+                "hold_ms": entry["hold"].summary_ms(),
+            }
+            for purpose, entry in LOCK_STATS.items()
+        }
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+JOB_STATES = ("queued", "running", *TERMINAL_STATES)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker once cancellation has been requested."""
+
+
+class JobQueueFull(RuntimeError):
+    """Too many jobs are already waiting for a slot."""
+
+
+class Job:
+    """One background batch; workers report progress with advance() from any thread."""
+
+    def __init__(self, kind: str, params: Dict[str, Any], total: int) -> None:
+        self.id = uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.total = total
+        self.state = "queued"
+        self.done = 0
+        self.bytes = 0
+        self.message = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def advance(self, items: int = 1, *, bytes_written: int = 0, message: Optional[str] = None) -> None:
+        with self._lock:
+            self.done += items
+            self.bytes += bytes_written
+            if message is not None:
+                self.message = message
+            self.version += 1
+
+    def set_message(self, message: str) -> None:
+        with self._lock:
+            self.message = message
+            self.version += 1
+
+    def _transition(self, state: str, **fields: Any) -> None:
+        with self._lock:
+            self.state = state
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            remaining = max(self.total - self.done, 0)
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "state": self.state,
+                "params": self.params,
+                "total": self.total,
+                "done": self.done,
+                "percent": round(100.0 * self.done / self.total, 1) if self.total else 0.0,
+                "message": self.message,
+                "cancel_requested": self._cancel.is_set(),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": round(elapsed, 3),
+                "items_per_second": round(rate, 2),
+                "mb_per_second": round(self.bytes / elapsed / (1024 * 1024), 2) if elapsed > 0 else 0.0,
+                "bytes": self.bytes,
+                "eta_seconds": round(remaining / rate, 1) if rate > 0 and not self.finished else None,
+                "result": self.result,
+                "error": self.error,
+                "version": self.version,
+            }
+
+
+class JobManager:
+    """Run bulk operations as asyncio tasks, at most ``max_running`` at a time.
+
+    Submitting returns immediately; further jobs wait for a slot, and once
+    ``max_queued`` are waiting new submissions are refused. Finished jobs are
+    kept (newest ``history`` of them) so clients can still fetch their results.
+    Jobs live in the process that accepted them.
+    """
+
+    def __init__(self, *, max_running: int, max_queued: int, history: int) -> None:
+        self.max_running = max(1, max_running)
+        self.max_queued = max_queued
+        self.history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def submit(self, kind: str, params: Dict[str, Any], total: int, runner: Callable[[Job], Awaitable[Dict[str, Any]]]) -> Job:
+        active = sum(1 for job in self._jobs.values() if not job.finished)
+        if active >= self.max_running + self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs are already waiting")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        job = Job(kind, params, total)
+        # create_task raises off the event loop; only register the job once it exists.
+        job._task = asyncio.create_task(self._run(job, runner), name=f"job-{kind}-{job.id}")
+        self._jobs[job.id] = job
+        self._trim()
+        return job
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[Dict[str, Any]]]) -> None:
+        assert self._slots is not None
+        try:
+            async with self._slots:
+                if job.cancel_requested:
+                    job._transition("cancelled", finished_at=time.time())
+                    return
+                job._transition("running", started_at=time.time())
+                result = await runner(job)
+        except (JobCancelled, asyncio.CancelledError):
+            job._transition("cancelled", finished_at=time.time())
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed: %s", job.id, job.kind, exc)
+            job._transition("failed", error=str(exc), finished_at=time.time())
+        else:
+            job._transition("succeeded", result=result, finished_at=time.time())
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [job.snapshot() for job in reversed(self._jobs.values())]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self._jobs.values():
+            counts[job.state] += 1
+        return counts
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Ask a job to stop; workers notice at their next check_cancelled()."""
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished:
+            job._cancel.set()
+            job.set_message("cancelling")
+        return job
+
+    async def follow(self, job: Job, *, interval: float = 0.25) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot whenever the job changes, ending with its final state."""
+        seen = -1
+        while True:
+            if job.version != seen:
+                seen = job.version
+                snapshot = job.snapshot()
+                yield snapshot
+                if snapshot["state"] in TERMINAL_STATES:
+                    return
+            await asyncio.sleep(interval)
+
+    def shutdown(self) -> None:
+        for job in self._jobs.values():
+            if not job.finished:
+                job._cancel.set()
+                if job._task is not None:
+                    job._task.cancel()
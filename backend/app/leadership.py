@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from . import zookeeper_utils
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+ELECTION_PATH = f"{SETTINGS.zk_root_path}/{zookeeper_utils.ELECTION_CHILD}"
+RETRY_DELAY = 2.0
+
+
+class OwnerElection:
+    """Elect a single process to own the background loops via kazoo's Election recipe.
+
+    ``on_elected`` and ``on_revoked`` are invoked from the election thread and must
+    hand work off (e.g. with ``loop.call_soon_threadsafe``) rather than block.
+    Leadership is given up as soon as the shared session is suspended or lost,
+    since the ephemeral election node may already belong to someone else.
+    """
+
+    def __init__(self, on_elected: Callable[[], None], on_revoked: Callable[[], None]) -> None:
+        self.identifier = f"{socket.gethostname()}:{os.getpid()}"
+        self.on_elected = on_elected
+        self.on_revoked = on_revoked
+        self.is_leader = False
+        self._stopping = threading.Event()
+        self._disconnected = threading.Event()
+        self._election: Any = None
+        self._thread: Optional[threading.Thread] = None
+        zookeeper_utils.add_session_listener(self._on_session_state)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="owner-election", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._disconnected.set()
+        if self._election is not None:
+            try:
+                self._election.cancel()
+            except Exception:
+                pass
+
+    def _on_session_state(self, state: str) -> None:
+        if state in ("SUSPENDED", "LOST"):
+            self._disconnected.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                client = zookeeper_utils.get_kazoo_client()
+                self._disconnected.clear()
+                self._election = client.Election(ELECTION_PATH, self.identifier)
+                # Blocks until elected, then holds leadership until _lead returns.
+                self._election.run(self._lead)
+            except Exception as exc:
+                logger.warning("Owner election unavailable, retrying: %s", exc)
+            self._stopping.wait(RETRY_DELAY)
+
+    def _lead(self) -> None:
+        if self._stopping.is_set():
+            return
+        logger.info("Elected background owner as %s", self.identifier)
+        self.is_leader = True
+        self.on_elected()
+        try:
+            self._disconnected.wait()
+        finally:
+            self.is_leader = False
+            logger.info("Giving up background ownership (%s)", self.identifier)
+            self.on_revoked()
+
+    def snapshot(self) -> Dict[str, Any]:
+        contenders = []
+        if self._election is not None:
+            try:
+                contenders = self._election.contenders()
+            except Exception as exc:
+                logger.debug("Unable to list election contenders: %s", exc)
+        return {
+            "enabled": True,
+            "identifier": self.identifier,
+            "is_leader": self.is_leader,
+            "leader": contenders[0] if contenders else None,
+            "contenders": contenders,
+        }
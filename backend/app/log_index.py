@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import db
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+INDEX_PATH = SETTINGS.log_index_path
+
+LOG_FILE_PREFIX = "backend.log"
+# Lines written before the switch to JSON logging, still present in rotated files.
+LOG_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) (\w+) (\S+) - (.*)$")
+JSON_CONTEXT_FIELDS = ("request_id", "node", "latency_ms")
+MAX_BYTES_PER_PASS = 8 * 1024 * 1024
+OPERATIONS_BATCH = 5000
+HOSTNAME = socket.gethostname()
+
+
+@contextmanager
+def get_conn() -> Iterable[sqlite3.Connection]:
+    conn = sqlite3.connect(INDEX_PATH, timeout=10)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def init_index() -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                service TEXT NOT NULL,
+                level TEXT,
+                logger TEXT,
+                host TEXT,
+                message TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_log_entries_service_ts ON log_entries(service, ts)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_log_entries_ts ON log_entries(ts)"
+        )
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS log_entries_fts USING fts5(
+                message,
+                content='log_entries',
+                content_rowid='id'
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS log_entries_ai AFTER INSERT ON log_entries BEGIN
+                INSERT INTO log_entries_fts(rowid, message) VALUES (new.id, new.message);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS log_entries_ad AFTER DELETE ON log_entries BEGIN
+                INSERT INTO log_entries_fts(log_entries_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_sources (
+                source TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+
+
+def refresh_index() -> Dict[str, int]:
+    """Ingest new backend log lines and operation records since the last pass."""
+    with get_conn() as conn:
+        positions = {row["source"]: row["position"] for row in conn.execute("SELECT source, position FROM log_sources")}
+        lines, seen_sources = _ingest_log_files(conn, positions)
+        operations = _ingest_operations(conn, positions.get("operations", 0))
+        stale = [source for source in positions if source.startswith("file:") and source not in seen_sources]
+        if stale:
+            conn.executemany("DELETE FROM log_sources WHERE source = ?", [(source,) for source in stale])
+        pruned = _prune(conn)
+    return {"lines": lines, "operations": operations, "pruned": pruned}
+
+
+def _ingest_log_files(conn: sqlite3.Connection, positions: Dict[str, int]) -> Tuple[int, set]:
+    seen: set = set()
+    total = 0
+    log_dir = SETTINGS.logs_directory
+    if not log_dir.exists():
+        return 0, seen
+    # Oldest rotated file first so rows keep roughly chronological ids.
+    candidates = sorted(
+        (path for path in log_dir.iterdir() if path.name.startswith(LOG_FILE_PREFIX) and path.is_file()),
+        key=_rotation_order,
+        reverse=True,
+    )
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        # Key by inode so a rename during rotation keeps its read position.
+        source = f"file:{stat.st_dev}:{stat.st_ino}"
+        seen.add(source)
+        position = positions.get(source, 0)
+        if stat.st_size < position:
+            position = 0
+        if stat.st_size == position:
+            continue
+        rows, new_position = _read_new_lines(path, position, stat.st_mtime)
+        if rows:
+            conn.executemany(
+                """
+                INSERT INTO log_entries (ts, timestamp, service, level, logger, host, message)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            total += len(rows)
+        _save_position(conn, source, new_position)
+    return total, seen
+
+
+def _rotation_order(path: Path) -> int:
+    suffix = path.name[len(LOG_FILE_PREFIX):].lstrip(".")
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def _read_new_lines(path: Path, position: int, fallback_ts: float) -> Tuple[List[Tuple[Any, ...]], int]:
+    with path.open("rb") as handle:
+        handle.seek(position)
+        chunk = handle.read(MAX_BYTES_PER_PASS)
+    end = chunk.rfind(b"\n")
+    if end < 0:
+        return [], position
+    chunk = chunk[: end + 1]
+    rows: List[Tuple[Any, ...]] = []
+    last_ts, last_level, last_logger = fallback_ts, None, None
+    for raw in chunk.decode("utf-8", errors="ignore").splitlines():
+        if not raw.strip():
+            continue
+        entry = _parse_json_line(raw)
+        if entry is not None:
+            last_ts = entry.get("ts") or last_ts
+            last_level, last_logger = entry.get("level"), entry.get("logger")
+            message = _json_message(entry)
+            rows.append(
+                (
+                    last_ts,
+                    datetime.fromtimestamp(last_ts, tz=timezone.utc).isoformat(),
+                    "backend",
+                    last_level,
+                    last_logger,
+                    entry.get("host") or HOSTNAME,
+                    message,
+                )
+            )
+            continue
+        match = LOG_LINE_RE.match(raw)
+        if match:
+            asctime, level, logger_name, message = match.groups()
+            try:
+                last_ts = datetime.strptime(asctime, "%Y-%m-%d %H:%M:%S,%f").timestamp()
+            except ValueError:
+                pass
+            last_level, last_logger = level, logger_name
+        else:
+            # Continuation lines (tracebacks) inherit the preceding record's context.
+            message = raw
+        rows.append(
+            (
+                last_ts,
+                datetime.fromtimestamp(last_ts, tz=timezone.utc).isoformat(),
+                "backend",
+                last_level,
+                last_logger,
+                HOSTNAME,
+                message,
+            )
+        )
+    return rows, position + len(chunk)
+
+
+def _parse_json_line(raw: str) -> Optional[Dict[str, Any]]:
+    if not raw.startswith("{"):
+        return None
+    try:
+        entry = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or "message" not in entry:
+        return None
+    if not isinstance(entry.get("ts"), (int, float)):
+        entry["ts"] = None
+    return entry
+
+
+def _json_message(entry: Dict[str, Any]) -> str:
+    # Context fields go into the message so full-text search can find a request id.
+    context = " ".join(f"{key}={entry[key]}" for key in JSON_CONTEXT_FIELDS if entry.get(key) is not None)
+    message = f"{entry['message']} [{context}]" if context else str(entry["message"])
+    if entry.get("exception"):
+        message = f"{message}\n{entry['exception']}"
+    return message
+
+
+def _ingest_operations(conn: sqlite3.Connection, last_id: int) -> int:
+    with db.get_conn() as ops_conn:
+        records = ops_conn.execute(
+            """
+            SELECT id, timestamp, actor, action, node, status, details
+            FROM operations WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (last_id, OPERATIONS_BATCH),
+        ).fetchall()
+    if not records:
+        return 0
+    rows = []
+    for record in records:
+        ts = _parse_iso(record["timestamp"])
+        message = f"{record['action']} [{record['status']}] {record['details'] or ''}".strip()
+        if record["actor"]:
+            message = f"{message} (actor={record['actor']})"
+        rows.append(
+            (
+                ts,
+                datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+                "operations",
+                "ERROR" if record["status"] == "error" else "INFO",
+                record["action"],
+                record["node"],
+                message,
+            )
+        )
+    conn.executemany(
+        """
+        INSERT INTO log_entries (ts, timestamp, service, level, logger, host, message)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    _save_position(conn, "operations", int(records[-1]["id"]))
+    return len(rows)
+
+
+def _save_position(conn: sqlite3.Connection, source: str, position: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO log_sources (source, position, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET position=excluded.position, updated_at=excluded.updated_at
+        """,
+        (source, position, datetime.utcnow().isoformat()),
+    )
+
+
+def _prune(conn: sqlite3.Connection) -> int:
+    if SETTINGS.log_index_retention_days <= 0:
+        return 0
+    cutoff = time.time() - SETTINGS.log_index_retention_days * 86400
+    cursor = conn.execute("DELETE FROM log_entries WHERE ts < ?", (cutoff,))
+    return cursor.rowcount or 0
+
+
+def _parse_iso(value: Optional[str]) -> float:
+    if not value:
+        return time.time()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return time.time()
+    return to_epoch(parsed)
+
+
+def to_epoch(value: datetime) -> float:
+    """Convert a datetime to epoch seconds; naive values are treated as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _to_fts_query(query: str) -> str:
+    terms = []
+    for token in query.split():
+        prefix = token.endswith("*")
+        token = token.rstrip("*").replace('"', '""')
+        if not token:
+            continue
+        terms.append(f'"{token}"*' if prefix else f'"{token}"')
+    return " ".join(terms)
+
+
+def search(
+    query: Optional[str] = None,
+    service: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    size: int = 50,
+) -> List[Dict[str, Any]]:
+    if not INDEX_PATH.exists():
+        return []
+    filters: List[str] = []
+    params: List[Any] = []
+    if service:
+        filters.append("e.service = ?")
+        params.append(service)
+    if start is not None:
+        filters.append("e.ts >= ?")
+        params.append(to_epoch(start))
+    if end is not None:
+        filters.append("e.ts <= ?")
+        params.append(to_epoch(end))
+
+    fts_query = _to_fts_query(query) if query else ""
+    if fts_query:
+        # Walk FTS matches newest-first by rowid so LIMIT stops the scan early.
+        where = " AND ".join(["log_entries_fts MATCH ?", *filters])
+        sql = (
+            "SELECT e.* FROM log_entries_fts JOIN log_entries e ON e.id = log_entries_fts.rowid "
+            f"WHERE {where} ORDER BY log_entries_fts.rowid DESC LIMIT ?"
+        )
+        params = [fts_query, *params]
+    else:
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        sql = f"SELECT e.* FROM log_entries e {where} ORDER BY e.ts DESC, e.id DESC LIMIT ?"
+    params.append(max(1, size))
+
+    try:
+        with get_conn() as conn:
+            rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as exc:
+        logger.warning("Local log index query failed: %s", exc)
+        return []
+    return [
+        {
+            "timestamp": row["timestamp"],
+            "message": row["message"],
+            "service": row["service"],
+            "host": row["host"],
+            "container_id": None,
+            "level": row["level"],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import shutil
+import socket
+import tempfile
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+HOSTNAME = socket.gethostname()
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s - %(message)s"
+# Record attributes that become top-level JSON fields when set via ``extra=``.
+EXTRA_FIELDS = ("node", "latency_ms", "method", "path", "status")
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the keys filebeat's ndjson parser maps as-is."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "@timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "host": HOSTNAME,
+            "pid": record.process,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Hand records to the listener thread with as little work as possible.
+
+    Only what must be captured on the calling thread happens here: the request id
+    (a contextvar), the merged message (args may be mutated later) and traceback
+    text. JSON encoding and file I/O, including rotation, run on the listener
+    thread. When the queue is full the record is dropped and counted instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Any]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware: tag every log record of a request with its id, echo
+    the id as ``X-Request-ID`` and write one access log line per API call."""
+
+    def __init__(self, app: ASGIApp, access_logger: logging.Logger) -> None:
+        self.app = app
+        self.access_logger = access_logger
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"), None
+        ) or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        began = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            path = scope["path"]
+            if path.startswith(("/api/", "/debug/")):
+                method = scope["method"]
+                latency_ms = round((time.perf_counter() - began) * 1000, 2)
+                self.access_logger.info(
+                    "%s %s -> %s in %.1f ms",
+                    method,
+                    path,
+                    status,
+                    latency_ms,
+                    extra={"method": method, "path": path, "status": status, "latency_ms": latency_ms},
+                )
+            request_id_var.reset(token)
+
+
+_PIPELINE: Dict[str, Any] = {}
+
+
+def configure(log_file: Path) -> None:
+    """Route the root logger through a queue to a JSON RotatingFileHandler.
+
+    Handlers already on the root logger (the console handler from basicConfig)
+    move behind the listener too, so the queue handler is the only thing a
+    logging call touches. Safe to call more than once; only the first call
+    installs the pipeline.
+    """
+    if _PIPELINE:
+        return
+    root_logger = logging.getLogger()
+    existing = list(root_logger.handlers)
+    for handler in existing:
+        root_logger.removeHandler(handler)
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=SETTINGS.log_queue_size)
+    file_handler = RotatingFileHandler(log_file, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, file_handler, *existing, respect_handler_level=True)
+    handler = _ContextQueueHandler(log_queue)
+    root_logger.addHandler(handler)
+    root_logger.setLevel(logging.INFO)
+    listener.start()
+    _PIPELINE.update(listener=listener, handler=handler, queue=log_queue, moved=existing)
+
+
+def shutdown() -> None:
+    """Flush queued records and detach the pipeline."""
+    listener = _PIPELINE.pop("listener", None)
+    handler = _PIPELINE.pop("handler", None)
+    moved = _PIPELINE.pop("moved", [])
+    _PIPELINE.clear()
+    root_logger = logging.getLogger()
+    if handler is not None:
+        root_logger.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+    # Hand the console back so late shutdown messages are not lost.
+    for existing in moved:
+        root_logger.addHandler(existing)
+
+
+def stats() -> Dict[str, Any]:
+    handler = _PIPELINE.get("handler")
+    log_queue = _PIPELINE.get("queue")
+    return {
+        "enabled": handler is not None,
+        "queued": log_queue.qsize() if log_queue is not None else 0,
+        "capacity": SETTINGS.log_queue_size,
+        "dropped": handler.dropped if handler is not None else 0,
+    }
+
+
+def _time_logger(bench_logger: logging.Logger, records: int, *, listener: Optional[QueueListener] = None) -> Dict[str, Any]:
+    token = request_id_var.set("bench-request")
+    began = time.perf_counter()
+    try:
+        for index in range(records):
+            bench_logger.info(
+                "GET /api/overview -> %s (%s)",
+                200,
+                index,
+                extra={"node": "zk1", "latency_ms": 12.5, "method": "GET", "path": "/api/overview", "status": 200},
+            )
+        caller_seconds = time.perf_counter() - began
+        if listener is not None:
+            listener.stop()
+        total_seconds = time.perf_counter() - began
+    finally:
+        request_id_var.reset(token)
+        for handler in [*bench_logger.parent.handlers, *(listener.handlers if listener is not None else ())]:
+            handler.close()
+    return {
+        "records": records,
+        "caller_seconds": round(caller_seconds, 4),
+        "caller_us_per_record": round(caller_seconds / records * 1_000_000, 2),
+        "total_seconds": round(total_seconds, 4),
+        "records_per_second": round(records / total_seconds, 1) if total_seconds > 0 else None,
+    }
+
+
+def _root_replica(name: str, handlers: List[logging.Handler]) -> logging.Logger:
+    """A root-like logger: the benchmark's logger propagates into it exactly as
+    application loggers propagate into the real root, without writing to it."""
+    root = logging.Logger(f"{name}-root", logging.INFO)
+    for handler in handlers:
+        root.addHandler(handler)
+    return logging.Manager(root).getLogger(f"zk_demo.{name}")
+
+
+def benchmark(*, records: int, directory: Optional[Path] = None) -> Dict[str, Any]:
+    """Compare the per-call cost of the old root logger setup with the queued one.
+
+    ``sync_root`` is what main used to install: basicConfig's console handler
+    plus a text RotatingFileHandler, both called on the logging thread.
+    ``queued_root`` is the current pipeline: only the queue handler runs on the
+    caller, the console and JSON file handlers run on the listener. Both use a
+    child logger propagating into a root-like logger, as application code does.
+    ``caller_us_per_record`` is what a request handler pays per log call, i.e. the
+    time the event loop is blocked; ``total_seconds`` for the queued variant also
+    includes draining the queue. Output goes to a scratch directory (the console
+    to a file standing in for stderr) and is removed afterwards.
+    """
+    parent = directory or SETTINGS.logs_directory
+    parent.mkdir(parents=True, exist_ok=True)
+    scratch = Path(tempfile.mkdtemp(prefix=".log-bench-", dir=parent))
+    try:
+        results: Dict[str, Dict[str, Any]] = {}
+        console = logging.StreamHandler(open(scratch / "sync-console.log", "w", encoding="utf-8"))
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        text_file = RotatingFileHandler(scratch / "sync.log", maxBytes=MAX_BYTES, backupCount=1, encoding="utf-8")
+        text_file.setFormatter(logging.Formatter(TEXT_FORMAT))
+        results["sync_root"] = _time_logger(_root_replica("sync", [console, text_file]), records)
+        console.stream.close()
+
+        # Unbounded here so the benchmark measures queueing, not dropping.
+        bench_queue: "queue.Queue[Any]" = queue.Queue()
+        console = logging.StreamHandler(open(scratch / "queued-console.log", "w", encoding="utf-8"))
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        json_file = RotatingFileHandler(scratch / "queued.log", maxBytes=MAX_BYTES, backupCount=1, encoding="utf-8")
+        json_file.setFormatter(JsonFormatter())
+        listener = QueueListener(bench_queue, json_file, console)
+        listener.start()
+        queued = _root_replica("queued", [_ContextQueueHandler(bench_queue)])
+        results["queued_root"] = _time_logger(queued, records, listener=listener)
+        console.stream.close()
+        sample = (scratch / "queued.log").read_text(encoding="utf-8").splitlines()[-1]
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    baseline = results["sync_root"]["caller_us_per_record"]
+    for result in results.values():
+        result["caller_speedup"] = round(baseline / result["caller_us_per_record"], 2) if result["caller_us_per_record"] else None
+    return {"records": records, "results": results, "sample": json.loads(sample)}
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-import httpx
-
+from . import log_index
 from .config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,8 @@ SETTINGS = get_settings()
 def index_operation_log_sync(doc: Dict[str, Any]) -> None:
     if not SETTINGS.elasticsearch_url:
         return
+    import httpx
+
     url = f"{SETTINGS.elasticsearch_url.rstrip('/')}/operations/_doc"
     try:
         with httpx.Client(timeout=2.0) as client:
@@ -23,9 +26,15 @@ def index_operation_log_sync(doc: Dict[str, Any]) -> None:
         logger.debug("Failed to write operation log to Elasticsearch: %s", exc)
 
 
-async def search_logs(query: Optional[str] = None, service: Optional[str] = None, size: int = 50) -> List[Dict[str, Any]]:
+async def search_logs(
+    query: Optional[str] = None,
+    service: Optional[str] = None,
+    size: int = 50,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
     if not SETTINGS.elasticsearch_url:
-        return []
+        return await asyncio.to_thread(log_index.search, query=query, service=service, start=start, end=end, size=size)
     payload: Dict[str, Any] = {
         "size": size,
         "sort": [{"@timestamp": {"order": "desc"}}],
@@ -38,9 +47,18 @@ async def search_logs(query: Optional[str] = None, service: Optional[str] = None
         must.append({"query_string": {"query": query}})
     if service:
         filters.append({"term": {"service.name.keyword": service}})
+    if start is not None or end is not None:
+        time_range: Dict[str, Any] = {}
+        if start is not None:
+            time_range["gte"] = start.isoformat()
+        if end is not None:
+            time_range["lte"] = end.isoformat()
+        filters.append({"range": {"@timestamp": time_range}})
     if not must and not filters:
         payload["query"] = {"match_all": {}}
 
+    import httpx
+
     url = f"{SETTINGS.elasticsearch_url.rstrip('/')}/filebeat-*,operations/_search"
 
     async with httpx.AsyncClient(timeout=5.0) as client:
@@ -1,29 +1,42 @@
 from __future__ import annotations
 
+from .startup import FirstRequestMiddleware, StartupTimer
+
+# Deliberately ahead of the other imports (so they are E402): the timer starts
+# here, and the "import" phase marked at the bottom of this module has to include
+# loading FastAPI, prometheus_client, kazoo and our own modules.
+startup_timer = StartupTimer()
+
 import asyncio
+import hashlib
 import json
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
 
 from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, generate_latest, multiprocess
 from pydantic import BaseModel, Field
 from starlette.requests import Request
 from starlette.responses import Response
 
-from . import db, docker_control, storage, zookeeper_utils
+from . import db, docker_control, downloads, failover, file_locks, jobs, leadership, log_index, log_pipeline, metrics_history, node_health, payloads, profiling, reconciler, runtime_config, scheduler_sim, storage, task_queue, watch_bench, zk_bulk, znode_load, zookeeper_utils
 from .config import Settings, get_settings
 from .logging_service import search_logs
 from .workload import DemoWorkload
 
 logger = logging.getLogger("zk_demo")
+access_logger = logging.getLogger("zk_demo.access")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
 
 app = FastAPI(title="ZooKeeper HA Demo", version="0.1.0")
@@ -37,42 +50,243 @@ app.add_middleware(
 registry = CollectorRegistry()
 settings: Settings = get_settings()
 
-log_dir = settings.logs_directory
-log_file = log_dir / "backend.log"
-file_handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5)
-file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s"))
-root_logger = logging.getLogger()
-if not any(isinstance(h, RotatingFileHandler) for h in root_logger.handlers):
-    root_logger.addHandler(file_handler)
-root_logger.setLevel(logging.INFO)
+# Read routing state: nodes seen down by the last metrics refresh and in-flight downloads.
+_down_nodes: Set[str] = set()
+cluster_history = metrics_history.ClusterHistory(settings.cluster_history_capacity)
+_active_downloads: Dict[str, int] = {}
+_downloads_lock = threading.Lock()
+# Loops owned by this process (scheduler, log indexer); see _start_owner_tasks.
+_owner_tasks: List[asyncio.Task] = []
+
+
+def _configure_file_logging() -> None:
+    # JSON lines written by a background listener; the basicConfig console handler
+    # moves behind the same listener, so log calls never write to a stream directly.
+    log_pipeline.configure(settings.logs_directory / log_index.LOG_FILE_PREFIX)
+
+
 node_up_gauge = Gauge(
     f"{settings.metrics_namespace}_node_up",
     "Whether ZooKeeper node is reachable (1) or not (0)",
     ["node"],
+    multiprocess_mode="livemostrecent",
     registry=registry,
 )
 node_latency_gauge = Gauge(
     f"{settings.metrics_namespace}_avg_latency_ms",
     "Average request latency as reported by mntr",
     ["node"],
+    multiprocess_mode="livemostrecent",
     registry=registry,
 )
 node_connections_gauge = Gauge(
     f"{settings.metrics_namespace}_connections",
     "Number of active client connections",
     ["node"],
+    multiprocess_mode="livemostrecent",
     registry=registry,
 )
 files_per_node_gauge = Gauge(
     f"{settings.metrics_namespace}_files_per_node",
     "Demo file distribution across ZooKeeper nodes",
     ["node"],
+    multiprocess_mode="livemostrecent",
     registry=registry,
 )
 task_status_gauge = Gauge(
     f"{settings.metrics_namespace}_tasks_total",
     "Synthetic task counts by status",
     ["status"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+download_bytes_counter = Counter(
+    f"{settings.metrics_namespace}_download_bytes",
+    "Bytes served by file downloads per storage node",
+    ["node"],
+    registry=registry,
+)
+download_requests_counter = Counter(
+    f"{settings.metrics_namespace}_download_requests",
+    "File download responses per storage node and HTTP status",
+    ["node", "status"],
+    registry=registry,
+)
+download_throughput_gauge = Gauge(
+    f"{settings.metrics_namespace}_download_throughput_bytes_per_second",
+    "Throughput of the most recent completed download per storage node",
+    ["node"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+active_downloads_gauge = Gauge(
+    f"{settings.metrics_namespace}_active_downloads",
+    "In-flight file downloads per serving node",
+    ["node"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+replication_lag_gauge = Gauge(
+    f"{settings.metrics_namespace}_replication_lag_ms",
+    "Delay between the primary write and the most recent replica becoming ready",
+    ["node"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+replication_throughput_gauge = Gauge(
+    f"{settings.metrics_namespace}_replication_throughput_bytes_per_second",
+    "Average replica write throughput per target node",
+    ["node"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+under_replicated_gauge = Gauge(
+    f"{settings.metrics_namespace}_under_replicated_files",
+    "Files with fewer ready replicas than REPLICATION_FACTOR requires",
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+stored_bytes_gauge = Gauge(
+    f"{settings.metrics_namespace}_stored_bytes",
+    "Stored bytes per node, logical (per file record) or physical (on disk)",
+    ["node", "kind"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+dedup_ratio_gauge = Gauge(
+    f"{settings.metrics_namespace}_dedup_ratio",
+    "Logical to physical byte ratio per node",
+    ["node"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+task_queue_depth_gauge = Gauge(
+    f"{settings.metrics_namespace}_task_queue_depth",
+    "ZooKeeper task queue depth by state",
+    ["state"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+task_queue_throughput_gauge = Gauge(
+    f"{settings.metrics_namespace}_task_queue_benchmark_tasks_per_second",
+    "Tasks completed per second in the last task queue benchmark",
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+task_queue_claim_latency_gauge = Gauge(
+    f"{settings.metrics_namespace}_task_queue_claim_latency_ms",
+    "Task claim latency percentiles from the last task queue benchmark",
+    ["quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+node_health_gauge = Gauge(
+    f"{settings.metrics_namespace}_node_health",
+    "Probe health state per ZooKeeper node (1 for the current state)",
+    ["node", "state"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+node_probe_backoff_gauge = Gauge(
+    f"{settings.metrics_namespace}_node_probe_backoff_seconds",
+    "Current probe backoff for nodes marked down",
+    ["node"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+failover_latency_gauge = Gauge(
+    f"{settings.metrics_namespace}_failover_latency_ms",
+    "Leader failover latency percentiles from the last failover benchmark",
+    ["phase", "quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+znode_load_throughput_gauge = Gauge(
+    f"{settings.metrics_namespace}_znode_load_ops_per_second",
+    "Completed operations per second in the current or last znode load run",
+    ["op"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+znode_load_latency_gauge = Gauge(
+    f"{settings.metrics_namespace}_znode_load_latency_ms",
+    "Znode load generator latency percentiles per operation",
+    ["op", "quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+watch_latency_gauge = Gauge(
+    f"{settings.metrics_namespace}_watch_notification_latency_ms",
+    "Watch notification latency percentiles from the current or last fan-out benchmark",
+    ["type", "quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+watch_armed_gauge = Gauge(
+    f"{settings.metrics_namespace}_watch_bench_armed_watches",
+    "Watches armed by the current or last fan-out benchmark",
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+file_lock_wait_gauge = Gauge(
+    f"{settings.metrics_namespace}_file_lock_wait_ms",
+    "Time spent waiting for per-file migration locks",
+    ["purpose", "quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+file_lock_hold_gauge = Gauge(
+    f"{settings.metrics_namespace}_file_lock_hold_ms",
+    "Time per-file migration locks were held",
+    ["purpose", "quantile"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+file_lock_events_gauge = Gauge(
+    f"{settings.metrics_namespace}_file_lock_events",
+    "Per-file lock acquisitions and timeouts since start",
+    ["purpose", "result"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+zk_session_state_gauge = Gauge(
+    f"{settings.metrics_namespace}_zk_session_state",
+    "Shared ZooKeeper client session state (1 for the current state)",
+    ["state"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+zk_session_events_gauge = Gauge(
+    f"{settings.metrics_namespace}_zk_session_events",
+    "Cumulative ZooKeeper session events (reconnects, suspensions, fast failures, replays)",
+    ["event"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+zk_pending_writes_gauge = Gauge(
+    f"{settings.metrics_namespace}_zk_pending_writes",
+    "Metadata writes queued for replay until the ZooKeeper session reconnects",
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+drift_items_gauge = Gauge(
+    f"{settings.metrics_namespace}_drift_items",
+    "Files, znodes and disk entries out of sync, as found by the last reconcile pass",
+    ["kind"],
+    multiprocess_mode="livemostrecent",
+    registry=registry,
+)
+jobs_gauge = Gauge(
+    f"{settings.metrics_namespace}_jobs",
+    "Background bulk jobs by state (finished jobs within the retained history)",
+    ["state"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+reconcile_last_run_gauge = Gauge(
+    f"{settings.metrics_namespace}_reconcile_last_run_timestamp",
+    "Unix time the last reconcile pass finished",
+    multiprocess_mode="livemostrecent",
     registry=registry,
 )
 
@@ -86,7 +300,7 @@ class DemoAction(BaseModel):
 class DemoStressRequest(BaseModel):
     node: str = Field(..., description="目标节点 (如 zk1)")
     files: int = Field(6, ge=1, le=100, description="要生成的示例文件数")
-    size_kb: int = Field(settings.demo_workload_file_size_kb, ge=1, le=4096, description="每个文件的大约大小 (KB)")
+    size_kb: int = Field(default_factory=lambda: settings.demo_workload_file_size_kb, ge=1, le=4096, description="每个文件的大约大小 (KB)")
     trigger_scheduler: bool = Field(False, description="生成后立即尝试执行一次调度")
 
 
@@ -97,28 +311,152 @@ class BulkUploadMode(str, Enum):
 
 class BulkUploadRequest(BaseModel):
     count: int = Field(12, ge=1, le=200, description="批量生成的文件数量")
-    size_kb: int = Field(settings.demo_workload_file_size_kb, ge=1, le=4096, description="每个文件的目标大小 (KB)")
+    size_kb: int = Field(default_factory=lambda: settings.demo_workload_file_size_kb, ge=1, le=4096, description="每个文件的目标大小 (KB)")
     mode: BulkUploadMode = Field(BulkUploadMode.AUTO, description="auto=按负载均衡分配，pin=集中到指定节点")
     target_node: Optional[str] = Field(None, description="集中模式下的目标节点")
     trigger_scheduler: bool = Field(True, description="生成后立即尝试执行一次调度")
+    payload_mode: str = Field(default_factory=lambda: settings.demo_payload_mode, description="文件内容: random / compressible / sparse / fallocate")
 
 
 class NodeDrainRequest(BaseModel):
     reason: Optional[str] = Field(None, max_length=200)
 
 
+class UploadSessionRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255, description="原始文件名")
+    size_bytes: int = Field(..., ge=1, description="文件总大小 (字节)")
+    chunk_size: int = Field(settings.upload_chunk_size, ge=64 * 1024, le=64 * 1024 * 1024, description="分片大小 (字节)")
+
+
+class TaskEnqueueRequest(BaseModel):
+    job: str = Field("ETL", max_length=64, description="任务类型")
+    count: int = Field(1, ge=1, le=500, description="入队任务数量")
+    duration: float = Field(1.0, ge=0, le=60, description="每个任务的模拟执行时长 (秒)")
+    fail_rate: float = Field(0.0, ge=0, le=1, description="模拟失败概率")
+
+
+class TaskQueueBenchmarkRequest(BaseModel):
+    tasks: int = Field(200, ge=1, le=5000, description="压测任务数量")
+    concurrency: int = Field(settings.task_queue_concurrency, ge=1, le=32, description="每个节点 worker 的并发数")
+    task_duration_ms: int = Field(0, ge=0, le=1000, description="每个任务的模拟执行时长 (毫秒)")
+
+
+class SimulationEvent(BaseModel):
+    at: float = Field(0.0, ge=0, description="事件发生时间 (秒)")
+    type: str = Field(..., description="upload / drain / undrain")
+    node: Optional[str] = Field(None, description="目标节点, upload 不填则按负载均衡分配")
+    count: int = Field(1, ge=0, le=100000, description="upload 的文件数")
+    size_kb: Optional[int] = Field(None, ge=1, le=1048576, description="upload 的文件大小 (KB)")
+    repeat: int = Field(1, ge=1, le=100000, description="重复次数")
+    every: float = Field(0.0, ge=0, description="重复间隔 (秒)")
+
+
+class SimulationPolicy(BaseModel):
+    threshold: int = Field(default_factory=lambda: settings.scheduler_threshold, ge=1, le=100000, description="触发迁移的文件数差异")
+    interval_seconds: float = Field(default_factory=lambda: float(settings.auto_scheduler_interval), gt=0, le=86400, description="调度周期 (秒)")
+    max_moves_per_tick: int = Field(1, ge=1, le=10000, description="每个周期最多迁移的文件数")
+
+
+class SchedulerSimulationRequest(BaseModel):
+    source: str = Field("current", description="current=当前文件分布, synthetic=使用 counts")
+    counts: Dict[str, int] = Field(default_factory=dict, description="synthetic 模式下各节点的文件数")
+    size_kb: int = Field(default_factory=lambda: settings.demo_workload_file_size_kb, ge=1, le=1048576, description="synthetic 文件大小 (KB)")
+    drained: Optional[List[str]] = Field(None, description="初始摘除的节点, 不填则使用当前状态")
+    events: List[SimulationEvent] = Field(default_factory=list, description="上传 / 摘除事件脚本")
+    policies: List[SimulationPolicy] = Field(default_factory=lambda: [SimulationPolicy()], max_length=20, description="要比较的调度参数")
+    max_ticks: int = Field(10000, ge=1, le=200000, description="每个策略最多模拟的周期数")
+
+
+class ZkReadBenchmarkRequest(BaseModel):
+    znodes: int = Field(5000, ge=1, le=200000, description="读取的 znode 数量")
+    concurrency: List[int] = Field(default_factory=lambda: [16, 64, 256], max_length=10, description="要比较的并发请求数")
+    rtt_ms: float = Field(1.0, ge=0, le=100, description="模拟的网络往返时延 (毫秒)")
+    service_us: float = Field(20.0, ge=0, le=10000, description="模拟服务端处理每个读请求的耗时 (微秒)")
+
+
+class LoggingBenchmarkRequest(BaseModel):
+    records: int = Field(20000, ge=100, le=500000, description="每种方式写入的日志条数")
+
+
+class PayloadBenchmarkRequest(BaseModel):
+    modes: List[str] = Field(
+        default_factory=lambda: [payloads.BASELINE_MODE, *payloads.PAYLOAD_MODES],
+        description="要比较的内容模式, urandom 为旧实现",
+    )
+    count: int = Field(50, ge=1, le=1000, description="每种模式生成的文件数")
+    size_kb: int = Field(1024, ge=1, le=65536, description="每个文件的大小 (KB)")
+
+
+class FailoverBenchmarkRequest(BaseModel):
+    repeats: int = Field(3, ge=1, le=20, description="重复停止 leader 的次数")
+    local: bool = Field(False, description="使用进程内模拟集群, 不操作容器")
+    poll_interval_ms: int = Field(20, ge=5, le=1000, description="轮询各节点角色的间隔 (毫秒)")
+    timeout_seconds: float = Field(60.0, ge=5, le=300, description="每个阶段的最长等待时间 (秒)")
+
+
+_failover_lock = asyncio.Lock()
+
+
+class ZnodeLoadRequest(BaseModel):
+    rate: int = Field(500, ge=1, le=50000, description="目标每秒操作数")
+    duration_seconds: float = Field(30.0, gt=0, le=600, description="运行时长 (秒)")
+    mix: Dict[str, int] = Field(default_factory=lambda: dict(znode_load.DEFAULT_MIX), description="create/get/set/delete/exists 的权重")
+    payload_bytes: int = Field(128, ge=0, le=1024 * 1024, description="写入 znode 的数据大小 (字节)")
+    concurrency: int = Field(64, ge=1, le=4096, description="最大在途请求数")
+    prefill: int = Field(200, ge=0, le=100000, description="开始前预先创建的 znode 数量")
+
+
+_znode_load: Optional[znode_load.ZnodeLoadGenerator] = None
+
+
+class WatchBenchRequest(BaseModel):
+    sessions: int = Field(20, ge=1, le=500, description="建立的 ZooKeeper 会话数")
+    znodes: int = Field(200, ge=1, le=20000, description="被监听的 znode 数量")
+    fanout: int = Field(10, ge=1, le=500, description="每个 znode 被多少个会话监听")
+    watch_types: List[str] = Field(default_factory=lambda: list(watch_bench.WATCH_TYPES), description="data / child")
+    mutation_rate: float = Field(50.0, gt=0, le=10000, description="每秒修改次数")
+    duration_seconds: float = Field(30.0, gt=0, le=600, description="修改阶段时长 (秒)")
+
+
+_watch_bench: Optional[watch_bench.WatchFanoutBenchmark] = None
+
+
+class ReconcileRequest(BaseModel):
+    repair: bool = Field(False, description="是否修复发现的不一致")
+    dry_run: bool = Field(True, description="仅生成修复计划, 不实际修改")
+
+
+drift_reconciler = reconciler.Reconciler()
+job_manager = jobs.JobManager(
+    max_running=settings.job_max_running,
+    max_queued=settings.job_max_queued,
+    history=settings.job_history,
+)
+
+
+class RuntimeConfigUpdate(BaseModel):
+    values: Dict[str, Any] = Field(..., description="要修改的配置项, 值为 null 表示恢复为环境变量中的默认值")
+
+
+runtime_settings = runtime_config.RuntimeConfig()
+request_profiler = profiling.RequestProfiler()
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
+    with startup_timer.phase("directories"):
+        settings.ensure_directories()
+    with startup_timer.phase("logging"):
+        _configure_file_logging()
     logger.info("Initialising demo backend")
-    db.init_db()
-    zookeeper_utils.ensure_zk_paths()
-    await refresh_metrics()
-    if settings.auto_scheduler_enabled:
-        asyncio.create_task(auto_scheduler_loop())
+    with startup_timer.phase("init_db"):
+        db.init_db()
+    queue_manager = task_queue.TaskQueueManager()
+    app.state.task_queue = queue_manager
     demo = DemoWorkload()
     app.state.demo_workload = demo
-    if settings.demo_workload_enabled:
-        demo.start_auto()
+    # ZooKeeper-dependent work runs in the background so /healthz answers immediately.
+    asyncio.create_task(_warm_up(queue_manager, demo))
     if settings.frontend_dir.exists():
         # 挂载 /ui 路径用于完整的前端访问
         app.mount(
@@ -142,14 +480,103 @@ async def startup_event() -> None:
                 StaticFiles(directory=partials_dir),
                 name="partials",
             )
+    startup_timer.mark_serving()
+
+
+async def _warm_up(queue_manager: task_queue.TaskQueueManager, demo: DemoWorkload) -> None:
+    with startup_timer.phase("zk_paths"):
+        try:
+            await asyncio.to_thread(zookeeper_utils.ensure_zk_paths)
+        except Exception as exc:
+            logger.warning("ZooKeeper not reachable during warm-up: %s", exc)
+    with startup_timer.phase("runtime_config"):
+        try:
+            await asyncio.to_thread(runtime_settings.start)
+        except Exception as exc:
+            logger.warning("Runtime config watch failed to start: %s", exc)
+    with startup_timer.phase("metrics"):
+        try:
+            await refresh_metrics()
+        except Exception as exc:
+            logger.warning("Initial metrics refresh failed: %s", exc)
+    asyncio.create_task(cluster_history_loop())
+    if not settings.elasticsearch_url:
+        with startup_timer.phase("log_index"):
+            try:
+                await asyncio.to_thread(log_index.init_index)
+            except Exception as exc:
+                logger.warning("Log index failed to initialise: %s", exc)
+    if settings.task_queue_enabled:
+        with startup_timer.phase("task_queue"):
+            try:
+                await asyncio.to_thread(queue_manager.start)
+            except Exception as exc:
+                logger.warning("Task queue workers failed to start: %s", exc)
+    if settings.leader_election_enabled:
+        # With several workers only the elected process runs the owner loops.
+        loop = asyncio.get_running_loop()
+        election = leadership.OwnerElection(
+            on_elected=lambda: loop.call_soon_threadsafe(_start_owner_tasks, demo),
+            on_revoked=lambda: loop.call_soon_threadsafe(_stop_owner_tasks, demo),
+        )
+        app.state.owner_election = election
+        election.start()
+    else:
+        _start_owner_tasks(demo)
+    startup_timer.mark_ready()
+    logger.info("Startup complete: %s", json.dumps(startup_timer.report()))
+
+
+def _start_owner_tasks(demo: DemoWorkload) -> None:
+    """Start the loops that must run in exactly one process."""
+    if _owner_tasks:
+        return
+    if settings.auto_scheduler_enabled:
+        _owner_tasks.append(asyncio.create_task(auto_scheduler_loop()))
+    if not settings.elasticsearch_url:
+        _owner_tasks.append(asyncio.create_task(log_index_loop()))
+    if settings.reconcile_interval > 0:
+        _owner_tasks.append(asyncio.create_task(reconcile_loop()))
+    if settings.demo_workload_enabled:
+        demo.start_auto()
+
+
+def _stop_owner_tasks(demo: DemoWorkload) -> None:
+    for task in _owner_tasks:
+        task.cancel()
+    _owner_tasks.clear()
+    demo.stop_auto()
+
+
+# Middleware added later wraps what was added earlier.
+app.add_middleware(FirstRequestMiddleware, timer=startup_timer)
+app.add_middleware(log_pipeline.RequestContextMiddleware, access_logger=access_logger)
+# Outermost layer, so profiles cover the other middleware too.
+app.add_middleware(profiling.ProfileMiddleware, profiler=request_profiler)
 
 
 @app.on_event("shutdown")
 def shutdown_event() -> None:
+    election = getattr(app.state, "owner_election", None)
+    if election is not None:
+        election.stop()
     worker = getattr(app.state, "demo_workload", None)
     if worker is not None:
         worker.stop_auto()
+    queue_manager = getattr(app.state, "task_queue", None)
+    if queue_manager is not None:
+        queue_manager.stop()
+    if _znode_load is not None:
+        _znode_load.stop()
+    if _watch_bench is not None:
+        _watch_bench.stop()
+    drift_reconciler.stop()
+    runtime_settings.stop()
+    job_manager.shutdown()
     zookeeper_utils.close_kazoo_client()
+    if settings.prometheus_multiproc_dir:
+        multiprocess.mark_process_dead(os.getpid())
+    log_pipeline.shutdown()
 
 
 def build_scheduler_plan() -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
@@ -193,21 +620,16 @@ def build_scheduler_plan() -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
         plan["message"] = "未找到可用节点，无法计算调度计划。"
         return plan, None
 
-    drained_with_files = [(node, counts.get(node, 0)) for node in drained_nodes if counts.get(node, 0) > 0]
-    if drained_with_files:
-        source_node, source_count = max(drained_with_files, key=lambda item: item[1])
-    else:
-        source_node, source_count = max(counts.items(), key=lambda item: item[1])
-
-    ready_targets = [(node, count) for node, count in counts.items() if node not in drained_nodes]
-    if ready_targets:
-        target_node, target_count = min(ready_targets, key=lambda item: item[1])
-    else:
-        target_node, target_count = min(counts.items(), key=lambda item: item[1])
+    hosts = list(counts)
+    source_index, target_index, has_ready_target = scheduler_sim.pick_migration(
+        [counts[host] for host in hosts],
+        [host in drained_nodes for host in hosts],
+    )
+    source_node, target_node = hosts[source_index], hosts[target_index]
 
     plan["sourceNode"] = source_node
     plan["targetNode"] = target_node
-    delta = source_count - target_count
+    delta = counts[source_node] - counts[target_node]
     plan["delta"] = delta
 
     candidate_record = next((item for item in files if item["node"] == source_node), None)
@@ -240,7 +662,7 @@ def build_scheduler_plan() -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
         plan["message"] = "只有一个可用节点，调度器无需迁移。"
         return plan, candidate_record
 
-    if not ready_targets and drained_nodes:
+    if not has_ready_target and drained_nodes:
         plan["reason"] = "no_target"
         plan["message"] = "所有节点均被手动摘除，无法执行迁移。"
         return plan, candidate_record
@@ -264,7 +686,15 @@ def _snapshot_node_counts() -> Dict[str, int]:
     return counts
 
 
-def _bulk_generate_files(*, count: int, size_kb: int, mode: BulkUploadMode, target_node: Optional[str]) -> Dict[str, Any]:
+def _bulk_generate_files(
+    *,
+    count: int,
+    size_kb: int,
+    mode: BulkUploadMode,
+    target_node: Optional[str],
+    payload_mode: Optional[str] = None,
+    job: Optional[jobs.Job] = None,
+) -> Dict[str, Any]:
     """Generate many demo files in either balanced or pinned mode."""
     size_kb = max(int(size_kb), 1)
     created: List[Dict[str, Any]] = []
@@ -275,13 +705,15 @@ def _bulk_generate_files(*, count: int, size_kb: int, mode: BulkUploadMode, targ
     node_states = db.get_node_states()
     
     for _ in range(count):
+        if job is not None:
+            job.check_cancelled()
         if mode == BulkUploadMode.PIN and target_node:
             if node_states.get(target_node, {}).get("drained"):
                 raise ValueError(f"节点 {target_node} 已暂停，无法接收文件")
             node = target_node
         else:
             node = storage.select_target_node()
-        path, size_bytes, file_uuid, filename = storage.create_demo_file(node, size_kb)
+        path, size_bytes, file_uuid, filename, content_hash = storage.create_demo_file(node, size_kb, payload_mode)
         history = [{
             "timestamp": datetime.utcnow().isoformat(),
             "action": history_action,
@@ -294,7 +726,9 @@ def _bulk_generate_files(*, count: int, size_kb: int, mode: BulkUploadMode, targ
             node=node,
             path=path,
             history=history,
+            content_hash=content_hash,
         )
+        replicas = storage.replicate_file(file_id, node, path, content_hash, size_bytes)
         metadata = {
             "id": file_id,
             "uuid": file_uuid,
@@ -302,6 +736,7 @@ def _bulk_generate_files(*, count: int, size_kb: int, mode: BulkUploadMode, targ
             "size": size_bytes,
             "node": node,
             "path": path,
+            "replicas": replicas,
             "history": history,
             "created_at": datetime.utcnow().isoformat(),
         }
@@ -316,6 +751,8 @@ def _bulk_generate_files(*, count: int, size_kb: int, mode: BulkUploadMode, targ
             "size_bytes": size_bytes,
         })
         per_node[node] = per_node.get(node, 0) + 1
+        if job is not None:
+            job.advance(bytes_written=size_bytes, message=f"{filename} -> {node}")
     return {
         "created": created,
         "per_node": per_node,
@@ -332,6 +769,49 @@ async def auto_scheduler_loop() -> None:
         await asyncio.sleep(settings.auto_scheduler_interval)
 
 
+async def log_index_loop() -> None:
+    logger.info("Starting local log index loop (interval=%ss)", settings.log_index_interval)
+    while True:
+        try:
+            await asyncio.to_thread(log_index.refresh_index)
+        except Exception as exc:  # pragma: no cover - keep loop alive
+            logger.exception("Log index loop error: %s", exc)
+        await asyncio.sleep(settings.log_index_interval)
+
+
+async def reconcile_loop() -> None:
+    # Report-only passes; repairs are always requested explicitly.
+    logger.info("Starting reconcile loop (interval=%ss)", settings.reconcile_interval)
+    while True:
+        await asyncio.sleep(settings.reconcile_interval)
+        try:
+            report = await asyncio.to_thread(drift_reconciler.run)
+        except reconciler.ReconcileInProgress:
+            continue
+        except Exception as exc:  # pragma: no cover - keep loop alive
+            logger.warning("Reconcile pass failed: %s", exc)
+            continue
+        _update_drift_metrics(report)
+
+
+def _update_drift_metrics(report: Dict[str, Any]) -> None:
+    for kind, count in report["counts"].items():
+        drift_items_gauge.labels(kind=kind).set(count)
+    reconcile_last_run_gauge.set(report["finished_at"])
+
+
+async def cluster_history_loop() -> None:
+    # Only poll when nothing else refreshed the status within the interval. The
+    # history needs mntr alone, so skip the SQLite work refresh_metrics does.
+    while True:
+        if time.time() - cluster_history.last_sample_at >= settings.cluster_history_interval:
+            try:
+                cluster_history.record(await asyncio.to_thread(zookeeper_utils.get_cluster_status))
+            except Exception as exc:  # pragma: no cover - keep loop alive
+                logger.warning("Cluster history sample failed: %s", exc)
+        await asyncio.sleep(settings.cluster_history_interval)
+
+
 async def maybe_rebalance_files() -> bool:
     plan, candidate = build_scheduler_plan()
     if not plan.get("shouldMigrate") or not candidate:
@@ -342,56 +822,71 @@ async def maybe_rebalance_files() -> bool:
     if not target_node or source_node == target_node:
         return False
 
-    logger.info(
-        "Auto scheduler migrating file %s from %s to %s",
-        candidate["filename"],
-        source_node,
-        target_node,
-    )
-    new_path, new_node = storage.migrate_file(candidate, target_node)
-    history_raw = candidate.get("history")
-    if isinstance(history_raw, str):
-        try:
-            history = json.loads(history_raw)
-        except json.JSONDecodeError:
-            history = []
-    else:
-        history = history_raw or []
-    event = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "action": "auto_migrate",
-        "from": source_node,
-        "to": target_node,
-    }
-    history.append(event)
-    db.update_file_record(candidate["id"], node=new_node, path=new_path, history=history)
-    zookeeper_utils.register_file_metadata(candidate["uuid"], {
-        "filename": candidate["filename"],
-        "size": candidate["size_bytes"],
-        "node": new_node,
-        "path": new_path,
-        "history": history,
-        "updated_at": datetime.utcnow().isoformat(),
-    })
+    try:
+        migrated = await asyncio.to_thread(_migrate_with_lock, candidate, source_node, target_node)
+    except (file_locks.FileLockTimeout, zookeeper_utils.ZooKeeperUnavailable) as exc:
+        # Never move a file without its lock.
+        logger.info("Auto scheduler skipped %s: %s", candidate["filename"], exc)
+        return False
+    if not migrated:
+        return False
+    await refresh_metrics()
+    return True
+
+
+def _migrate_with_lock(candidate: Dict[str, Any], source_node: str, target_node: str) -> bool:
+    with file_locks.file_lock(candidate["uuid"], purpose="auto_migrate"):
+        # The demo loop or another replica may have moved it while we waited.
+        candidate = file_locks.reload_if_unchanged(candidate)
+        if candidate is None:
+            return False
+        logger.info(
+            "Auto scheduler migrating file %s from %s to %s",
+            candidate["filename"],
+            source_node,
+            target_node,
+        )
+        new_path, new_node = storage.migrate_file(candidate, target_node)
+        storage.drop_replica_on(candidate["id"], new_node, new_path)
+        history_raw = candidate.get("history")
+        if isinstance(history_raw, str):
+            try:
+                history = json.loads(history_raw)
+            except json.JSONDecodeError:
+                history = []
+        else:
+            history = history_raw or []
+        event = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "action": "auto_migrate",
+            "from": source_node,
+            "to": target_node,
+        }
+        history.append(event)
+        db.update_file_record(candidate["id"], node=new_node, path=new_path, history=history)
+        zookeeper_utils.register_file_metadata(candidate["uuid"], {
+            "filename": candidate["filename"],
+            "size": candidate["size_bytes"],
+            "node": new_node,
+            "path": new_path,
+            "history": history,
+            "updated_at": datetime.utcnow().isoformat(),
+        })
     db.record_operation(
         action="auto_migrate",
         status="success",
         node=new_node,
+        source_node=source_node,
         details=f"Auto-migrated file {candidate['filename']} from {source_node} to {target_node}",
     )
-    await refresh_metrics()
     return True
 
 
 async def refresh_metrics() -> Dict[str, Any]:
-    status = zookeeper_utils.get_cluster_status()
-    files = db.get_files()
-    tasks = db.list_tasks(limit=settings.demo_workload_max_tasks)
+    status = await asyncio.to_thread(zookeeper_utils.get_cluster_status)
+    cluster_history.record(status)
     node_states = db.get_node_states()
     drained_nodes: Set[str] = {node for node, info in node_states.items() if info.get("drained")}
-    for node in settings.zk_nodes:
-        host = node.split(":")[0]
-        files_per_node_gauge.labels(node=host).set(0)
     node_map: Dict[str, Dict[str, Any]] = {}
     for node_info in status["nodes"]:
         node_name = node_info.get("node") or node_info.get("endpoint", "unknown")
@@ -405,24 +900,73 @@ async def refresh_metrics() -> Dict[str, Any]:
         else:
             node_info["drain_reason"] = None
             node_info["drain_updated_at"] = None
-        node_up_gauge.labels(node=node_name).set(1 if state and str(state).lower() != "down" else 0)
+        is_up = bool(state) and str(state).lower() != "down"
+        node_up_gauge.labels(node=node_name).set(1 if is_up else 0)
+        if is_up:
+            _down_nodes.discard(node_name)
+        else:
+            _down_nodes.add(node_name)
         latency = _extract_numeric(node_info, ["zk_avg_latency", "zk_avg_latency_ms", "zk_avg_request_latency_ms"])
         if latency is not None:
             node_latency_gauge.labels(node=node_name).set(latency)
         connections = _extract_numeric(node_info, ["zk_num_alive_connections"])
         if connections is not None:
             node_connections_gauge.labels(node=node_name).set(connections)
-    for file_record in files:
-        files_per_node_gauge.labels(node=file_record["node"]).inc()
-    for status_name in ["queued", "running", "succeeded", "failed", "cancelled"]:
-        task_status_gauge.labels(status=status_name).set(0)
-    for task in tasks:
-        task_status_gauge.labels(status=task["status"]).inc()
-    status["tasks"] = tasks
+    for endpoint, health in zookeeper_utils.NODE_HEALTH.snapshot().items():
+        host = endpoint.split(":")[0]
+        for health_state in (node_health.HEALTHY, node_health.SUSPECT, node_health.DOWN):
+            node_health_gauge.labels(node=host, state=health_state).set(1 if health["state"] == health_state else 0)
+        node_probe_backoff_gauge.labels(node=host).set(health["backoff"])
+    for host, count in storage.get_node_counts().items():
+        files_per_node_gauge.labels(node=host).set(count)
+    for node_name, usage in db.get_storage_usage().items():
+        stored_bytes_gauge.labels(node=node_name, kind="logical").set(usage["logical_bytes"])
+        stored_bytes_gauge.labels(node=node_name, kind="physical").set(usage["physical_bytes"])
+        physical = usage["physical_bytes"]
+        dedup_ratio_gauge.labels(node=node_name).set(usage["logical_bytes"] / physical if physical else 1.0)
+    for node_name, totals in list(storage.REPLICATION_STATS.items()):
+        replication_lag_gauge.labels(node=node_name).set(totals["last_lag_ms"])
+        if totals["seconds"] > 0:
+            replication_throughput_gauge.labels(node=node_name).set(totals["bytes"] / totals["seconds"])
+    for purpose, lock_stats in file_locks.snapshot().items():
+        for quantile in ("p50", "p99", "max"):
+            file_lock_wait_gauge.labels(purpose=purpose, quantile=quantile).set(lock_stats["wait_ms"][quantile])
+            file_lock_hold_gauge.labels(purpose=purpose, quantile=quantile).set(lock_stats["hold_ms"][quantile])
+        file_lock_events_gauge.labels(purpose=purpose, result="acquired").set(lock_stats["acquired"])
+        file_lock_events_gauge.labels(purpose=purpose, result="timeout").set(lock_stats["timeouts"])
+    under_replicated_gauge.set(db.count_under_replicated(settings.replication_factor - 1))
+    task_counts = db.count_tasks_by_status()
+    for status_name in ["queued", "running", "succeeded", "failed", "cancelled", *task_counts.keys()]:
+        task_status_gauge.labels(status=status_name).set(task_counts.get(status_name, 0))
+    if settings.task_queue_enabled:
+        try:
+            depth = task_queue.queue_depth()
+        except Exception as exc:
+            logger.debug("Unable to read task queue depth: %s", exc)
+        else:
+            task_queue_depth_gauge.labels(state="pending").set(depth["pending"])
+            task_queue_depth_gauge.labels(state="leased").set(depth["leased"])
+    status["task_counts"] = task_counts
     status["node_states"] = node_states
+    status["zk_session"] = _update_session_metrics()
     return status
 
 
+def _update_session_metrics() -> Dict[str, Any]:
+    session = zookeeper_utils.session_snapshot()
+    for state in zookeeper_utils.SESSION_STATES:
+        zk_session_state_gauge.labels(state=state).set(1 if session["state"] == state else 0)
+    for event in ("reconnects", "suspensions", "losses", "fast_failures", "replayed_writes", "dropped_writes"):
+        zk_session_events_gauge.labels(event=event).set(session[event])
+    zk_pending_writes_gauge.set(session["pending_writes"])
+    return session
+
+
+def _update_job_metrics() -> None:
+    for state, count in job_manager.counts().items():
+        jobs_gauge.labels(state=state).set(count)
+
+
 def _extract_numeric(data: Dict[str, Any], keys: List[str]) -> Optional[float]:
     for key in keys:
         value = data.get(key)
@@ -437,26 +981,106 @@ def _extract_numeric(data: Dict[str, Any], keys: List[str]) -> Optional[float]:
 
 @app.get("/metrics")
 def metrics_endpoint() -> Response:
+    _update_session_metrics()
+    _update_znode_load_metrics()
+    _update_watch_bench_metrics()
+    _update_job_metrics()
+    if settings.prometheus_multiproc_dir:
+        # Aggregate the per-process files written by every worker.
+        collection = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collection)
+        return Response(generate_latest(collection), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/cluster/owner")
+def api_cluster_owner() -> Dict[str, Any]:
+    election = getattr(app.state, "owner_election", None)
+    if election is None:
+        return {"enabled": False, "is_leader": True, "owner_tasks": len(_owner_tasks)}
+    return {**election.snapshot(), "owner_tasks": len(_owner_tasks)}
+
+
 @app.get("/api/overview")
 async def api_overview() -> Dict[str, Any]:
     status = await refresh_metrics()
     try:
-        zk_files = zookeeper_utils.list_registered_files()
+        zk_files = await asyncio.to_thread(zookeeper_utils.list_registered_files)
     except Exception as exc:
         logger.warning("Unable to read registered ZooKeeper files: %s", exc)
         zk_files = []
     return {
         "cluster": status,
         "files": db.get_files(),
-        "tasks": status.get("tasks", []),
+        "tasks": db.list_tasks(limit=settings.demo_workload_max_tasks),
         "zk_registered_files": zk_files,
     }
 
 
+def _filter_values(value: Optional[str]) -> Optional[List[str]]:
+    values = [item.strip() for item in value.split(",") if item.strip()] if value else []
+    return values or None
+
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Operations are stored as naive UTC timestamps.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 @app.get("/api/operations")
-def api_operations(limit: int = 100) -> List[Dict[str, Any]]:
-    return db.list_operations(limit=limit)
+def api_operations(
+    limit: int = 100,
+    action: Optional[str] = None,
+    node: Optional[str] = None,
+    actor: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    start, end = _utc_naive(start), _utc_naive(end)
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="开始时间不能晚于结束时间")
+    return db.list_operations(
+        limit=min(max(limit, 1), 1000),
+        action=_filter_values(action),
+        node=_filter_values(node),
+        actor=_filter_values(actor),
+        status=_filter_values(status),
+        start=start,
+        end=end,
+    )
+
+
+@app.get("/api/operations/stats")
+def api_operation_stats(
+    bucket_seconds: int = 60,
+    action: Optional[str] = None,
+    node: Optional[str] = None,
+    actor: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    end = _utc_naive(end) or datetime.utcnow()
+    start = _utc_naive(start) or end - timedelta(hours=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="开始时间不能晚于结束时间")
+    if not 1 <= bucket_seconds <= 86400:
+        raise HTTPException(status_code=400, detail="bucket_seconds 必须在 1 到 86400 之间")
+    if (end - start).total_seconds() / bucket_seconds > 10000:
+        raise HTTPException(status_code=400, detail="时间范围内的分桶数量超过 10000, 请增大 bucket_seconds")
+    stats = db.operation_stats(
+        bucket_seconds=bucket_seconds,
+        start=start,
+        end=end,
+        action=_filter_values(action),
+        node=_filter_values(node),
+        actor=_filter_values(actor),
+        status=_filter_values(status),
+    )
+    return {"start": start.isoformat(), "end": end.isoformat(), "bucket_seconds": bucket_seconds, **stats}
 
 
 @app.get("/api/scheduler/diagnostics")
@@ -478,10 +1102,58 @@ async def api_scheduler_run() -> Dict[str, Any]:
     }
 
 
+@app.post("/api/scheduler/simulate")
+async def api_scheduler_simulate(payload: SchedulerSimulationRequest) -> Dict[str, Any]:
+    nodes = [node.split(":")[0] for node in settings.zk_nodes]
+    if payload.source == "current":
+        files = scheduler_sim.files_from_records(await asyncio.to_thread(db.get_files))
+    elif payload.source == "synthetic":
+        if not payload.counts:
+            raise HTTPException(status_code=400, detail="synthetic 模式需要提供 counts")
+        try:
+            files = scheduler_sim.synthetic_files(payload.counts, payload.size_kb)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    else:
+        raise HTTPException(status_code=400, detail=f"未知的数据来源 {payload.source}")
+    nodes.extend(node for node in files if node not in nodes)
+    if payload.drained is None:
+        drained = [node for node, info in db.get_node_states().items() if info.get("drained")]
+    else:
+        drained = payload.drained
+    try:
+        events = scheduler_sim.expand_events([event.model_dump() for event in payload.events], payload.size_kb)
+        results = [
+            await asyncio.to_thread(
+                scheduler_sim.simulate,
+                nodes=nodes,
+                files=files,
+                drained=drained,
+                events=events,
+                threshold=policy.threshold,
+                interval=policy.interval_seconds,
+                max_moves_per_tick=policy.max_moves_per_tick,
+                max_ticks=payload.max_ticks,
+            )
+            for policy in payload.policies
+        ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "nodes": nodes,
+        "initial_counts": {node: len(files.get(node, [])) for node in nodes},
+        "drained": sorted(drained),
+        "events": len(events),
+        "results": results,
+    }
+
+
 @app.get("/api/files")
 def api_files() -> List[Dict[str, Any]]:
     records = db.get_files()
+    replica_map = db.get_replica_map()
     for record in records:
+        record["replicas"] = replica_map.get(record["id"], [])
         history = record.get("history")
         if isinstance(history, str):
             try:
@@ -500,7 +1172,7 @@ async def api_demo_actions(action: DemoAction) -> Dict[str, Any]:
     return result
 
 
-@app.post("/api/files/bulk-generate")
+@app.post("/api/files/bulk-generate", status_code=202)
 async def api_bulk_generate(payload: BulkUploadRequest) -> Dict[str, Any]:
     allowed_nodes = {node.split(":")[0] for node in settings.zk_nodes}
     if payload.mode == BulkUploadMode.PIN:
@@ -510,22 +1182,25 @@ async def api_bulk_generate(payload: BulkUploadRequest) -> Dict[str, Any]:
             raise HTTPException(status_code=400, detail=f"未知节点 {payload.target_node}")
     elif payload.target_node and payload.target_node not in allowed_nodes:
         raise HTTPException(status_code=400, detail=f"未知节点 {payload.target_node}")
+    if payload.payload_mode not in payloads.PAYLOAD_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的内容模式 {payload.payload_mode}")
+    return _submit_job("bulk_generate", payload.model_dump(mode="json"), payload.count, lambda job: _run_bulk_generate(job, payload))
+
 
+async def _run_bulk_generate(job: jobs.Job, payload: BulkUploadRequest) -> Dict[str, Any]:
     before_counts = _snapshot_node_counts()
     before_plan, _ = build_scheduler_plan()
+    summary = await asyncio.to_thread(
+        _bulk_generate_files,
+        count=payload.count,
+        size_kb=payload.size_kb,
+        mode=payload.mode,
+        target_node=payload.target_node,
+        payload_mode=payload.payload_mode,
+        job=job,
+    )
 
-    try:
-        summary = await asyncio.to_thread(
-            _bulk_generate_files,
-            count=payload.count,
-            size_kb=payload.size_kb,
-            mode=payload.mode,
-            target_node=payload.target_node,
-        )
-    except Exception as exc:
-        logger.exception("Bulk upload batch failed: %s", exc)
-        raise HTTPException(status_code=500, detail=f"批量上传失败: {exc}") from exc
-
+    job.set_message("refreshing metrics")
     await refresh_metrics()
     after_counts = _snapshot_node_counts()
     after_plan, _ = build_scheduler_plan()
@@ -534,6 +1209,7 @@ async def api_bulk_generate(payload: BulkUploadRequest) -> Dict[str, Any]:
     final_counts = after_counts
     final_plan = after_plan
     if payload.trigger_scheduler:
+        job.set_message("running scheduler")
         triggered = await maybe_rebalance_files()
         await refresh_metrics()
         final_plan, _ = build_scheduler_plan()
@@ -548,6 +1224,7 @@ async def api_bulk_generate(payload: BulkUploadRequest) -> Dict[str, Any]:
             "counts": final_counts,
             "triggered": triggered,
             "mode": payload.mode,
+            "job": job.id,
         },
         details=f"Bulk generated {payload.count} files (mode={payload.mode}, size_kb={payload.size_kb})",
     )
@@ -573,28 +1250,30 @@ async def api_bulk_generate(payload: BulkUploadRequest) -> Dict[str, Any]:
     }
 
 
-@app.post("/api/demo/stress")
+@app.post("/api/demo/stress", status_code=202)
 async def api_demo_stress(payload: DemoStressRequest) -> Dict[str, Any]:
     allowed_nodes = {node.split(":")[0] for node in settings.zk_nodes}
     if payload.node not in allowed_nodes:
         raise HTTPException(status_code=400, detail=f"未知节点 {payload.node}")
-        
+
     # Check if node is drained
     node_states = db.get_node_states()
     if node_states.get(payload.node, {}).get("drained"):
         raise HTTPException(status_code=400, detail=f"节点 {payload.node} 已暂停，无法接收压力测试文件")
+    return _submit_job("demo_stress", payload.model_dump(mode="json"), payload.files, lambda job: _run_demo_stress(job, payload))
 
+
+async def _run_demo_stress(job: jobs.Job, payload: DemoStressRequest) -> Dict[str, Any]:
     before_plan, _ = build_scheduler_plan()
     worker: DemoWorkload = getattr(app.state, "demo_workload", DemoWorkload())
     app.state.demo_workload = worker
-    try:
-        result = await worker.skew_files(payload.node, payload.files, size_kb=payload.size_kb)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    result = await worker.skew_files(payload.node, payload.files, size_kb=payload.size_kb, job=job)
+    job.set_message("refreshing metrics")
     await refresh_metrics()
     after_plan, _ = build_scheduler_plan()
     triggered = False
     if payload.trigger_scheduler:
+        job.set_message("running scheduler")
         triggered = await maybe_rebalance_files()
         await refresh_metrics()
         after_plan, _ = build_scheduler_plan()
@@ -608,30 +1287,83 @@ async def api_demo_stress(payload: DemoStressRequest) -> Dict[str, Any]:
     }
 
 
-@app.post("/api/files/upload")
-async def api_upload(file: UploadFile = File(...)) -> Dict[str, Any]:
-    target_node = storage.select_target_node()
-    path, size, file_uuid = storage.save_upload(file, target_node)
+def _submit_job(kind: str, params: Dict[str, Any], total: int, runner: Any) -> Dict[str, Any]:
+    try:
+        job = job_manager.submit(kind, params, total, runner)
+    except jobs.JobQueueFull as exc:
+        raise HTTPException(status_code=429, detail="排队中的任务过多, 请稍后再试") from exc
+    return job.snapshot()
+
+
+@app.get("/api/jobs")
+def api_jobs() -> List[Dict[str, Any]]:
+    return job_manager.list()
+
+
+def _get_job(job_id: str) -> jobs.Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def api_job_status(job_id: str) -> Dict[str, Any]:
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def api_job_events(job_id: str) -> StreamingResponse:
+    job = _get_job(job_id)
+
+    async def events() -> Any:
+        async for snapshot in job_manager.follow(job):
+            yield f"data: {json.dumps(snapshot, default=str)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.delete("/api/jobs/{job_id}")
+def api_job_cancel(job_id: str) -> Dict[str, Any]:
+    job = _get_job(job_id)
+    job_manager.cancel(job_id)
+    return job.snapshot()
+
+
+async def _register_uploaded_file(
+    *,
+    action: str,
+    node: str,
+    path: str,
+    size: int,
+    file_uuid: str,
+    filename: str,
+    content_hash: str,
+) -> Dict[str, Any]:
     history = [{
         "timestamp": datetime.utcnow().isoformat(),
-        "action": "upload",
-        "node": target_node,
+        "action": action,
+        "node": node,
     }]
     file_id = db.create_file_record(
         uuid=file_uuid,
-        filename=file.filename or "uploaded.bin",
+        filename=filename,
         size_bytes=size,
-        node=target_node,
+        node=node,
         path=path,
         history=history,
+        content_hash=content_hash,
     )
+    replicas = await asyncio.to_thread(storage.replicate_file, file_id, node, path, content_hash, size)
     payload = {
         "id": file_id,
         "uuid": file_uuid,
-        "filename": file.filename,
+        "filename": filename,
         "size": size,
-        "node": target_node,
+        "content_hash": content_hash,
+        "node": node,
         "path": path,
+        "replicas": replicas,
         "history": history,
         "created_at": datetime.utcnow().isoformat(),
     }
@@ -640,15 +1372,185 @@ async def api_upload(file: UploadFile = File(...)) -> Dict[str, Any]:
     except Exception as exc:
         logger.warning("Failed to replicate metadata to ZooKeeper: %s", exc)
     db.record_operation(
-        action="upload",
+        action=action,
         status="success",
-        node=target_node,
-        details=f"Uploaded {file.filename} ({size} bytes) to {target_node}",
+        node=node,
+        details=f"Uploaded {filename} ({size} bytes) to {node}",
     )
     await refresh_metrics()
     return payload
 
 
+@app.post("/api/files/upload")
+async def api_upload(file: UploadFile = File(...)) -> Dict[str, Any]:
+    target_node = storage.select_target_node()
+    path, size, file_uuid, content_hash = storage.save_upload(file, target_node)
+    return await _register_uploaded_file(
+        action="upload",
+        node=target_node,
+        path=path,
+        size=size,
+        file_uuid=file_uuid,
+        filename=file.filename or "uploaded.bin",
+        content_hash=content_hash,
+    )
+
+
+def _upload_session_status(session: Dict[str, Any]) -> Dict[str, Any]:
+    chunks = db.list_upload_chunks(session["id"])
+    received = {chunk["idx"] for chunk in chunks}
+    ranges: List[List[int]] = []
+    for index in sorted(received):
+        start = index * session["chunk_size"]
+        end = min(start + session["chunk_size"], session["size_bytes"]) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return {
+        "session_id": session["id"],
+        "filename": session["filename"],
+        "node": session["node"],
+        "status": session["status"],
+        "size_bytes": session["size_bytes"],
+        "chunk_size": session["chunk_size"],
+        "total_chunks": session["total_chunks"],
+        "received_chunks": len(received),
+        "received_bytes": sum(chunk["size_bytes"] for chunk in chunks),
+        "received_ranges": ranges,
+        "missing_chunks": [index for index in range(session["total_chunks"]) if index not in received],
+        "file_id": session.get("file_id"),
+    }
+
+
+def _get_open_upload_session(session_id: str) -> Dict[str, Any]:
+    session = db.get_upload_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail=f"Upload session is {session['status']}")
+    return session
+
+
+def _expire_upload_sessions() -> None:
+    cutoff = (datetime.utcnow() - timedelta(hours=settings.upload_session_ttl_hours)).isoformat()
+    for session in db.list_stale_upload_sessions(cutoff):
+        storage.discard_upload(session["node"], session["id"])
+        db.delete_upload_session(session["id"])
+
+
+@app.post("/api/uploads")
+async def api_upload_session_create(payload: UploadSessionRequest) -> Dict[str, Any]:
+    await asyncio.to_thread(_expire_upload_sessions)
+    try:
+        target_node = storage.select_target_node()
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    session_id = uuid4().hex
+    db.create_upload_session(
+        session_id=session_id,
+        filename=Path(payload.filename).name or "uploaded.bin",
+        size_bytes=payload.size_bytes,
+        chunk_size=payload.chunk_size,
+        total_chunks=math.ceil(payload.size_bytes / payload.chunk_size),
+        node=target_node,
+    )
+    return _upload_session_status(db.get_upload_session(session_id))
+
+
+@app.get("/api/uploads/{session_id}")
+def api_upload_session_status(session_id: str) -> Dict[str, Any]:
+    session = db.get_upload_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return _upload_session_status(session)
+
+
+@app.put("/api/uploads/{session_id}/chunks/{index}")
+async def api_upload_chunk(session_id: str, index: int, request: Request) -> Dict[str, Any]:
+    """Store one chunk; the X-Chunk-SHA256 header must match the body."""
+    session = _get_open_upload_session(session_id)
+    if not 0 <= index < session["total_chunks"]:
+        raise HTTPException(status_code=400, detail=f"Chunk index out of range (0..{session['total_chunks'] - 1})")
+    expected_checksum = (request.headers.get("x-chunk-sha256") or "").strip().lower()
+    if not expected_checksum:
+        raise HTTPException(status_code=400, detail="Missing X-Chunk-SHA256 header")
+    expected_size = min(session["chunk_size"], session["size_bytes"] - index * session["chunk_size"])
+    body = bytearray()
+    async for piece in request.stream():
+        body.extend(piece)
+        if len(body) > expected_size:
+            raise HTTPException(status_code=413, detail=f"Chunk {index} exceeds {expected_size} bytes")
+    if len(body) != expected_size:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected_size} bytes, got {len(body)}")
+    checksum = await asyncio.to_thread(lambda: hashlib.sha256(body).hexdigest())
+    if checksum != expected_checksum:
+        raise HTTPException(status_code=422, detail=f"Checksum mismatch for chunk {index}")
+    await asyncio.to_thread(storage.write_upload_chunk, session["node"], session_id, index, bytes(body))
+    db.record_upload_chunk(session_id, index, len(body), checksum)
+    return {"session_id": session_id, "index": index, "size_bytes": len(body), "checksum": checksum}
+
+
+@app.post("/api/uploads/{session_id}/complete")
+async def api_upload_session_complete(session_id: str) -> Dict[str, Any]:
+    session = _get_open_upload_session(session_id)
+    status = _upload_session_status(session)
+    if status["missing_chunks"]:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload incomplete", "missing_chunks": status["missing_chunks"]},
+        )
+    if not db.claim_upload_session(session_id):
+        current = db.get_upload_session(session_id)
+        raise HTTPException(status_code=409, detail=f"Upload session is {current['status'] if current else 'gone'}")
+    assembled = completed = False
+    try:
+        try:
+            path, size, file_uuid, content_hash = await asyncio.to_thread(
+                storage.assemble_upload,
+                session["node"],
+                session_id,
+                session["total_chunks"],
+                session["filename"],
+            )
+        except OSError as exc:
+            logger.exception("Failed to assemble upload session %s: %s", session_id, exc)
+            raise HTTPException(status_code=500, detail=f"分片合并失败: {exc}") from exc
+        assembled = True
+        payload = await _register_uploaded_file(
+            action="chunked_upload",
+            node=session["node"],
+            path=path,
+            size=size,
+            file_uuid=file_uuid,
+            filename=session["filename"],
+            content_hash=content_hash,
+        )
+        db.update_upload_session(session_id, status="completed", file_id=payload["id"])
+        completed = True
+    finally:
+        # Any failure, cancellation included, releases the session this call claimed
+        # instead of leaving it "assembling" forever. Until assembly succeeded nothing
+        # else changed, so it is reopened for a retry; after that a file record may
+        # already exist and a retry could register the file twice, so it is failed.
+        if not completed:
+            db.update_upload_session(session_id, status="failed" if assembled else "open")
+    await asyncio.to_thread(storage.discard_upload, session["node"], session_id)
+    return payload
+
+
+@app.delete("/api/uploads/{session_id}")
+async def api_upload_session_abort(session_id: str) -> Dict[str, Any]:
+    session = db.get_upload_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if session["status"] not in ("open", "failed"):
+        raise HTTPException(status_code=409, detail=f"Upload session is {session['status']}")
+    await asyncio.to_thread(storage.discard_upload, session["node"], session_id)
+    db.delete_upload_session(session_id)
+    return {"session_id": session_id, "status": "aborted"}
+
+
 @app.post("/api/nodes/{node_id}/drain")
 async def api_node_drain(node_id: str, request: Request, payload: Optional[NodeDrainRequest] = None) -> Dict[str, Any]:
     allowed_nodes = {node.split(":")[0] for node in settings.zk_nodes}
@@ -709,6 +1611,7 @@ async def api_node_action(node_id: str, action: str, request: Request) -> Dict[s
     try:
         if action == "stop":
             docker_control.stop_container(container_name)
+            zookeeper_utils.NODE_HEALTH.mark_down(f"{node_id}:2181", "stopped via API")
             await asyncio.sleep(2)
             try:
                 after = zookeeper_utils.get_node_metrics(f"{node_id}:2181")
@@ -716,10 +1619,12 @@ async def api_node_action(node_id: str, action: str, request: Request) -> Dict[s
                 after = {"state": "down"}
         elif action == "start":
             docker_control.start_container(container_name)
+            zookeeper_utils.NODE_HEALTH.reset_backoff(f"{node_id}:2181")
             await asyncio.sleep(4)
             after = zookeeper_utils.get_node_metrics(f"{node_id}:2181")
         else:
             docker_control.restart_container(container_name)
+            zookeeper_utils.NODE_HEALTH.reset_backoff(f"{node_id}:2181")
             await asyncio.sleep(4)
             after = zookeeper_utils.get_node_metrics(f"{node_id}:2181")
         details = f"{action} executed on {node_id}"
@@ -743,13 +1648,301 @@ async def api_node_action(node_id: str, action: str, request: Request) -> Dict[s
 
 
 @app.get("/api/tasks")
-def api_tasks(limit: int = 100) -> List[Dict[str, Any]]:
-    return db.list_tasks(limit=limit)
+def api_tasks(limit: int = 100, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    return db.list_tasks(limit=limit, status=status)
+
+
+@app.get("/api/tasks/summary")
+def api_tasks_summary() -> Dict[str, Any]:
+    return {"statuses": db.task_status_summary()}
+
+
+@app.get("/api/tasks/queue")
+async def api_task_queue() -> Dict[str, Any]:
+    manager: task_queue.TaskQueueManager = getattr(app.state, "task_queue", task_queue.TaskQueueManager())
+    return await asyncio.to_thread(manager.snapshot)
+
+
+@app.post("/api/tasks/queue")
+async def api_task_enqueue(payload: TaskEnqueueRequest) -> Dict[str, Any]:
+    body = {"job": payload.job, "duration": payload.duration, "fail_rate": payload.fail_rate}
+    try:
+        queued = await asyncio.to_thread(lambda: [task_queue.enqueue_task(dict(body)) for _ in range(payload.count)])
+    except Exception as exc:
+        logger.warning("Failed to enqueue tasks: %s", exc)
+        raise HTTPException(status_code=503, detail=f"任务入队失败: {exc}") from exc
+    db.record_operation(
+        action="task_enqueue",
+        status="success",
+        details=f"Enqueued {len(queued)} {payload.job} tasks",
+    )
+    return {"queued": queued}
+
+
+@app.post("/api/tasks/queue/benchmark")
+async def api_task_queue_benchmark(payload: TaskQueueBenchmarkRequest) -> Dict[str, Any]:
+    try:
+        result = await asyncio.to_thread(
+            task_queue.run_benchmark,
+            tasks=payload.tasks,
+            concurrency=payload.concurrency,
+            task_duration_ms=payload.task_duration_ms,
+        )
+    except Exception as exc:
+        logger.exception("Task queue benchmark failed: %s", exc)
+        db.record_operation(action="task_queue_benchmark", status="error", details=str(exc))
+        raise HTTPException(status_code=500, detail=f"任务队列压测失败: {exc}") from exc
+    task_queue_throughput_gauge.set(result["tasks_per_second"])
+    for quantile in ("p50", "p90", "p99"):
+        task_queue_claim_latency_gauge.labels(quantile=quantile).set(result["claim_latency_ms"][quantile])
+    db.record_operation(
+        action="task_queue_benchmark",
+        status="success" if not result["timed_out"] else "error",
+        after_metrics={key: value for key, value in result.items() if key != "per_worker"},
+        details=(
+            f"{result['completed']}/{result['tasks']} tasks in {result['elapsed_seconds']}s "
+            f"({result['tasks_per_second']} tasks/s, claim p99 {result['claim_latency_ms']['p99']}ms)"
+        ),
+    )
+    return result
+
+
+def _update_znode_load_metrics() -> Optional[Dict[str, Any]]:
+    if _znode_load is None:
+        return None
+    snapshot = _znode_load.snapshot()
+    for op, result in snapshot["operations"].items():
+        znode_load_throughput_gauge.labels(op=op).set(result["ops_per_second"])
+        for quantile in ("p50", "p99", "p999"):
+            znode_load_latency_gauge.labels(op=op, quantile=quantile).set(result["latency_ms"][quantile])
+    return snapshot
+
+
+@app.post("/api/workload/znode-load")
+def api_znode_load_start(payload: ZnodeLoadRequest, request: Request) -> Dict[str, Any]:
+    global _znode_load
+    if _znode_load is not None and _znode_load.state == "running":
+        raise HTTPException(status_code=409, detail="已有 znode 压测正在运行")
+    unknown = set(payload.mix) - set(znode_load.OPERATIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的操作类型: {', '.join(sorted(unknown))}")
+    try:
+        generator = znode_load.ZnodeLoadGenerator(
+            rate=payload.rate,
+            duration=payload.duration_seconds,
+            mix=payload.mix,
+            payload_bytes=payload.payload_bytes,
+            concurrency=payload.concurrency,
+            prefill=payload.prefill,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _znode_load = generator
+    generator.start()
+    db.record_operation(
+        action="znode_load_start",
+        status="success",
+        actor=request.headers.get("X-Demo-User", "web"),
+        details=f"run {generator.run_id}: {payload.rate} ops/s for {payload.duration_seconds}s, mix {generator.mix}",
+    )
+    return generator.snapshot()
+
+
+@app.get("/api/workload/znode-load")
+def api_znode_load_status() -> Dict[str, Any]:
+    snapshot = _update_znode_load_metrics()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="尚未运行 znode 压测")
+    return snapshot
+
+
+@app.delete("/api/workload/znode-load")
+def api_znode_load_stop() -> Dict[str, Any]:
+    if _znode_load is None:
+        raise HTTPException(status_code=404, detail="尚未运行 znode 压测")
+    _znode_load.stop()
+    _znode_load.join(timeout=settings.zk_command_timeout * 4)
+    snapshot = _update_znode_load_metrics() or {}
+    db.record_operation(
+        action="znode_load_stop",
+        status="success" if snapshot.get("state") != "error" else "error",
+        after_metrics={key: value for key, value in snapshot.items() if key != "operations"},
+        details=f"run {snapshot.get('run_id')}: {snapshot.get('completed')} ops at {snapshot.get('ops_per_second')} ops/s",
+    )
+    return snapshot
+
+
+def _update_watch_bench_metrics() -> Optional[Dict[str, Any]]:
+    if _watch_bench is None:
+        return None
+    snapshot = _watch_bench.snapshot()
+    watch_armed_gauge.set(snapshot["armed_watches"] if snapshot["state"] == "running" else 0)
+    for kind, result in snapshot["types"].items():
+        for quantile in ("p50", "p99", "p999"):
+            watch_latency_gauge.labels(type=kind, quantile=quantile).set(result["latency_ms"][quantile])
+    return snapshot
+
+
+@app.post("/api/workload/watch-bench")
+def api_watch_bench_start(payload: WatchBenchRequest, request: Request) -> Dict[str, Any]:
+    global _watch_bench
+    if _watch_bench is not None and _watch_bench.state == "running":
+        raise HTTPException(status_code=409, detail="已有 watch 压测正在运行")
+    if payload.fanout > payload.sessions:
+        raise HTTPException(status_code=400, detail="fanout 不能大于会话数")
+    try:
+        bench = watch_bench.WatchFanoutBenchmark(
+            sessions=payload.sessions,
+            znodes=payload.znodes,
+            fanout=payload.fanout,
+            watch_types=payload.watch_types,
+            mutation_rate=payload.mutation_rate,
+            duration=payload.duration_seconds,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _watch_bench = bench
+    bench.start()
+    db.record_operation(
+        action="watch_bench_start",
+        status="success",
+        actor=request.headers.get("X-Demo-User", "web"),
+        details=(
+            f"run {bench.run_id}: {bench.armed_watches} watches over {payload.sessions} sessions, "
+            f"{payload.mutation_rate} mutations/s for {payload.duration_seconds}s"
+        ),
+    )
+    return bench.snapshot()
+
+
+@app.get("/api/workload/watch-bench")
+def api_watch_bench_status() -> Dict[str, Any]:
+    snapshot = _update_watch_bench_metrics()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="尚未运行 watch 压测")
+    return snapshot
+
+
+@app.delete("/api/workload/watch-bench")
+def api_watch_bench_stop() -> Dict[str, Any]:
+    if _watch_bench is None:
+        raise HTTPException(status_code=404, detail="尚未运行 watch 压测")
+    _watch_bench.stop()
+    _watch_bench.join(timeout=settings.zk_command_timeout * 4)
+    snapshot = _update_watch_bench_metrics() or {}
+    db.record_operation(
+        action="watch_bench_stop",
+        status="success" if snapshot.get("state") != "error" else "error",
+        after_metrics={key: value for key, value in snapshot.items() if key != "types"},
+        details=f"run {snapshot.get('run_id')} stopped in phase {snapshot.get('phase')}",
+    )
+    return snapshot
+
+
+@app.post("/api/benchmarks/payloads")
+async def api_payload_benchmark(payload: PayloadBenchmarkRequest, request: Request) -> Dict[str, Any]:
+    unknown = set(payload.modes) - {payloads.BASELINE_MODE, *payloads.PAYLOAD_MODES}
+    if unknown or not payload.modes:
+        raise HTTPException(status_code=400, detail=f"不支持的内容模式: {', '.join(sorted(unknown)) or '空'}")
+    result = await asyncio.to_thread(
+        payloads.benchmark,
+        modes=list(dict.fromkeys(payload.modes)),
+        count=payload.count,
+        size_kb=payload.size_kb,
+    )
+    db.record_operation(
+        action="payload_benchmark",
+        status="success",
+        actor=request.headers.get("X-Demo-User", "web"),
+        after_metrics=result,
+        details=", ".join(f"{mode} {entry['mb_per_second']} MB/s" for mode, entry in result["modes"].items()),
+    )
+    return result
+
+
+@app.post("/api/benchmarks/zk-reads")
+async def api_zk_read_benchmark(payload: ZkReadBenchmarkRequest, request: Request) -> Dict[str, Any]:
+    if any(level < 1 or level > 10000 for level in payload.concurrency):
+        raise HTTPException(status_code=400, detail="并发数必须在 1 到 10000 之间")
+    result = await asyncio.to_thread(
+        zk_bulk.benchmark,
+        znodes=payload.znodes,
+        concurrency=list(dict.fromkeys(payload.concurrency)),
+        rtt_ms=payload.rtt_ms,
+        service_us=payload.service_us,
+    )
+    db.record_operation(
+        action="zk_read_benchmark",
+        status="success",
+        actor=request.headers.get("X-Demo-User", "web"),
+        after_metrics=result,
+        details=", ".join(f"{name} {entry['reads_per_second']} reads/s" for name, entry in result["results"].items()),
+    )
+    return result
+
+
+@app.post("/api/benchmarks/logging")
+async def api_logging_benchmark(payload: LoggingBenchmarkRequest, request: Request) -> Dict[str, Any]:
+    result = await asyncio.to_thread(log_pipeline.benchmark, records=payload.records)
+    result["pipeline"] = log_pipeline.stats()
+    db.record_operation(
+        action="logging_benchmark",
+        status="success",
+        actor=request.headers.get("X-Demo-User", "web"),
+        after_metrics=result["results"],
+        details=", ".join(f"{name} {entry['caller_us_per_record']} us/record" for name, entry in result["results"].items()),
+    )
+    return result
+
+
+@app.post("/api/benchmarks/failover")
+async def api_failover_benchmark(payload: FailoverBenchmarkRequest, request: Request) -> Dict[str, Any]:
+    if _failover_lock.locked():
+        raise HTTPException(status_code=409, detail="已有故障切换压测正在运行")
+    if not payload.local and not settings.docker_control_enabled:
+        raise HTTPException(status_code=400, detail="Docker 控制未启用, 请使用 local 模式")
+    actor = request.headers.get("X-Demo-User", "web")
+    async with _failover_lock:
+        try:
+            result = await asyncio.to_thread(
+                failover.run_failover_benchmark,
+                repeats=payload.repeats,
+                local=payload.local,
+                poll_interval_ms=payload.poll_interval_ms,
+                timeout=payload.timeout_seconds,
+            )
+        except Exception as exc:
+            logger.exception("Failover benchmark failed: %s", exc)
+            db.record_operation(action="failover_benchmark", status="error", actor=actor, details=str(exc))
+            raise HTTPException(status_code=500, detail=f"故障切换压测失败: {exc}") from exc
+    for phase in ("new_leader_ms", "full_quorum_ms"):
+        for quantile in ("p50", "p90", "p99", "max"):
+            failover_latency_gauge.labels(phase=phase.removesuffix("_ms"), quantile=quantile).set(result[phase][quantile])
+    db.record_operation(
+        action="failover_benchmark",
+        status="success" if result["completed"] == result["repeats"] else "error",
+        actor=actor,
+        after_metrics={key: value for key, value in result.items() if key != "rounds"},
+        details=(
+            f"{result['completed']}/{result['repeats']} {result['mode']} failovers, "
+            f"new leader p50 {result['new_leader_ms']['p50']}ms p99 {result['new_leader_ms']['p99']}ms, "
+            f"full quorum p50 {result['full_quorum_ms']['p50']}ms"
+        ),
+    )
+    if not payload.local:
+        await refresh_metrics()
+    return result
 
 
 @app.get("/api/logs/search")
-async def api_search_logs(query: Optional[str] = None, service: Optional[str] = None, size: int = 50) -> List[Dict[str, Any]]:
-    return await search_logs(query=query, service=service, size=size)
+async def api_search_logs(
+    query: Optional[str] = None,
+    service: Optional[str] = None,
+    size: int = 50,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    return await search_logs(query=query, service=service, size=size, start=start, end=end)
 
 
 @app.get("/api/logs/zookeeper/{node_id}")
@@ -763,15 +1956,37 @@ def api_zk_logs(node_id: str, tail: int = 200) -> Dict[str, Any]:
     return {"node": node_id, "tail": tail, "logs": logs}
 
 
-@app.get("/api/files/{file_id}/download")
-def api_download_file(file_id: int) -> FileResponse:
+@app.api_route("/api/files/{file_id}/download", methods=["GET", "HEAD"])
+def api_download_file(file_id: int, request: Request) -> Response:
     record = db.get_file(file_id)
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
-    path = Path(record["path"])
-    if not path.exists():
+    drained_nodes = {node for node, info in db.get_node_states().items() if info.get("drained")}
+    with _downloads_lock:
+        active = dict(_active_downloads)
+    try:
+        node, path = storage.select_read_copy(record, unavailable=drained_nodes | _down_nodes, active=active)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File missing on disk")
-    return FileResponse(path, filename=record["filename"])
+
+    def on_complete(sent: int, elapsed: float, status_code: int) -> None:
+        with _downloads_lock:
+            _active_downloads[node] = max(_active_downloads.get(node, 1) - 1, 0)
+            active_downloads_gauge.labels(node=node).set(_active_downloads[node])
+        download_bytes_counter.labels(node=node).inc(sent)
+        download_requests_counter.labels(node=node, status=str(status_code)).inc()
+        if elapsed > 0 and sent > 0:
+            download_throughput_gauge.labels(node=node).set(sent / elapsed)
+
+    response = downloads.build_download_response(request, record, path, on_complete=on_complete)
+    if isinstance(response, downloads.RangeFileResponse):
+        with _downloads_lock:
+            _active_downloads[node] = _active_downloads.get(node, 0) + 1
+            active_downloads_gauge.labels(node=node).set(_active_downloads[node])
+    else:
+        download_requests_counter.labels(node=node, status=str(response.status_code)).inc()
+    response.headers["x-served-by"] = node
+    return response
 
 
 @app.get("/api/cluster/metrics")
@@ -780,11 +1995,128 @@ async def api_cluster_metrics() -> Dict[str, Any]:
     return status
 
 
+@app.get("/api/cluster/history")
+def api_cluster_history(
+    node: Optional[str] = None,
+    metrics: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    buckets: int = 60,
+) -> Dict[str, Any]:
+    # Naive and aware datetimes cannot be compared; epoch seconds always can.
+    start_ts = metrics_history.to_epoch(start) if start is not None else None
+    end_ts = metrics_history.to_epoch(end) if end is not None else None
+    if start_ts is not None and end_ts is not None and start_ts > end_ts:
+        raise HTTPException(status_code=400, detail="开始时间不能晚于结束时间")
+    return cluster_history.query(
+        nodes=[item.strip() for item in node.split(",")] if node else None,
+        metrics=[item.strip() for item in metrics.split(",")] if metrics else None,
+        start=start_ts,
+        end=end_ts,
+        buckets=min(max(buckets, 1), 1000),
+    )
+
+
+@app.get("/api/reconcile")
+def api_reconcile_status() -> Dict[str, Any]:
+    return {"progress": drift_reconciler.progress, "last_report": drift_reconciler.last_report}
+
+
+@app.post("/api/reconcile")
+async def api_reconcile_run(payload: ReconcileRequest, request: Request) -> Dict[str, Any]:
+    if drift_reconciler.running:
+        raise HTTPException(status_code=409, detail="已有一致性检查正在运行")
+    try:
+        report = await asyncio.to_thread(drift_reconciler.run, repair=payload.repair, dry_run=payload.dry_run)
+    except reconciler.ReconcileInProgress as exc:
+        raise HTTPException(status_code=409, detail="已有一致性检查正在运行") from exc
+    except zookeeper_utils.ZooKeeperUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ZooKeeper 不可用: {exc}") from exc
+    _update_drift_metrics(report)
+    if report["mode"] == "repair":
+        repairs = report["repairs"]
+        db.record_operation(
+            action="reconcile",
+            status="success" if not repairs["failed"] else "error",
+            actor=request.headers.get("X-Demo-User", "web"),
+            after_metrics={"counts": report["counts"], "repairs": repairs},
+            details=(
+                f"{report['total_drift']} drifted items, {repairs['applied']} repaired, "
+                f"{repairs['skipped']} skipped, {repairs['failed']} failed"
+            ),
+        )
+    return report
+
+
+@app.get("/api/config/runtime")
+def api_runtime_config() -> Dict[str, Any]:
+    return runtime_settings.snapshot()
+
+
+@app.put("/api/config/runtime")
+async def api_update_runtime_config(payload: RuntimeConfigUpdate, request: Request) -> Dict[str, Any]:
+    actor = request.headers.get("X-Demo-User", "web")
+    try:
+        result = await asyncio.to_thread(runtime_settings.update, payload.values, actor=actor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except zookeeper_utils.ZooKeeperUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"ZooKeeper 不可用: {exc}") from exc
+    except runtime_config.ConfigConflict as exc:
+        raise HTTPException(status_code=409, detail="配置被并发修改, 请重试") from exc
+    changes = result["changes"]
+    if changes:
+        db.record_operation(
+            action="runtime_config",
+            status="success",
+            actor=actor,
+            before_metrics={name: change["before"] for name, change in changes.items()},
+            after_metrics={name: change["after"] for name, change in changes.items()},
+            details=f"Runtime config version {result['config']['version']}: "
+            + ", ".join(f"{name} {change['before']} -> {change['after']}" for name, change in changes.items()),
+        )
+    return result
+
+
+@app.get("/debug/profiles")
+def debug_profiles() -> Dict[str, Any]:
+    return request_profiler.snapshot()
+
+
+@app.get("/debug/profiles/{profile_id}")
+def debug_profile_download(profile_id: str, format: str = "pstats", sort: str = "cumulative") -> Response:
+    if request_profiler.get(profile_id) is None:
+        raise HTTPException(status_code=404, detail="性能剖析记录不存在或已被淘汰")
+    if format == "text":
+        try:
+            report = request_profiler.report(profile_id, sort=sort)
+        except KeyError as exc:
+            raise HTTPException(status_code=400, detail=f"不支持的排序字段 {sort}") from exc
+        return Response(report or "", media_type="text/plain; charset=utf-8")
+    if format != "pstats":
+        raise HTTPException(status_code=400, detail="format 仅支持 pstats / text")
+    return Response(
+        request_profiler.dump(profile_id) or b"",
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+    )
+
+
+@app.delete("/debug/profiles")
+def debug_profiles_clear() -> Dict[str, int]:
+    return {"removed": request_profiler.clear()}
+
+
 @app.get("/api/ping")
 def api_ping() -> Dict[str, str]:
     return {"status": "ok", "time": datetime.utcnow().isoformat()}
 
 
+@app.get("/api/startup")
+def api_startup() -> Dict[str, Any]:
+    return startup_timer.report()
+
+
 @app.get("/healthz")
 def healthz() -> Dict[str, str]:
     return {"status": "ok"}
@@ -805,3 +2137,6 @@ def serve_html(filename: str) -> HTMLResponse:
     if html_path.exists() and html_path.is_file():
         return HTMLResponse(html_path.read_text(encoding="utf-8"))
     raise HTTPException(status_code=404, detail="Page not found")
+
+
+startup_timer.mark("import")
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# mntr keys sampled into the history, plus a synthetic 0/1 "up" series.
+DEFAULT_METRICS = (
+    "up",
+    "zk_avg_latency",
+    "zk_max_latency",
+    "zk_num_alive_connections",
+    "zk_outstanding_requests",
+    "zk_znode_count",
+    "zk_watch_count",
+    "zk_packets_received",
+    "zk_packets_sent",
+)
+NAN = float("nan")
+
+
+def to_epoch(value: datetime) -> float:
+    """Epoch seconds for a query bound; naive values are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class NodeSeries:
+    """Fixed-capacity ring of timestamps with one float array per metric."""
+
+    def __init__(self, capacity: int, metrics: Sequence[str]) -> None:
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = {metric: array("d", [NAN]) * capacity for metric in metrics}
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp: float, sample: Dict[str, Any]) -> None:
+        index = self.head
+        self.timestamps[index] = timestamp
+        for metric, values in self.values.items():
+            values[index] = _as_float(sample.get(metric))
+        self.head = (index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self, data: array) -> array:
+        # Rotate so index 0 is the oldest sample; slicing keeps this in C.
+        if self.count < self.capacity:
+            return data[: self.count]
+        return data[self.head:] + data[: self.head]
+
+    def window(self, start: Optional[float], end: Optional[float]) -> tuple:
+        timestamps = self.ordered(self.timestamps)
+        lo = bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        return timestamps, lo, hi
+
+
+class ClusterHistory:
+    def __init__(self, capacity: int, metrics: Iterable[str] = DEFAULT_METRICS) -> None:
+        self.capacity = max(1, capacity)
+        self.metrics = tuple(metrics)
+        self._series: Dict[str, NodeSeries] = {}
+        self._lock = threading.Lock()
+        self.last_sample_at = 0.0
+
+    def record(self, status: Dict[str, Any]) -> None:
+        timestamp = float(status.get("timestamp") or time.time())
+        with self._lock:
+            for node_info in status.get("nodes", []):
+                node = node_info.get("node") or node_info.get("endpoint")
+                if not node:
+                    continue
+                series = self._series.get(node)
+                if series is None:
+                    series = self._series[node] = NodeSeries(self.capacity, self.metrics)
+                sample = dict(node_info)
+                sample["up"] = 0 if str(node_info.get("state", "down")).lower() == "down" else 1
+                series.append(timestamp, sample)
+            self.last_sample_at = timestamp
+
+    def query(
+        self,
+        *,
+        nodes: Optional[Iterable[str]] = None,
+        metrics: Optional[Iterable[str]] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        buckets: int = 60,
+    ) -> Dict[str, Any]:
+        """Return min/max/avg per time bucket for each node and metric in range."""
+        wanted = [metric for metric in (metrics or self.metrics) if metric in self.metrics]
+        buckets = max(1, buckets)
+        result: Dict[str, Any] = {}
+        with self._lock:
+            selected = {node: series for node, series in self._series.items() if not nodes or node in nodes}
+            for node, series in selected.items():
+                timestamps, lo, hi = series.window(start, end)
+                if lo >= hi:
+                    result[node] = {"timestamps": [], "samples": 0, "series": {metric: {"min": [], "max": [], "avg": []} for metric in wanted}}
+                    continue
+                first = start if start is not None else timestamps[lo]
+                last = end if end is not None else timestamps[hi - 1]
+                width = (last - first) / buckets if last > first else 1.0
+                slots = [min(max(int((timestamps[i] - first) / width), 0), buckets - 1) for i in range(lo, hi)]
+                result[node] = {
+                    "timestamps": [round(first + width * bucket, 3) for bucket in range(buckets)],
+                    "samples": hi - lo,
+                    "series": {
+                        metric: _downsample(series.ordered(series.values[metric]), lo, slots, buckets)
+                        for metric in wanted
+                    },
+                }
+        return {"bucket_count": buckets, "metrics": wanted, "nodes": result}
+
+
+def _downsample(values: array, lo: int, slots: List[int], buckets: int) -> Dict[str, List[Optional[float]]]:
+    mins: List[Optional[float]] = [None] * buckets
+    maxs: List[Optional[float]] = [None] * buckets
+    sums = [0.0] * buckets
+    counts = [0] * buckets
+    for offset, slot in enumerate(slots):
+        value = values[lo + offset]
+        if math.isnan(value):
+            continue
+        current_min = mins[slot]
+        if current_min is None or value < current_min:
+            mins[slot] = value
+        current_max = maxs[slot]
+        if current_max is None or value > current_max:
+            maxs[slot] = value
+        sums[slot] += value
+        counts[slot] += 1
+    avgs = [round(sums[i] / counts[i], 3) if counts[i] else None for i in range(buckets)]
+    return {"min": mins, "max": maxs, "avg": avgs}
+
+
+def _as_float(value: Any) -> float:
+    if value is None:
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
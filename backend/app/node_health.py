@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+HEALTHY = "healthy"
+SUSPECT = "suspect"
+DOWN = "down"
+
+
+class NodeHealthTracker:
+    """Per-node healthy/suspect/down state machine with exponential probe backoff.
+
+    A failed probe makes a node suspect; ``down_after`` consecutive failures mark it
+    down. Down nodes are only probed again once their backoff expires, and each
+    further failure doubles the delay up to ``max_backoff``.
+    """
+
+    def __init__(self, *, down_after: int = 2, base_backoff: float = 1.0, max_backoff: float = 60.0) -> None:
+        self.down_after = max(1, down_after)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, node: str) -> Dict[str, Any]:
+        entry = self._nodes.get(node)
+        if entry is None:
+            entry = {
+                "state": HEALTHY,
+                "failures": 0,
+                "backoff": 0.0,
+                "next_probe_at": 0.0,
+                "last_error": None,
+                "last_success_at": None,
+                "last_failure_at": None,
+                "changed_at": time.time(),
+                "skipped_probes": 0,
+            }
+            self._nodes[node] = entry
+        return entry
+
+    def _set_state(self, entry: Dict[str, Any], state: str) -> None:
+        if entry["state"] != state:
+            entry["state"] = state
+            entry["changed_at"] = time.time()
+
+    def state(self, node: str) -> str:
+        with self._lock:
+            return self._entry(node)["state"]
+
+    def should_probe(self, node: str) -> bool:
+        """False while a down node is still inside its backoff window."""
+        with self._lock:
+            entry = self._entry(node)
+            if entry["state"] != DOWN or time.monotonic() >= entry["next_probe_at"]:
+                return True
+            entry["skipped_probes"] += 1
+            return False
+
+    def last_error(self, node: str) -> Optional[str]:
+        with self._lock:
+            return self._entry(node)["last_error"]
+
+    def record_success(self, node: str) -> None:
+        with self._lock:
+            entry = self._entry(node)
+            entry.update(failures=0, backoff=0.0, next_probe_at=0.0, last_error=None, last_success_at=time.time())
+            self._set_state(entry, HEALTHY)
+
+    def record_failure(self, node: str, error: str) -> None:
+        with self._lock:
+            entry = self._entry(node)
+            entry["failures"] += 1
+            entry["last_error"] = error
+            entry["last_failure_at"] = time.time()
+            if entry["state"] == DOWN or entry["failures"] >= self.down_after:
+                backoff = entry["backoff"] * 2 if entry["backoff"] else self.base_backoff
+                entry["backoff"] = min(backoff, self.max_backoff)
+                entry["next_probe_at"] = time.monotonic() + entry["backoff"]
+                self._set_state(entry, DOWN)
+            else:
+                self._set_state(entry, SUSPECT)
+
+    def mark_down(self, node: str, reason: str) -> None:
+        """Take a node out of rotation immediately, e.g. after stopping its container."""
+        with self._lock:
+            entry = self._entry(node)
+            entry.update(failures=self.down_after, last_error=reason, last_failure_at=time.time())
+            entry["backoff"] = self.base_backoff
+            entry["next_probe_at"] = time.monotonic() + self.base_backoff
+            self._set_state(entry, DOWN)
+
+    def reset_backoff(self, node: str) -> None:
+        """Probe on the next call, e.g. right after a container was started."""
+        with self._lock:
+            entry = self._entry(node)
+            entry["backoff"] = 0.0
+            entry["next_probe_at"] = 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for node, entry in self._nodes.items():
+                item = {key: value for key, value in entry.items() if key != "next_probe_at"}
+                item["next_probe_in"] = round(max(0.0, entry["next_probe_at"] - now), 3) if entry["state"] == DOWN else 0.0
+                result[node] = item
+            return result
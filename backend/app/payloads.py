@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+PAYLOAD_MODES = ("random", "compressible", "sparse", "fallocate")
+# The pre-change generator (os.urandom in 32 KiB chunks), kept for benchmark comparisons.
+BASELINE_MODE = "urandom"
+HASH_ALGORITHM = "sha256"
+
+RANDOM_POOL_BYTES = 8 * 1024 * 1024
+TEXT_POOL_BYTES = 1024 * 1024
+# Linux IOV_MAX; longer iovec lists are written in several writev calls.
+IOV_BATCH = 1024
+
+_POOLS: Dict[str, memoryview] = {}
+_POOL_LOCK = threading.Lock()
+_ZEROS = memoryview(bytes(1024 * 1024))
+
+_WORDS = (
+    "zookeeper", "session", "leader", "follower", "quorum", "znode", "watch", "ephemeral",
+    "sequential", "snapshot", "txnlog", "epoch", "zxid", "sync", "ack", "commit", "proposal",
+    "upload", "migrate", "replica", "node", "file", "chunk", "checksum", "latency", "ok",
+)
+_LEVELS = ("INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR")
+
+
+def _build_pool(mode: str) -> bytes:
+    if mode == "random":
+        return os.urandom(RANDOM_POOL_BYTES)
+    # Log-like text from a small vocabulary; zlib shrinks it 3-4x.
+    rng = random.Random(0x5EED)
+    lines: List[str] = []
+    size = 0
+    sequence = 0
+    while size < TEXT_POOL_BYTES:
+        sequence += 1
+        line = f"{sequence:08d} {rng.choice(_LEVELS)} {' '.join(rng.choices(_WORDS, k=8))} {rng.randrange(1 << 20)}\n"
+        lines.append(line)
+        size += len(line)
+    return "".join(lines).encode("ascii")[:TEXT_POOL_BYTES]
+
+
+def _pool(mode: str) -> memoryview:
+    """The shared content pool for a mode, generated once per process."""
+    pool = _POOLS.get(mode)
+    if pool is None:
+        with _POOL_LOCK:
+            pool = _POOLS.get(mode)
+            if pool is None:
+                pool = _POOLS[mode] = memoryview(_build_pool(mode))
+    return pool
+
+
+def _pool_views(pool: memoryview, offset: int, length: int) -> List[memoryview]:
+    """Zero-copy slices covering ``length`` bytes of the pool, wrapping at its end."""
+    views: List[memoryview] = []
+    while length > 0:
+        take = min(length, len(pool) - offset)
+        views.append(pool[offset:offset + take])
+        length -= take
+        offset = 0
+    return views
+
+
+def _write_all(fd: int, views: Sequence[memoryview]) -> None:
+    if not hasattr(os, "writev"):
+        for view in views:
+            while view:
+                view = view[os.write(fd, view):]
+        return
+    pending = [view for view in views if len(view)]
+    while pending:
+        written = os.writev(fd, pending[:IOV_BATCH])
+        # Drop what the kernel took; a short write leaves a partial view at the front.
+        while pending and written >= len(pending[0]):
+            written -= len(pending[0])
+            pending.pop(0)
+        if written:
+            pending[0] = pending[0][written:]
+
+
+def write_payload(path: Path, *, size_bytes: int, seed: str, mode: str = "random") -> str:
+    """Write ``size_bytes`` of synthetic content to ``path`` and return its sha256.
+
+    Every file starts with its seed (the file uuid), so no two files share content
+    and CAS never deduplicates demo files. ``random`` and ``compressible`` fill the
+    rest from a pre-generated pool starting at a seed-derived offset, handed to a
+    single ``writev`` as memoryview slices; ``sparse`` only extends the file with
+    ``ftruncate`` and ``fallocate`` reserves zeroed blocks without writing them.
+    """
+    if mode not in PAYLOAD_MODES:
+        raise ValueError(f"unknown payload mode {mode!r}")
+    header = memoryview(seed.encode("utf-8")[:size_bytes])
+    body = size_bytes - len(header)
+    digest = hashlib.new(HASH_ALGORITHM)
+    digest.update(header)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if mode in ("sparse", "fallocate"):
+            _write_all(fd, [header])
+            if mode == "fallocate" and hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(fd, 0, size_bytes)
+                except OSError as exc:
+                    # e.g. EOPNOTSUPP on some overlay filesystems.
+                    logger.debug("fallocate unsupported for %s, leaving it sparse: %s", path, exc)
+                    os.ftruncate(fd, size_bytes)
+            else:
+                os.ftruncate(fd, size_bytes)
+            remaining = body
+            while remaining > 0:
+                take = min(remaining, len(_ZEROS))
+                digest.update(_ZEROS[:take])
+                remaining -= take
+        else:
+            pool = _pool(mode)
+            views = _pool_views(pool, int(seed[:12], 16) % len(pool) if body else 0, body)
+            for view in views:
+                digest.update(view)
+            _write_all(fd, [header, *views])
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+
+def _write_baseline(path: Path, size_bytes: int) -> str:
+    digest = hashlib.new(HASH_ALGORITHM)
+    remaining = size_bytes
+    with path.open("wb") as out_f:
+        while remaining > 0:
+            chunk = os.urandom(min(remaining, 32 * 1024))
+            digest.update(chunk)
+            out_f.write(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def benchmark(*, modes: Sequence[str], count: int, size_kb: int, directory: Optional[Path] = None) -> Dict[str, Any]:
+    """Time ``count`` files of ``size_kb`` per mode in a scratch directory.
+
+    Pools are built before timing starts (their one-off cost is reported
+    separately). Besides throughput each mode reports the blocks actually
+    allocated on disk and the zlib ratio of its first file, which shows what the
+    sparse and compressible modes trade for their speed.
+    """
+    size_bytes = max(size_kb, 1) * 1024
+    parent = directory or SETTINGS.file_storage_path
+    parent.mkdir(parents=True, exist_ok=True)
+    pool_seconds: Dict[str, float] = {}
+    for mode in modes:
+        if mode in ("random", "compressible") and mode not in _POOLS:
+            began = time.perf_counter()
+            _pool(mode)
+            pool_seconds[mode] = round(time.perf_counter() - began, 4)
+    results: Dict[str, Dict[str, Any]] = {}
+    # Dot-prefixed so the reconciler and node listings ignore it.
+    scratch = Path(tempfile.mkdtemp(prefix=".payload-bench-", dir=parent))
+    try:
+        for mode in modes:
+            if mode != BASELINE_MODE and mode not in PAYLOAD_MODES:
+                raise ValueError(f"unknown payload mode {mode!r}")
+            paths = [scratch / f"{mode}-{index:05d}.bin" for index in range(count)]
+            seeds = [os.urandom(16).hex() for _ in paths]
+            began = time.perf_counter()
+            for path, seed in zip(paths, seeds):
+                if mode == BASELINE_MODE:
+                    _write_baseline(path, size_bytes)
+                else:
+                    write_payload(path, size_bytes=size_bytes, seed=seed, mode=mode)
+            elapsed = max(time.perf_counter() - began, 1e-9)
+            allocated = sum(path.stat().st_blocks * 512 for path in paths)
+            with paths[0].open("rb") as sample_f:
+                sample = sample_f.read(1024 * 1024)
+            results[mode] = {
+                "seconds": round(elapsed, 4),
+                "files_per_second": round(count / elapsed, 2),
+                "mb_per_second": round(count * size_bytes / elapsed / (1024 * 1024), 2),
+                "allocated_bytes": allocated,
+                "compression_ratio": round(len(sample) / max(len(zlib.compress(sample, 1)), 1), 2),
+            }
+            for path in paths:
+                path.unlink()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    baseline = results.get(BASELINE_MODE)
+    if baseline:
+        for mode, result in results.items():
+            result["speedup"] = round(result["mb_per_second"] / baseline["mb_per_second"], 2) if baseline["mb_per_second"] else None
+    return {
+        "count": count,
+        "size_bytes": size_bytes,
+        "logical_bytes": count * size_bytes,
+        "pool_build_seconds": pool_seconds,
+        "modes": results,
+    }
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+SETTINGS = get_settings()
+
+PROFILE_MODES = ("off", "sample", "full")
+TOP_FUNCTIONS = 15
+
+# pstats keys functions by (filename, first line, name).
+FuncKey = Tuple[str, int, str]
+
+
+def _func_key(frame: Any) -> FuncKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _is_idle(stack: List[Any]) -> bool:
+    """Threads parked waiting for work: the event loop in select(), pool workers on
+    an empty queue, kazoo's connection thread. Sampling them only adds noise."""
+    leaf = stack[-1].f_code
+    if leaf.co_name in ("select", "poll") and leaf.co_filename.endswith("selectors.py"):
+        return True
+    # asyncio.to_thread workers block in SimpleQueue.get, which has no Python frame.
+    if leaf.co_name == "_worker" and leaf.co_filename.endswith(("concurrent/futures/thread.py", "concurrent\\futures\\thread.py")):
+        return True
+    return any(frame.f_code.co_name == "get" and frame.f_code.co_filename.endswith("queue.py") for frame in stack[-3:])
+
+
+class _SampleCollector:
+    """Stack samples for one request, folded into pstats' (cc, nc, tt, ct, callers)."""
+
+    def __init__(self) -> None:
+        self.samples = 0
+        self.stats: Dict[FuncKey, List[Any]] = {}
+
+    def add(self, stacks: List[List[Any]], weight: float) -> None:
+        self.samples += 1
+        for stack in stacks:
+            seen = set()
+            caller: Optional[FuncKey] = None
+            for frame in stack:
+                key = _func_key(frame)
+                entry = self.stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                # Count a recursive function once per sample for its inclusive time.
+                if key not in seen:
+                    seen.add(key)
+                    entry[0] += 1
+                    entry[1] += 1
+                    entry[3] += weight
+                    if caller is not None:
+                        edge = entry[4].setdefault(caller, [0, 0, 0.0, 0.0])
+                        edge[0] += 1
+                        edge[1] += 1
+                        edge[3] += weight
+                caller = key
+            if caller is not None:
+                self.stats[caller][2] += weight
+
+    def pstats_data(self) -> Dict[FuncKey, Tuple[Any, ...]]:
+        return {
+            key: (cc, nc, tt, ct, {caller: tuple(edge) for caller, edge in callers.items()})
+            for key, (cc, nc, tt, ct, callers) in self.stats.items()
+        }
+
+
+class _Sampler:
+    """One background thread that snapshots every thread's stack while any sampled
+    request is in flight, so the cost is shared however many are being profiled."""
+
+    def __init__(self) -> None:
+        self._collectors: Dict[int, _SampleCollector] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self) -> _SampleCollector:
+        collector = _SampleCollector()
+        with self._lock:
+            self._collectors[id(collector)] = collector
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+                self._thread.start()
+        self._active.set()
+        return collector
+
+    def end(self, collector: _SampleCollector) -> None:
+        with self._lock:
+            self._collectors.pop(id(collector), None)
+            if not self._collectors:
+                self._active.clear()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        last = 0.0
+        while True:
+            if not self._active.is_set():
+                self._active.wait()
+                last = time.perf_counter()
+            # Weight each sample by the time it actually covers; sleep overshoots.
+            now = time.perf_counter()
+            weight, last = now - last, now
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                stack.reverse()
+                if stack and not _is_idle(stack):
+                    stacks.append(stack)
+            with self._lock:
+                collectors = list(self._collectors.values())
+            for collector in collectors:
+                collector.add(stacks, weight)
+            time.sleep(max(SETTINGS.profile_interval_ms, 1) / 1000.0)
+
+
+class RequestProfiler:
+    """Profile requests and keep the slowest recent ones.
+
+    ``sample`` mode snapshots all busy threads every ``PROFILE_INTERVAL_MS``; it is
+    cheap and follows work handed to thread pools (ZooKeeper calls, SQLite), but
+    concurrent requests share samples. ``full`` mode runs cProfile on the event
+    loop thread, one request at a time, for exact call counts of async code. Only
+    requests that took at least ``PROFILE_THRESHOLD_MS`` are kept, the newest
+    ``PROFILE_STORE_SIZE`` of them. The mode and limits are read per request, so
+    they can be switched through the runtime config.
+    """
+
+    def __init__(self) -> None:
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._data: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._sampler = _Sampler()
+        self._full_busy = False
+        self._sequence = 0
+        self.counters = {"profiled": 0, "captured": 0, "skipped_busy": 0}
+
+    def begin(self) -> Optional[Tuple[str, Any]]:
+        mode = SETTINGS.profile_mode
+        if mode not in ("sample", "full") or random.random() >= SETTINGS.profile_sample_rate:
+            return None
+        if mode == "full":
+            # cProfile hooks the whole thread, so overlapping requests would mix.
+            if self._full_busy:
+                self.counters["skipped_busy"] += 1
+                return None
+            self._full_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return mode, profiler
+        return mode, self._sampler.begin()
+
+    def finish(self, handle: Tuple[str, Any], *, method: str, path: str, status: int, duration_ms: float) -> None:
+        mode, collector = handle
+        if mode == "full":
+            collector.disable()
+            self._full_busy = False
+        else:
+            self._sampler.end(collector)
+        self.counters["profiled"] += 1
+        if duration_ms < SETTINGS.profile_threshold_ms:
+            return
+        if mode == "full":
+            collector.create_stats()
+            stats_data = collector.stats
+            samples = None
+        else:
+            stats_data = collector.pstats_data()
+            samples = collector.samples
+        if not stats_data:
+            return
+        with self._lock:
+            self._sequence += 1
+            profile_id = f"{int(time.time())}-{self._sequence}"
+        record = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "mode": mode,
+            "duration_ms": round(duration_ms, 2),
+            "samples": samples,
+            "captured_at": time.time(),
+            "top": _top_functions(stats_data),
+        }
+        with self._lock:
+            self._profiles[profile_id] = record
+            self._data[profile_id] = marshal.dumps(stats_data)
+            while len(self._profiles) > max(SETTINGS.profile_store_size, 1):
+                evicted, _ = self._profiles.popitem(last=False)
+                self._data.pop(evicted, None)
+            self.counters["captured"] += 1
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def dump(self, profile_id: str) -> Optional[bytes]:
+        """The profile in the marshal format ``pstats.Stats(path)`` and snakeviz read."""
+        with self._lock:
+            return self._data.get(profile_id)
+
+    def report(self, profile_id: str, *, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        data = self.dump(profile_id)
+        if data is None:
+            return None
+        stats = pstats.Stats(_Loaded(marshal.loads(data)), stream=io.StringIO())
+        stats.sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._profiles)
+            self._profiles.clear()
+            self._data.clear()
+        return removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": SETTINGS.profile_mode,
+            "threshold_ms": SETTINGS.profile_threshold_ms,
+            "sample_rate": SETTINGS.profile_sample_rate,
+            "interval_ms": SETTINGS.profile_interval_ms,
+            "store_size": SETTINGS.profile_store_size,
+            **self.counters,
+            "profiles": self.list(),
+        }
+
+
+class ProfileMiddleware:
+    """Pure ASGI middleware feeding ``RequestProfiler``.
+
+    With profiling off a request costs one settings lookup before going straight
+    to the app. Profiled requests are timed until the last body chunk is sent, so
+    streamed responses count in full.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if SETTINGS.profile_mode == "off" or scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            return await self.app(scope, receive, send)
+        handle = self.profiler.begin()
+        if handle is None:
+            return await self.app(scope, receive, send)
+        began = time.perf_counter()
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.profiler.finish(
+                handle,
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=(time.perf_counter() - began) * 1000,
+            )
+
+
+class _Loaded:
+    """Adapter so pstats.Stats accepts already-loaded stats data."""
+
+    def __init__(self, stats: Dict[FuncKey, Tuple[Any, ...]]) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _top_functions(stats_data: Dict[FuncKey, Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    ranked = sorted(stats_data.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            "function": f"{name} ({filename}:{line})",
+            "calls": nc,
+            "self_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3),
+        }
+        for (filename, line, name), (_, nc, tt, ct, _callers) in ranked
+    ]
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import db, file_locks, storage, zk_bulk, zookeeper_utils
+from .config import get_settings
+
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+DRIFT_KINDS = (
+    "missing_znode",
+    "znode_mismatch",
+    "missing_on_disk",
+    "orphan_on_disk",
+    "stale_partial",
+    "orphan_znode",
+)
+SAMPLE_LIMIT = 50
+
+
+class ReconcileInProgress(RuntimeError):
+    """A reconcile pass is already running in this process."""
+
+
+class _Throttle:
+    """Pace work to ``rate`` items per second, sleeping between batches."""
+
+    def __init__(self, rate: float, stopping: threading.Event) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.stopping = stopping
+        self.next_at = time.monotonic()
+
+    def wait(self, items: int) -> None:
+        self.next_at = max(self.next_at, time.monotonic() - 1.0) + items * self.interval
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            self.stopping.wait(delay)
+
+
+class _Report:
+    def __init__(self, *, repair: bool, dry_run: bool) -> None:
+        self.repair = repair
+        self.dry_run = dry_run
+        self.started_at = time.time()
+        self.counts = {kind: 0 for kind in DRIFT_KINDS}
+        self.samples: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in DRIFT_KINDS}
+        self.scanned = {"db_files": 0, "disk_entries": 0, "znodes": 0}
+        self.repairs = {"planned": 0, "applied": 0, "skipped": 0, "failed": 0}
+
+    def add(self, kind: str, detail: Dict[str, Any], action: Optional[str] = None, fix: Optional[Callable[[], bool]] = None) -> None:
+        self.counts[kind] += 1
+        if self.repair and fix is not None:
+            if self.dry_run:
+                self.repairs["planned"] += 1
+            else:
+                try:
+                    detail["repaired"] = fix()
+                except (file_locks.FileLockTimeout, zookeeper_utils.ZooKeeperUnavailable) as exc:
+                    # Locked or unreachable right now; the next pass picks it up again.
+                    detail["repaired"] = False
+                    detail["error"] = str(exc)
+                    self.repairs["skipped"] += 1
+                except Exception as exc:
+                    logger.warning("Reconcile repair of %s %s failed: %s", kind, detail, exc)
+                    detail["repaired"] = False
+                    detail["error"] = str(exc)
+                    self.repairs["failed"] += 1
+                else:
+                    self.repairs["applied" if detail["repaired"] else "skipped"] += 1
+        if len(self.samples[kind]) < SAMPLE_LIMIT:
+            if action is not None:
+                detail["action"] = action
+            self.samples[kind].append(detail)
+
+    def to_dict(self) -> Dict[str, Any]:
+        finished = time.time()
+        return {
+            "mode": "repair" if self.repair and not self.dry_run else ("dry_run" if self.repair else "scan"),
+            "started_at": self.started_at,
+            "finished_at": finished,
+            "duration_seconds": round(finished - self.started_at, 3),
+            "scanned": self.scanned,
+            "counts": self.counts,
+            "total_drift": sum(self.counts.values()),
+            "repairs": self.repairs if self.repair else None,
+            "samples": self.samples,
+        }
+
+
+class Reconciler:
+    """Compare the ``files`` table, the file znodes and the node directories.
+
+    A pass walks the table with an id cursor in ``reconcile_batch_size`` pages,
+    reading each page's znodes with pipelined ``get_async`` calls and stat'ing
+    the paths on disk; then scans every node directory with ``os.scandir`` and
+    finally lists the znode children not seen in the table. Each batch is
+    throttled to ``reconcile_rate`` items per second so a pass never competes
+    with uploads for disk or ZooKeeper. Anything created within the grace period
+    is left alone, since an upload may be between its disk, DB and znode writes.
+
+    Repairs run per finding under the file's lock (never waiting on it):
+    missing znodes are re-registered from the table, a file whose primary copy is
+    gone is promoted from a ready replica or dropped, and orphaned disk files,
+    stale ``.part`` files and orphaned znodes are deleted.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.progress: Dict[str, Any] = {"running": False}
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self, *, repair: bool = False, dry_run: bool = True) -> Dict[str, Any]:
+        if not self._lock.acquire(blocking=False):
+            raise ReconcileInProgress("a reconcile pass is already running")
+        self._stopping.clear()
+        report = _Report(repair=repair, dry_run=dry_run)
+        self.progress = {"running": True, "phase": "db", "processed": 0, "started_at": report.started_at}
+        try:
+            client = zookeeper_utils.get_kazoo_client()
+            throttle = _Throttle(SETTINGS.reconcile_rate, self._stopping)
+            cutoff = time.time() - SETTINGS.reconcile_grace_seconds
+            referenced, db_uuids = self._scan_db(client, report, throttle)
+            self.progress["phase"] = "disk"
+            self._scan_disk(referenced, report, throttle, cutoff)
+            self.progress["phase"] = "zk"
+            self._scan_znodes(client, db_uuids, report, throttle, cutoff)
+            result = report.to_dict()
+            result["stopped"] = self._stopping.is_set()
+            self.last_report = result
+            logger.info(
+                "Reconcile %s pass finished in %ss: %s",
+                result["mode"], result["duration_seconds"],
+                {kind: count for kind, count in result["counts"].items() if count} or "no drift",
+            )
+            return result
+        finally:
+            self.progress = {"running": False}
+            self._lock.release()
+
+    def _advance(self, items: int, throttle: _Throttle) -> None:
+        self.progress["processed"] += items
+        throttle.wait(items)
+
+    # -- files table -> znodes and disk ------------------------------------
+
+    def _scan_db(self, client: KazooClient, report: _Report, throttle: _Throttle) -> Tuple[Set[str], Set[str]]:
+        referenced: Set[str] = set()
+        db_uuids: Set[str] = set()
+        last_id = 0
+        while not self._stopping.is_set():
+            batch = db.get_files_after(last_id, SETTINGS.reconcile_batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]["id"]
+            znodes = _read_znodes(client, [record["uuid"] for record in batch])
+            replica_map = db.get_replica_map(record["id"] for record in batch)
+            for record, znode in zip(batch, znodes):
+                db_uuids.add(record["uuid"])
+                referenced.add(os.path.normpath(record["path"]))
+                replicas = replica_map.get(record["id"], [])
+                referenced.update(os.path.normpath(item["path"]) for item in replicas if item["path"])
+                self._check_record(record, znode, replicas, report)
+            report.scanned["db_files"] += len(batch)
+            self._advance(len(batch), throttle)
+        return referenced, db_uuids
+
+    def _check_record(
+        self,
+        record: Dict[str, Any],
+        znode: Optional[Dict[str, Any]],
+        replicas: List[Dict[str, Any]],
+        report: _Report,
+    ) -> None:
+        summary = {"id": record["id"], "uuid": record["uuid"], "filename": record["filename"], "node": record["node"]}
+        if not os.path.exists(record["path"]):
+            promotable = [
+                item for item in replicas
+                if item["status"] == "ready" and item["path"] and item["node"] != record["node"] and os.path.exists(item["path"])
+            ]
+            action = f"promote replica on {promotable[0]['node']}" if promotable else "delete record and znode"
+            report.add("missing_on_disk", {**summary, "path": record["path"]}, action, lambda: _repair_missing_file(record))
+            return
+        if znode is None:
+            report.add("missing_znode", summary, "register znode", lambda: _reregister(record))
+        elif znode.get("node") != record["node"] or znode.get("path") != record["path"]:
+            detail = {**summary, "path": record["path"], "znode_node": znode.get("node"), "znode_path": znode.get("path")}
+            report.add("znode_mismatch", detail, "rewrite znode", lambda: _reregister(record))
+
+    # -- node directories -> files table -------------------------------------
+
+    def _scan_disk(self, referenced: Set[str], report: _Report, throttle: _Throttle, cutoff: float) -> None:
+        root = SETTINGS.file_storage_path
+        nodes = {node.split(":")[0] for node in SETTINGS.zk_nodes}
+        try:
+            nodes.update(entry.name for entry in os.scandir(root) if entry.is_dir() and not entry.name.startswith("."))
+        except FileNotFoundError:
+            return
+        for node in sorted(nodes):
+            entries = _iter_node_files(root / node)
+            while not self._stopping.is_set():
+                batch = list(islice(entries, SETTINGS.reconcile_batch_size))
+                if not batch:
+                    break
+                for entry, partial in batch:
+                    self._check_entry(node, entry, partial, referenced, report, cutoff)
+                report.scanned["disk_entries"] += len(batch)
+                self._advance(len(batch), throttle)
+
+    def _check_entry(
+        self,
+        node: str,
+        entry: os.DirEntry,
+        partial: bool,
+        referenced: Set[str],
+        report: _Report,
+        cutoff: float,
+    ) -> None:
+        if not partial and os.path.normpath(entry.path) in referenced:
+            return
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        if _changed_at(stat) > cutoff:
+            return
+        detail = {"node": node, "path": entry.path, "size": stat.st_size, "mtime": stat.st_mtime}
+        if partial:
+            report.add("stale_partial", detail, "delete file", lambda: _unlink(entry.path))
+        else:
+            blob = db.get_blob(entry.path)
+            refcount = blob["refcount"] if blob is not None else None
+            report.add("orphan_on_disk", detail, "delete file", lambda: _remove_orphan(entry.path, cutoff, refcount))
+
+    # -- znodes -> files table -----------------------------------------------
+
+    def _scan_znodes(self, client: KazooClient, db_uuids: Set[str], report: _Report, throttle: _Throttle, cutoff: float) -> None:
+        if self._stopping.is_set() or not client.exists(SETTINGS.zk_root_path):
+            return
+        children = [
+            child for child in client.get_children(SETTINGS.zk_root_path)
+            if child not in zookeeper_utils.RESERVED_CHILDREN
+        ]
+        report.scanned["znodes"] = len(children)
+        candidates = iter(child for child in children if child not in db_uuids)
+        while not self._stopping.is_set():
+            batch = list(islice(candidates, SETTINGS.reconcile_batch_size))
+            if not batch:
+                break
+            # Files uploaded since the table scan are not orphans.
+            known = db.get_file_uuids(batch)
+            unknown = [child for child in batch if child not in known]
+            stats = _stat_znodes(client, unknown)
+            for child, mtime in zip(unknown, stats):
+                if mtime is None or mtime > cutoff:
+                    continue
+                detail = {"uuid": child, "znode": f"{SETTINGS.zk_root_path}/{child}", "mtime": mtime}
+                report.add("orphan_znode", detail, "delete znode", lambda: _remove_orphan_znode(child))
+            self._advance(len(batch), throttle)
+
+
+def _read_znodes(client: KazooClient, uuids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Fetch a batch of file znodes with pipelined get_async calls."""
+    reads = zk_bulk.pipeline(lambda uuid: client.get_async(f"{SETTINGS.zk_root_path}/{uuid}"), uuids)
+    results: List[Optional[Dict[str, Any]]] = []
+    for _, value in reads:
+        if value is None:
+            results.append(None)
+            continue
+        try:
+            results.append(json.loads(value[0].decode("utf-8")) if value[0] else {})
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            results.append({})
+    return results
+
+
+def _stat_znodes(client: KazooClient, uuids: List[str]) -> List[Optional[float]]:
+    stats = zk_bulk.pipeline(lambda uuid: client.exists_async(f"{SETTINGS.zk_root_path}/{uuid}"), uuids)
+    return [stat.mtime / 1000.0 if stat is not None else None for _, stat in stats]
+
+
+def _iter_node_files(node_dir: Path) -> Iterator[Tuple[os.DirEntry, bool]]:
+    """Yield (entry, is_partial) for every stored file in a node directory.
+
+    Plain files sit at the top level and blobs under ``.blobs/<xx>/``; staged
+    ``.<uuid>.part`` files are flagged. Chunked-upload sessions under
+    ``.uploads`` expire on their own and are skipped.
+    """
+    try:
+        top = os.scandir(node_dir)
+    except FileNotFoundError:
+        return
+    with top:
+        for entry in top:
+            if entry.name == storage.BLOB_DIR and entry.is_dir(follow_symlinks=False):
+                yield from _iter_blobs(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                if entry.name.startswith("."):
+                    if entry.name.endswith(".part"):
+                        yield entry, True
+                else:
+                    yield entry, False
+
+
+def _iter_blobs(blob_dir: str) -> Iterator[Tuple[os.DirEntry, bool]]:
+    with os.scandir(blob_dir) as prefixes:
+        for prefix in prefixes:
+            if not prefix.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(prefix.path) as blobs:
+                for blob in blobs:
+                    if blob.is_file(follow_symlinks=False):
+                        yield blob, False
+
+
+def _znode_payload(record: Dict[str, Any]) -> Dict[str, Any]:
+    history = record.get("history")
+    if isinstance(history, str):
+        try:
+            history = json.loads(history)
+        except json.JSONDecodeError:
+            history = []
+    return {
+        "id": record["id"],
+        "filename": record["filename"],
+        "size": record["size_bytes"],
+        "node": record["node"],
+        "path": record["path"],
+        "history": history or [],
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _reregister(record: Dict[str, Any]) -> bool:
+    with file_locks.file_lock(record["uuid"], purpose="reconcile", timeout=0):
+        current = file_locks.reload_if_unchanged(record)
+        if current is None:
+            return False
+        zookeeper_utils.register_file_metadata(current["uuid"], _znode_payload(current))
+    return True
+
+
+def _repair_missing_file(record: Dict[str, Any]) -> bool:
+    with file_locks.file_lock(record["uuid"], purpose="reconcile", timeout=0):
+        current = file_locks.reload_if_unchanged(record)
+        if current is None or os.path.exists(current["path"]):
+            return False
+        replica = next(
+            (
+                item for item in db.get_file_replicas(current["id"])
+                if item["status"] == "ready" and item["path"] and item["node"] != current["node"] and os.path.exists(item["path"])
+            ),
+            None,
+        )
+        # Drop the lost copy's blob reference either way.
+        storage.remove_file(current["path"])
+        if replica is None:
+            storage.remove_replicas(current["id"])
+            db.delete_file_record(current["id"])
+            zookeeper_utils.delete_file_metadata(current["uuid"])
+            details = f"Dropped {current['filename']}: no copy left on disk"
+            node = current["node"]
+        else:
+            payload = _znode_payload(current)
+            payload["history"].append({
+                "timestamp": datetime.utcnow().isoformat(),
+                "action": "reconcile_promote",
+                "from": current["node"],
+                "to": replica["node"],
+            })
+            db.delete_file_replica(current["id"], replica["node"])
+            db.update_file_record(current["id"], node=replica["node"], path=replica["path"], history=payload["history"])
+            payload.update(node=replica["node"], path=replica["path"])
+            zookeeper_utils.register_file_metadata(current["uuid"], payload)
+            details = f"Promoted replica of {current['filename']} on {replica['node']} after its primary on {current['node']} went missing"
+            node = replica["node"]
+    db.record_operation(action="reconcile_repair", status="success", node=node, details=details)
+    return True
+
+
+def _unlink(path: str) -> bool:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _changed_at(stat: os.stat_result) -> float:
+    # Migrations rename files into place, which keeps st_mtime but bumps st_ctime.
+    return max(stat.st_mtime, stat.st_ctime)
+
+
+def _remove_orphan(path: str, cutoff: float, refcount: Optional[int]) -> bool:
+    """Delete an unreferenced file, unless anything touched it since the scan.
+
+    Migrations move a file (or take a blob reference) before the record points
+    at the new path, so besides the reference check the file must still be older
+    than the grace cutoff and its blob refcount unchanged.
+    """
+    try:
+        if _changed_at(os.stat(path)) > cutoff:
+            return False
+    except FileNotFoundError:
+        return False
+    # An upload may have deduplicated onto this blob since the table scan.
+    if db.is_path_referenced(path):
+        return False
+    blob = db.get_blob(path)
+    if (blob["refcount"] if blob is not None else None) != refcount:
+        return False
+    # A blob row without any file pointing at it is a leaked reference.
+    if blob is not None:
+        while db.release_blob(path):
+            pass
+    return _unlink(path)
+
+
+def _remove_orphan_znode(uuid: str) -> bool:
+    if db.get_file_uuids([uuid]):
+        return False
+    zookeeper_utils.delete_file_metadata(uuid)
+    return True
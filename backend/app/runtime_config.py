@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from . import zookeeper_utils
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+CONFIG_PATH = f"{SETTINGS.zk_root_path}/{zookeeper_utils.CONFIG_CHILD}"
+MAX_WRITE_ATTEMPTS = 5
+
+
+class Tunable(NamedTuple):
+    kind: type
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    choices: Tuple[str, ...] = ()
+
+
+# Settings that may change while the backend runs. Everything else (paths, ZooKeeper
+# hosts, which loops are enabled) is only read at startup and still needs a restart.
+# Every consumer reads these off the shared Settings object at the point of use, so
+# overwriting the attribute is all it takes for a new value to apply.
+TUNABLES: Dict[str, Tunable] = {
+    "scheduler_threshold": Tunable(int, 1, 100_000),
+    "auto_scheduler_interval": Tunable(int, 1, 86_400),
+    "demo_workload_interval": Tunable(int, 1, 3600),
+    "demo_workload_jitter": Tunable(int, 0, 3600),
+    "demo_workload_max_files": Tunable(int, 1, 100_000),
+    "demo_workload_file_size_kb": Tunable(int, 1, 4096),
+    "demo_workload_max_znodes": Tunable(int, 1, 100_000),
+    "demo_workload_max_tasks": Tunable(int, 1, 100_000),
+    "demo_payload_mode": Tunable(str, choices=("random", "compressible", "sparse", "fallocate")),
+    "reconcile_batch_size": Tunable(int, 1, 100_000),
+    "reconcile_rate": Tunable(float, 0, 1_000_000),
+    "file_lock_timeout": Tunable(float, 0, 600),
+    "zk_bulk_concurrency": Tunable(int, 1, 10_000),
+    "profile_mode": Tunable(str, choices=("off", "sample", "full")),
+    "profile_threshold_ms": Tunable(float, 0, 600_000),
+    "profile_sample_rate": Tunable(float, 0, 1),
+    "profile_interval_ms": Tunable(float, 1, 1000),
+    "profile_store_size": Tunable(int, 1, 500),
+}
+
+
+class ConfigConflict(RuntimeError):
+    """The config znode kept changing underneath a compare-and-set write."""
+
+
+def _coerce(name: str, value: Any) -> Any:
+    spec = TUNABLES.get(name)
+    if spec is None:
+        raise ValueError(f"未知或不可在线调整的配置项 {name}")
+    if spec.kind is str:
+        if not isinstance(value, str) or value.lower() not in spec.choices:
+            raise ValueError(f"{name} 必须是 {' / '.join(spec.choices)} 之一")
+        return value.lower()
+    # bool is an int subclass; reject it so `true` never silently becomes 1.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} 必须是数字")
+    if spec.kind is int:
+        if value != int(value):
+            raise ValueError(f"{name} 必须是整数")
+        value = int(value)
+    else:
+        value = float(value)
+    if spec.minimum is not None and value < spec.minimum:
+        raise ValueError(f"{name} 不能小于 {spec.minimum:g}")
+    if spec.maximum is not None and value > spec.maximum:
+        raise ValueError(f"{name} 不能大于 {spec.maximum:g}")
+    return value
+
+
+def validate(updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Check and normalise a partial update; ``None`` resets a key to its env value."""
+    if not updates:
+        raise ValueError("没有需要更新的配置项")
+    return {name: None if value is None else _coerce(name, value) for name, value in updates.items()}
+
+
+def _decode(data: Optional[bytes]) -> Dict[str, Any]:
+    if not data:
+        return {}
+    document = json.loads(data.decode("utf-8"))
+    return document if isinstance(document, dict) else {}
+
+
+class RuntimeConfig:
+    """Keep the tunable Settings of this process in sync with one shared znode.
+
+    The znode holds only the overridden keys plus who changed them and when; keys
+    without an override fall back to the value this process read from its env.
+    A kazoo DataWatch applies every change, so an update made through any worker
+    reaches all of them within one ZooKeeper round trip. The watch re-arms itself
+    after reconnects; if ZooKeeper is down at startup it is set up on the first
+    connect instead.
+    """
+
+    def __init__(self) -> None:
+        self.defaults: Dict[str, Any] = {name: getattr(SETTINGS, name) for name in TUNABLES}
+        self.overrides: Dict[str, Any] = {}
+        self.version: Optional[int] = None
+        self.updated_at: Optional[float] = None
+        self.updated_by: Optional[str] = None
+        self.applied_at: Optional[float] = None
+        self._mzxid = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._watch: Any = None
+        self._wanted = False
+        self._stopping = False
+        zookeeper_utils.add_session_listener(self._on_session_state)
+
+    def start(self) -> None:
+        self._wanted = True
+        with self._start_lock:
+            if self._watch is not None or self._stopping:
+                return
+            try:
+                client = zookeeper_utils.get_kazoo_client()
+            except zookeeper_utils.ZooKeeperUnavailable as exc:
+                logger.warning("Runtime config watch deferred until ZooKeeper connects: %s", exc)
+                return
+            # DataWatch reads the node (or sets an exists watch) and calls back once
+            # before returning, so the current overrides are applied from here on.
+            self._watch = client.DataWatch(CONFIG_PATH, self._on_data)
+
+    def stop(self) -> None:
+        # A DataWatch ends when its callback returns False, i.e. on the next event.
+        self._stopping = True
+
+    def _on_session_state(self, state: str) -> None:
+        if state == "CONNECTED" and self._wanted and self._watch is None and not self._stopping:
+            threading.Thread(target=self.start, name="runtime-config", daemon=True).start()
+
+    def _on_data(self, data: Optional[bytes], stat: Any, event: Any = None) -> Optional[bool]:
+        if self._stopping:
+            return False
+        try:
+            document = _decode(data)
+        except ValueError as exc:
+            logger.error("Ignoring unreadable runtime config at %s: %s", CONFIG_PATH, exc)
+            return None
+        self._apply(document, stat)
+        return None
+
+    def _apply(self, document: Dict[str, Any], stat: Any) -> None:
+        overrides: Dict[str, Any] = {}
+        for name, value in (document.get("values") or {}).items():
+            try:
+                overrides[name] = _coerce(name, value)
+            except ValueError as exc:
+                # Someone edited the znode by hand; keep the rest of it.
+                logger.warning("Ignoring runtime override %s=%r: %s", name, value, exc)
+        changed = []
+        with self._lock:
+            # The update path applies its own write before the watch fires; ordering by
+            # mzxid keeps a late, older notification from undoing a newer write.
+            if stat is not None and stat.mzxid < self._mzxid:
+                return
+            self._mzxid = stat.mzxid if stat is not None else 0
+            version = stat.version if stat is not None else None
+            for name, default in self.defaults.items():
+                value = overrides.get(name, default)
+                if getattr(SETTINGS, name) != value:
+                    changed.append(f"{name}={value}")
+                    setattr(SETTINGS, name, value)
+            self.overrides = overrides
+            self.version = version
+            self.updated_at = document.get("updated_at")
+            self.updated_by = document.get("updated_by")
+            self.applied_at = time.time()
+        if changed:
+            logger.info("Applied runtime config version %s: %s", version, ", ".join(changed))
+
+    def update(self, updates: Dict[str, Any], *, actor: str) -> Dict[str, Any]:
+        """Merge ``updates`` into the znode with a version-checked write.
+
+        Concurrent updates from other workers are retried against the fresh node
+        rather than overwritten. Returns the before/after value of each key whose
+        effective value changed, plus the resulting snapshot.
+        """
+        from kazoo.exceptions import BadVersionError, NoNodeError, NodeExistsError
+
+        cleaned = validate(updates)
+        client = zookeeper_utils.get_kazoo_client()
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            try:
+                data, stat = client.get(CONFIG_PATH)
+            except NoNodeError:
+                data, stat = None, None
+            current = dict(_decode(data).get("values") or {})
+            merged = dict(current)
+            for name, value in cleaned.items():
+                if value is None:
+                    merged.pop(name, None)
+                else:
+                    merged[name] = value
+            document = {"values": merged, "updated_at": time.time(), "updated_by": actor}
+            payload = json.dumps(document, sort_keys=True).encode("utf-8")
+            try:
+                if stat is None:
+                    _, written = client.create(CONFIG_PATH, payload, makepath=True, include_data=True)
+                else:
+                    written = client.set(CONFIG_PATH, payload, version=stat.version)
+            except (BadVersionError, NodeExistsError):
+                continue
+            break
+        else:
+            raise ConfigConflict(f"{CONFIG_PATH} changed {MAX_WRITE_ATTEMPTS} times during the update")
+        # Apply right away so the caller reads its own write; the watch will see the
+        # same version and find nothing left to change.
+        self._apply(document, written)
+        changes = {}
+        for name in cleaned:
+            before = current.get(name, self.defaults[name])
+            after = merged.get(name, self.defaults[name])
+            if before != after:
+                changes[name] = {"before": before, "after": after}
+        return {"changes": changes, "config": self.snapshot()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": CONFIG_PATH,
+                "watching": self._watch is not None and not self._stopping,
+                "version": self.version,
+                "updated_at": self.updated_at,
+                "updated_by": self.updated_by,
+                "applied_at": self.applied_at,
+                "settings": {
+                    name: {
+                        "value": getattr(SETTINGS, name),
+                        "default": self.defaults[name],
+                        "overridden": name in self.overrides,
+                        "type": spec.kind.__name__,
+                        "min": spec.minimum,
+                        "max": spec.maximum,
+                        "choices": list(spec.choices) or None,
+                    }
+                    for name, spec in TUNABLES.items()
+                },
+            }
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import heapq
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EVENT_TYPES = ("upload", "drain", "undrain")
+MAX_EXPANDED_EVENTS = 100_000
+# Every simulated file is a heap entry, so bound the initial files plus uploads.
+MAX_SIMULATED_FILES = 1_000_000
+TIMELINE_POINTS = 200
+
+
+def pick_migration(counts: Sequence[int], drained: Sequence[bool]) -> Tuple[int, int, bool]:
+    """The scheduler policy on per-node file counts: (source, target, has_ready_target).
+
+    The source is the drained node holding the most files, otherwise the fullest
+    node; the target is the emptiest node that is not drained. Ties go to the
+    first node. build_scheduler_plan and the simulator both call this, so a
+    simulated run follows exactly the rule the live scheduler applies.
+    """
+    indices = range(len(counts))
+    draining = [index for index in indices if drained[index] and counts[index] > 0]
+    source = max(draining or indices, key=counts.__getitem__)
+    ready = [index for index in indices if not drained[index]]
+    target = min(ready or indices, key=counts.__getitem__)
+    return source, target, bool(ready)
+
+
+class _Cluster:
+    """Per-node file counts plus, per node, a heap of (-created_seq, size) so the
+    newest file (the one build_scheduler_plan picks) pops first."""
+
+    def __init__(self, nodes: List[str], files: Dict[str, List[Tuple[int, int]]], drained: Sequence[str]) -> None:
+        self.nodes = nodes
+        self.index = {node: position for position, node in enumerate(nodes)}
+        self.heaps: List[List[Tuple[int, int]]] = [[(-seq, size) for seq, size in files.get(node, [])] for node in nodes]
+        for heap in self.heaps:
+            heapq.heapify(heap)
+        self.counts = [len(heap) for heap in self.heaps]
+        self.drained = [node in drained for node in nodes]
+        self.seq = max((seq for node_files in files.values() for seq, _ in node_files), default=0)
+        self.rejected_uploads = 0
+
+    def upload(self, count: int, size_bytes: int, node: Optional[str]) -> None:
+        pinned = self.index.get(node) if node else None
+        if node and pinned is None:
+            raise ValueError(f"未知节点 {node}")
+        ready = [index for index, drained in enumerate(self.drained) if not drained]
+        for _ in range(count):
+            # Mirrors storage.select_target_node (auto) and the pinned bulk mode.
+            if pinned is not None:
+                target = pinned if not self.drained[pinned] else None
+            else:
+                target = min(ready, key=self.counts.__getitem__) if ready else None
+            if target is None:
+                self.rejected_uploads += 1
+                continue
+            self.seq += 1
+            heapq.heappush(self.heaps[target], (-self.seq, size_bytes))
+            self.counts[target] += 1
+
+    def set_drained(self, node: Optional[str], drained: bool) -> None:
+        if node not in self.index:
+            raise ValueError(f"未知节点 {node}")
+        self.drained[self.index[node]] = drained
+
+    def move(self, source: int, target: int) -> int:
+        entry = heapq.heappop(self.heaps[source])
+        heapq.heappush(self.heaps[target], entry)
+        self.counts[source] -= 1
+        self.counts[target] += 1
+        return entry[1]
+
+    def spread(self) -> int:
+        ready = [count for count, drained in zip(self.counts, self.drained) if not drained]
+        return max(ready) - min(ready) if ready else 0
+
+
+def expand_events(events: Sequence[Dict[str, Any]], default_size_kb: int) -> List[Tuple[float, str, Optional[str], int, int]]:
+    """Flatten the event script into (at, type, node, count, size_bytes) sorted by time.
+
+    An event with ``repeat`` > 1 recurs every ``every`` seconds, e.g. a steady
+    upload stream of one file per tick. Uploads may add at most
+    ``MAX_SIMULATED_FILES`` files in total (count x repeat, summed).
+    """
+    expanded: List[Tuple[float, str, Optional[str], int, int]] = []
+    uploaded = 0
+    for event in events:
+        kind = event.get("type")
+        if kind not in EVENT_TYPES:
+            raise ValueError(f"不支持的事件类型 {kind}")
+        repeat = max(int(event.get("repeat") or 1), 1)
+        every = float(event.get("every") or 0)
+        if len(expanded) + repeat > MAX_EXPANDED_EVENTS:
+            raise ValueError(f"事件展开后超过 {MAX_EXPANDED_EVENTS} 个")
+        count = max(int(event.get("count") or 1), 0)
+        if kind == "upload":
+            uploaded += count * repeat
+            if uploaded > MAX_SIMULATED_FILES:
+                raise ValueError(f"上传事件合计超过 {MAX_SIMULATED_FILES} 个文件")
+        size_bytes = max(int(event.get("size_kb") or default_size_kb), 1) * 1024
+        for occurrence in range(repeat):
+            at = float(event.get("at") or 0) + occurrence * every
+            expanded.append((at, kind, event.get("node"), count, size_bytes))
+    expanded.sort(key=lambda item: item[0])
+    return expanded
+
+
+def simulate(
+    *,
+    nodes: List[str],
+    files: Dict[str, List[Tuple[int, int]]],
+    drained: Sequence[str],
+    events: Sequence[Tuple[float, str, Optional[str], int, int]],
+    threshold: int,
+    interval: float,
+    max_moves_per_tick: int = 1,
+    max_ticks: int = 10_000,
+) -> Dict[str, Any]:
+    """Run the auto scheduler forward tick by tick, entirely in memory.
+
+    ``files`` maps each node to (created_seq, size_bytes) pairs. Each tick first
+    applies the events due by then, then lets the scheduler make up to
+    ``max_moves_per_tick`` migrations (the live loop makes one). Once every event
+    has fired and a tick makes no move the state can no longer change, so the run
+    stops there and that tick is reported as the convergence point.
+    """
+    began = time.perf_counter()
+    cluster = _Cluster(nodes, files, drained)
+    timeline = [array("l") for _ in nodes]
+    moves = 0
+    bytes_moved = 0
+    max_spread = cluster.spread()
+    next_event = 0
+    last_event_at = events[-1][0] if events else 0.0
+    converged_tick: Optional[int] = None
+    tick = 0
+    while tick < max_ticks:
+        now = tick * interval
+        while next_event < len(events) and events[next_event][0] <= now:
+            _, kind, node, count, size_bytes = events[next_event]
+            if kind == "upload":
+                cluster.upload(count, size_bytes, node)
+            else:
+                cluster.set_drained(node, kind == "drain")
+            next_event += 1
+        moved = 0
+        while moved < max_moves_per_tick:
+            source, target, has_ready = pick_migration(cluster.counts, cluster.drained)
+            if (
+                source == target
+                or not has_ready
+                or not cluster.counts[source]
+                or cluster.counts[source] - cluster.counts[target] < threshold
+            ):
+                break
+            bytes_moved += cluster.move(source, target)
+            moved += 1
+        moves += moved
+        for series, count in zip(timeline, cluster.counts):
+            series.append(count)
+        max_spread = max(max_spread, cluster.spread())
+        if not moved and next_event >= len(events):
+            converged_tick = tick
+            break
+        tick += 1
+
+    ticks = len(timeline[0]) if timeline else 0
+    stride = max(1, -(-ticks // TIMELINE_POINTS))
+    sampled = range(0, ticks, stride)
+    converged_at = converged_tick * interval if converged_tick is not None else None
+    return {
+        "threshold": threshold,
+        "interval_seconds": interval,
+        "max_moves_per_tick": max_moves_per_tick,
+        "converged": converged_tick is not None,
+        "ticks": ticks,
+        "converged_at_seconds": converged_at,
+        # Time the scheduler kept moving files after the last scripted event.
+        "convergence_seconds": max(converged_at - last_event_at, 0.0) if converged_at is not None else None,
+        "moves": moves,
+        "bytes_moved": bytes_moved,
+        "max_spread": max_spread,
+        "final_spread": cluster.spread(),
+        "final_counts": dict(zip(nodes, cluster.counts)),
+        "stranded_on_drained": sum(count for count, flag in zip(cluster.counts, cluster.drained) if flag),
+        "rejected_uploads": cluster.rejected_uploads,
+        "timeline": {
+            "seconds": [index * interval for index in sampled],
+            "counts": {node: [series[index] for index in sampled] for node, series in zip(nodes, timeline)},
+        },
+        "compute_ms": round((time.perf_counter() - began) * 1000, 3),
+    }
+
+
+def synthetic_files(counts: Dict[str, int], size_kb: int) -> Dict[str, List[Tuple[int, int]]]:
+    if sum(max(count, 0) for count in counts.values()) > MAX_SIMULATED_FILES:
+        raise ValueError(f"synthetic 文件总数不能超过 {MAX_SIMULATED_FILES}")
+    size_bytes = max(size_kb, 1) * 1024
+    files: Dict[str, List[Tuple[int, int]]] = {}
+    seq = 0
+    for node, count in counts.items():
+        files[node] = [(seq + offset + 1, size_bytes) for offset in range(max(count, 0))]
+        seq += max(count, 0)
+    return files
+
+
+def files_from_records(records: Sequence[Dict[str, Any]]) -> Dict[str, List[Tuple[int, int]]]:
+    """Per-node (created_seq, size) from file rows, oldest first as the scheduler orders them."""
+    files: Dict[str, List[Tuple[int, int]]] = {}
+    ordered = sorted(records, key=lambda record: (record["created_at"], record["id"]))
+    for seq, record in enumerate(ordered, start=1):
+        files.setdefault(record["node"], []).append((seq, int(record["size_bytes"])))
+    return files
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class StartupTimer:
+    """Record how long each startup phase takes, relative to module import."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.serving_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.first_request_at: Optional[float] = None
+
+    def _elapsed_ms(self, moment: Optional[float]) -> Optional[float]:
+        if moment is None:
+            return None
+        return round((moment - self.started) * 1000, 2)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        began = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self.phases.append(
+                {
+                    "phase": name,
+                    "status": status,
+                    "offset_ms": self._elapsed_ms(began),
+                    "duration_ms": round((time.perf_counter() - began) * 1000, 2),
+                }
+            )
+
+    def mark(self, name: str) -> None:
+        """Record a phase that began when the timer was created."""
+        self.phases.append(
+            {
+                "phase": name,
+                "status": "ok",
+                "offset_ms": 0.0,
+                "duration_ms": self._elapsed_ms(time.perf_counter()),
+            }
+        )
+
+    def mark_serving(self) -> None:
+        self.serving_at = time.perf_counter()
+
+    def mark_ready(self) -> None:
+        self.ready_at = time.perf_counter()
+
+    def mark_request(self) -> None:
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "phases": list(self.phases),
+            "time_to_serving_ms": self._elapsed_ms(self.serving_at),
+            "time_to_first_request_ms": self._elapsed_ms(self.first_request_at),
+            "time_to_warm_ms": self._elapsed_ms(self.ready_at),
+            "warm": self.ready_at is not None,
+        }
+
+
+class FirstRequestMiddleware:
+    """Pure ASGI middleware stamping ``first_request_at``; after the first HTTP
+    request it is a single flag check."""
+
+    def __init__(self, app: ASGIApp, timer: StartupTimer) -> None:
+        self.app = app
+        self.timer = timer
+        self._pending = True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self._pending and scope["type"] == "http":
+            self._pending = False
+            self.timer.mark_request()
+        await self.app(scope, receive, send)
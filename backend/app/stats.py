@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(values)))
+    return float(values[min(rank, len(values)) - 1])
+
+
+def summarize_latencies(samples: Iterable[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    if not values:
+        return {"count": 0, "min": 0.0, "avg": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "min": round(values[0], 3),
+        "avg": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class LatencyHistogram:
+    """Log-linear histogram of integer microseconds, in the spirit of HdrHistogram.
+
+    Values below 2**SUB_BITS are exact; above that each power of two is split into
+    2**(SUB_BITS - 1) buckets, so any reported percentile is within ~1.6% of the
+    true value while memory stays a few kilobytes regardless of sample count.
+    """
+
+    SUB_BITS = 7
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self) -> None:
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        exponent = max(0, value.bit_length() - cls.SUB_BITS)
+        return exponent * cls.HALF + (value >> exponent)
+
+    @classmethod
+    def _value(cls, index: int) -> int:
+        if index < 2 * cls.HALF:
+            return index
+        exponent = (index - cls.HALF) // cls.HALF
+        low = (index - exponent * cls.HALF) << exponent
+        return low + ((1 << exponent) >> 1)
+
+    def record(self, micros: float) -> None:
+        value = max(0, int(micros))
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        if other.count:
+            self.min = min(self.min, other.min) if self.count else other.min
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= target:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def summary_ms(self) -> Dict[str, float]:
+        def ms(micros: float) -> float:
+            return round(micros / 1000.0, 3)
+
+        return {
+            "count": self.count,
+            "min": ms(self.min),
+            "avg": ms(self.total / self.count) if self.count else 0.0,
+            "p50": ms(self.percentile(50)),
+            "p90": ms(self.percentile(90)),
+            "p99": ms(self.percentile(99)),
+            "p999": ms(self.percentile(99.9)),
+            "max": ms(self.max),
+        }
@@ -1,24 +1,33 @@
 from __future__ import annotations
 
+import hashlib
+import logging
 import os
 import random
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
 
 from fastapi import UploadFile
 
 from .config import get_settings
-from . import db
+from . import db, payloads
 
+logger = logging.getLogger(__name__)
 SETTINGS = get_settings()
 
+# Per-node replica write totals since process start, read by the metrics refresh.
+REPLICATION_STATS: Dict[str, Dict[str, float]] = {}
+_REPLICATION_LOCK = threading.Lock()
+
 
 def get_node_counts() -> Dict[str, int]:
     counts: Dict[str, int] = {node.split(":")[0]: 0 for node in SETTINGS.zk_nodes}
-    for record in db.get_files():
-        counts[record["node"]] = counts.get(record["node"], 0) + 1
+    counts.update(db.count_files_by_node())
     return counts
 
 
@@ -44,47 +53,156 @@ def select_target_node() -> str:
     return sorted_nodes[0][0]
 
 
-def save_upload(upload_file: UploadFile, node: str) -> Tuple[str, int, str]:
+BLOB_DIR = ".blobs"
+HASH_ALGORITHM = "sha256"
+
+
+def _cas_enabled() -> bool:
+    return SETTINGS.storage_mode == "cas"
+
+
+def _blob_path(node: str, content_hash: str) -> Path:
+    return SETTINGS.file_storage_path / node / BLOB_DIR / content_hash[:2] / content_hash
+
+
+def _store_blob(node: str, staged: Path, content_hash: str, size_bytes: int) -> str:
+    """Move a staged file into the node's blob store, or drop it if the content is already there."""
+    target = _blob_path(node, content_hash)
+    path, created = db.acquire_blob(node=node, content_hash=content_hash, size_bytes=size_bytes, path=str(target))
+    if created:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged, target)
+    else:
+        staged.unlink(missing_ok=True)
+    return path
+
+
+def save_upload(upload_file: UploadFile, node: str) -> Tuple[str, int, str, str]:
     node_dir = SETTINGS.file_storage_path / node
     node_dir.mkdir(parents=True, exist_ok=True)
     file_uuid = uuid4().hex
     safe_name = upload_file.filename or "uploaded.bin"
     destination = node_dir / f"{file_uuid}_{safe_name}"
+    if _cas_enabled():
+        destination = node_dir / f".{file_uuid}.part"
+    digest = hashlib.new(HASH_ALGORITHM)
     size = 0
     with destination.open("wb") as out_f:
         while chunk := upload_file.file.read(1024 * 1024):
             size += len(chunk)
+            digest.update(chunk)
             out_f.write(chunk)
     upload_file.file.close()
-    return str(destination), size, file_uuid
+    content_hash = digest.hexdigest()
+    if _cas_enabled():
+        return _store_blob(node, destination, content_hash, size), size, file_uuid, content_hash
+    return str(destination), size, file_uuid, content_hash
 
 
-def create_demo_file(node: str, size_kb: int) -> Tuple[str, int, str, str]:
+def create_demo_file(node: str, size_kb: int, payload_mode: Optional[str] = None) -> Tuple[str, int, str, str, str]:
     node_dir = SETTINGS.file_storage_path / node
     node_dir.mkdir(parents=True, exist_ok=True)
     file_uuid = uuid4().hex
     filename = f"demo-{file_uuid[:6]}.bin"
-    destination = node_dir / filename
+    destination = node_dir / (f".{file_uuid}.part" if _cas_enabled() else filename)
     size_bytes = max(size_kb, 1) * 1024
-    remaining = size_bytes
-    with destination.open("wb") as out_f:
-        while remaining > 0:
-            chunk_size = min(remaining, 32 * 1024)
-            out_f.write(os.urandom(chunk_size))
-            remaining -= chunk_size
     # add small variability so files differ
     if random.random() < 0.3:
-        extra = 512
-        with destination.open("ab") as out_f:
-            out_f.write(os.urandom(extra))
-        size_bytes += extra
-    return str(destination), size_bytes, file_uuid, filename
+        size_bytes += 512
+    content_hash = payloads.write_payload(
+        destination,
+        size_bytes=size_bytes,
+        seed=file_uuid,
+        mode=payload_mode or SETTINGS.demo_payload_mode,
+    )
+    if _cas_enabled():
+        return _store_blob(node, destination, content_hash, size_bytes), size_bytes, file_uuid, filename, content_hash
+    return str(destination), size_bytes, file_uuid, filename, content_hash
+
+
+UPLOAD_DIR = ".uploads"
+
+
+def upload_session_dir(node: str, session_id: str) -> Path:
+    return SETTINGS.file_storage_path / node / UPLOAD_DIR / session_id
+
+
+def write_upload_chunk(node: str, session_id: str, index: int, data: bytes) -> None:
+    session_dir = upload_session_dir(node, session_id)
+    session_dir.mkdir(parents=True, exist_ok=True)
+    staged = session_dir / f".{index:06d}.{uuid4().hex[:6]}"
+    with staged.open("wb") as out_f:
+        out_f.write(data)
+    # Atomic rename makes chunk retries idempotent.
+    os.replace(staged, session_dir / f"{index:06d}")
+
+
+def _copy_into(src, dst, count: int) -> None:
+    """Append ``count`` bytes of src to dst in-kernel where the platform allows it."""
+    offset = 0
+    dst.flush()
+    try:
+        while offset < count:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), count - offset, offset)
+            if copied == 0:
+                break
+            offset += copied
+        return
+    except (AttributeError, OSError):
+        pass
+    src.seek(offset)
+    dst.seek(0, os.SEEK_END)
+    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def assemble_upload(node: str, session_id: str, total_chunks: int, filename: str) -> Tuple[str, int, str, str]:
+    """Concatenate a session's chunks into the node directory; returns (path, size, uuid, content_hash).
+
+    The bytes are copied in-kernel, but each chunk is still read once through
+    Python for the whole-file hash: chunks arrive out of order and from any
+    worker, and a hashlib state cannot be saved between requests, so the hash
+    cannot be built while receiving. The hash pass warms the page cache, so the
+    copy that follows does not go back to disk, and filesystems with reflink or
+    server-side copy share the extents instead of duplicating them.
+    """
+    session_dir = upload_session_dir(node, session_id)
+    file_uuid = uuid4().hex
+    staged = SETTINGS.file_storage_path / node / f".{file_uuid}.part"
+    digest = hashlib.new(HASH_ALGORITHM)
+    size = 0
+    try:
+        with staged.open("wb") as out_f:
+            for index in range(total_chunks):
+                with (session_dir / f"{index:06d}").open("rb") as chunk_f:
+                    while block := chunk_f.read(1024 * 1024):
+                        digest.update(block)
+                    length = chunk_f.tell()
+                    _copy_into(chunk_f, out_f, length)
+                    size += length
+        content_hash = digest.hexdigest()
+        # The chunks stay until the caller has registered the file; see discard_upload.
+        if _cas_enabled():
+            return _store_blob(node, staged, content_hash, size), size, file_uuid, content_hash
+        destination = staged.with_name(f"{file_uuid}_{Path(filename).name or 'uploaded.bin'}")
+        os.replace(staged, destination)
+    except BaseException:
+        # Dot-files are invisible to the reconciler, so a staged file left here leaks.
+        staged.unlink(missing_ok=True)
+        raise
+    return str(destination), size, file_uuid, content_hash
+
+
+def discard_upload(node: str, session_id: str) -> None:
+    shutil.rmtree(upload_session_dir(node, session_id), ignore_errors=True)
 
 
 def migrate_file(file_record: Dict[str, any], new_node: str) -> Tuple[str, str]:
     current_path = Path(file_record["path"])
     if not current_path.exists():
         raise FileNotFoundError(f"File path not found on disk: {current_path}")
+    source_blob = db.get_blob(str(current_path)) if file_record.get("content_hash") else None
+    if source_blob is not None:
+        return _migrate_blob(file_record, source_blob, new_node)
     new_dir = SETTINGS.file_storage_path / new_node
     new_dir.mkdir(parents=True, exist_ok=True)
     new_path = new_dir / current_path.name
@@ -92,10 +210,127 @@ def migrate_file(file_record: Dict[str, any], new_node: str) -> Tuple[str, str]:
     return str(new_path), new_node
 
 
+def _migrate_blob(file_record: Dict[str, any], source_blob: Dict[str, any], new_node: str) -> Tuple[str, str]:
+    """Re-point a record at the target node's blob, transferring bytes only if the target lacks them."""
+    current_path = Path(source_blob["path"])
+    target = _blob_path(new_node, source_blob["content_hash"])
+    path, created = db.acquire_blob(
+        node=new_node,
+        content_hash=source_blob["content_hash"],
+        size_bytes=source_blob["size_bytes"],
+        path=str(target),
+    )
+    if created:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source_blob["refcount"] <= 1:
+            shutil.move(str(current_path), target)
+        else:
+            shutil.copy2(current_path, target)
+    remaining = db.release_blob(str(current_path))
+    if remaining == 0 and current_path.exists():
+        current_path.unlink()
+    return path, new_node
+
+
 def remove_file(path: str) -> None:
     file_path = Path(path)
+    remaining = db.release_blob(path)
+    if remaining:
+        # Other records still reference this blob.
+        return
     try:
         if file_path.exists():
             file_path.unlink()
     except OSError:
         pass
+
+
+def select_replica_nodes(primary: str, count: int) -> List[str]:
+    """Pick the least-loaded active nodes other than the primary for extra copies."""
+    if count <= 0:
+        return []
+    counts = get_node_counts()
+    drained_nodes = {node for node, info in db.get_node_states().items() if info.get("drained")}
+    candidates = sorted(
+        ((node, total) for node, total in counts.items() if node != primary and node not in drained_nodes),
+        key=lambda item: item[1],
+    )
+    return [node for node, _ in candidates[:count]]
+
+
+def _write_replica(source: Path, node: str, content_hash: Optional[str], size_bytes: int, written_at: float) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        if _cas_enabled() and content_hash:
+            target = _blob_path(node, content_hash)
+            path, created = db.acquire_blob(node=node, content_hash=content_hash, size_bytes=size_bytes, path=str(target))
+            if created:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(source, target)
+        else:
+            target_dir = SETTINGS.file_storage_path / node
+            target_dir.mkdir(parents=True, exist_ok=True)
+            path = str(target_dir / source.name)
+            # copyfile uses sendfile on Linux, so bytes never pass through Python.
+            shutil.copyfile(source, path)
+    except OSError as exc:
+        logger.warning("Failed to write replica of %s to %s: %s", source, node, exc)
+        return {"node": node, "path": "", "status": "failed", "lag_ms": None}
+    elapsed = time.perf_counter() - started
+    lag_ms = (time.time() - written_at) * 1000
+    with _REPLICATION_LOCK:
+        totals = REPLICATION_STATS.setdefault(node, {"replicas": 0, "bytes": 0, "seconds": 0.0, "last_lag_ms": 0.0})
+        totals["replicas"] += 1
+        totals["bytes"] += size_bytes
+        totals["seconds"] += elapsed
+        totals["last_lag_ms"] = lag_ms
+    return {"node": node, "path": str(path), "status": "ready", "lag_ms": round(lag_ms, 3)}
+
+
+def replicate_file(file_id: int, primary_node: str, path: str, content_hash: Optional[str], size_bytes: int) -> List[Dict[str, Any]]:
+    """Write REPLICATION_FACTOR - 1 extra copies in parallel and record them in the replica map."""
+    if SETTINGS.replication_factor <= 1:
+        return []
+    nodes = select_replica_nodes(primary_node, SETTINGS.replication_factor - 1)
+    if not nodes:
+        return []
+    source = Path(path)
+    written_at = time.time()
+    with ThreadPoolExecutor(max_workers=len(nodes), thread_name_prefix="replica-writer") as pool:
+        replicas = list(pool.map(lambda node: _write_replica(source, node, content_hash, size_bytes, written_at), nodes))
+    db.add_file_replicas(file_id, replicas)
+    return [{"node": item["node"], "path": item["path"], "status": item["status"]} for item in replicas]
+
+
+def select_read_copy(record: Dict[str, Any], *, unavailable: Set[str], active: Dict[str, int]) -> Tuple[str, Path]:
+    """Choose the healthy copy (primary or replica) with the fewest in-flight reads."""
+    copies = [(record["node"], record["path"])]
+    copies.extend(
+        (replica["node"], replica["path"])
+        for replica in db.get_file_replicas(record["id"])
+        if replica["status"] == "ready" and replica["node"] != record["node"]
+    )
+    existing = [(node, Path(path)) for node, path in copies if path and Path(path).exists()]
+    if not existing:
+        raise FileNotFoundError(f"No copy of file {record['id']} found on disk")
+    healthy = [item for item in existing if item[0] not in unavailable] or existing
+    # min() is stable, so the primary wins ties.
+    return min(healthy, key=lambda item: active.get(item[0], 0))
+
+
+def drop_replica_on(file_id: int, node: str, primary_path: str) -> None:
+    """Forget a replica on the node that just became the file's primary."""
+    for replica in db.get_file_replicas(file_id):
+        if replica["node"] != node:
+            continue
+        # In plain mode the moved primary already replaced this copy at the same path.
+        if replica["path"] and (replica["path"] != primary_path or db.get_blob(replica["path"]) is not None):
+            remove_file(replica["path"])
+        db.delete_file_replica(file_id, node)
+
+
+def remove_replicas(file_id: int) -> None:
+    for replica in db.get_file_replicas(file_id):
+        if replica["path"]:
+            remove_file(replica["path"])
+        db.delete_file_replica(file_id, replica["node"])
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from kazoo.exceptions import BadVersionError, NoNodeError, NodeExistsError
+
+from . import db, stats, zookeeper_utils
+from .config import get_settings
+
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+QUEUE_ROOT = f"{SETTINGS.zk_root_path}/{zookeeper_utils.TASKS_CHILD}"
+POLL_INTERVAL = 1.0
+
+
+def _decode(data: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(data.decode("utf-8")) if data else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+def _execute_task(task: Dict[str, Any]) -> None:
+    payload = task.get("payload") or {}
+    time.sleep(max(float(payload.get("duration", 0.5)), 0.0))
+    if random.random() < float(payload.get("fail_rate", 0.0)):
+        raise RuntimeError("Synthetic task failure")
+
+
+class QueueWorker:
+    """Claim and run queued tasks through a dedicated session on one ZooKeeper node.
+
+    A task is owned by whoever holds the ephemeral ``leases/<task>`` znode. The
+    lease disappears with the session, and a lease whose heartbeat is older than
+    ``task_queue_lease_timeout`` is reaped by any worker so the task is retried.
+    """
+
+    def __init__(
+        self,
+        node: str,
+        *,
+        base_path: str = QUEUE_ROOT,
+        concurrency: Optional[int] = None,
+        handler: Callable[[Dict[str, Any]], None] = _execute_task,
+        record_tasks: bool = True,
+        on_claim: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.node = node
+        self.host = node.split(":")[0]
+        self.worker_id = f"{self.host}-{uuid4().hex[:6]}"
+        self.queue_path = f"{base_path}/queue"
+        self.lease_path = f"{base_path}/leases"
+        self.concurrency = max(1, concurrency or SETTINGS.task_queue_concurrency)
+        self._handler = handler
+        self._record_tasks = record_tasks
+        self._on_claim = on_claim
+        self._client: Optional[KazooClient] = None
+        self._threads: List[threading.Thread] = []
+        self._running = threading.Event()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Held across each heartbeat write so a slot never finishes with a version
+        # that an in-flight heartbeat is about to bump.
+        self._heartbeat_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"claimed": 0, "succeeded": 0, "failed": 0, "retried": 0, "reaped": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        from kazoo.client import KazooClient
+
+        client = KazooClient(hosts=self.node, timeout=SETTINGS.zk_command_timeout)
+        client.start(timeout=SETTINGS.zk_command_timeout * 2)
+        client.ensure_path(self.queue_path)
+        client.ensure_path(self.lease_path)
+        self._client = client
+        self._stopping.clear()
+        self._running.set()
+        client.ChildrenWatch(self.queue_path, self._on_queue_change)
+        for slot in range(self.concurrency):
+            thread = threading.Thread(target=self._slot_loop, name=f"task-worker-{self.worker_id}-{slot}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name=f"task-heartbeat-{self.worker_id}", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logger.info("Task worker %s started (concurrency=%s)", self.worker_id, self.concurrency)
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._running.clear()
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=SETTINGS.task_queue_heartbeat_interval + 1)
+        self._threads = []
+        if self._client is not None:
+            # Closing the session drops any remaining ephemeral leases.
+            self._client.stop()
+            self._client.close()
+            self._client = None
+        logger.info("Task worker %s stopped", self.worker_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._leases)
+            counters = dict(self.stats)
+        return {"worker": self.worker_id, "node": self.host, "concurrency": self.concurrency, "active": active, **counters}
+
+    def _on_queue_change(self, _children: List[str]) -> bool:
+        self._wakeup.set()
+        return self.running
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _slot_loop(self) -> None:
+        while self.running:
+            try:
+                claimed = self._claim_next()
+            except Exception as exc:
+                logger.warning("Task worker %s failed to claim: %s", self.worker_id, exc)
+                claimed = None
+            if claimed is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._process(*claimed)
+
+    def _lease_data(self) -> bytes:
+        return json.dumps({"worker": self.worker_id, "node": self.host, "heartbeat": time.time()}).encode("utf-8")
+
+    def _claim_next(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        client = self._client
+        if client is None:
+            return None
+        started = time.perf_counter()
+        children = sorted(client.get_children(self.queue_path))
+        if not children:
+            return None
+        leased = set(client.get_children(self.lease_path))
+        candidates = [name for name in children if name not in leased]
+        # Shuffle the head of the queue so concurrent slots don't all race for one task.
+        window = candidates[: self.concurrency * 4]
+        random.shuffle(window)
+        for name in window:
+            lease = f"{self.lease_path}/{name}"
+            try:
+                client.create(lease, self._lease_data(), ephemeral=True)
+            except NodeExistsError:
+                continue
+            try:
+                data, _ = client.get(f"{self.queue_path}/{name}")
+            except NoNodeError:
+                self._delete_quietly(lease)
+                continue
+            with self._lock:
+                self._leases[lease] = 0
+                self.stats["claimed"] += 1
+            if self._on_claim is not None:
+                self._on_claim((time.perf_counter() - started) * 1000)
+            return name, _decode(data)
+        return None
+
+    def _process(self, name: str, task: Dict[str, Any]) -> None:
+        lease = f"{self.lease_path}/{name}"
+        task_id = task.get("task_id", name)
+        attempts = int(task.get("attempts", 0))
+        self._record(task_id, "running", task, f"Claimed by {self.worker_id} (attempt {attempts + 1})")
+        error: Optional[str] = None
+        try:
+            self._handler(task)
+        except Exception as exc:
+            error = str(exc)
+        with self._heartbeat_lock, self._lock:
+            version = self._leases.pop(lease, None)
+        if version is None:
+            # The lease was reaped while we worked; another worker owns the retry now.
+            logger.warning("Task %s lost its lease before completion", task_id)
+            return
+        if error is None:
+            if self._finish(name, version):
+                self._count("succeeded")
+                self._record(task_id, "succeeded", task, f"Completed by {self.worker_id}")
+            return
+        self._release(name, task, version, error)
+
+    def _finish(self, name: str, lease_version: int) -> bool:
+        transaction = self._client.transaction()
+        transaction.check(f"{self.lease_path}/{name}", lease_version)
+        transaction.delete(f"{self.queue_path}/{name}")
+        transaction.delete(f"{self.lease_path}/{name}")
+        results = transaction.commit()
+        return not any(isinstance(result, Exception) for result in results)
+
+    def _release(self, name: str, task: Dict[str, Any], lease_version: int, error: str, *, task_version: int = -1) -> bool:
+        """Give a task back to the queue, or fail it for good once retries are exhausted.
+
+        Returns False when the transaction did not commit, e.g. the lease or task
+        changed meanwhile.
+        """
+        task_id = task.get("task_id", name)
+        attempts = int(task.get("attempts", 0)) + 1
+        transaction = self._client.transaction()
+        transaction.check(f"{self.lease_path}/{name}", lease_version)
+        if attempts >= SETTINGS.task_queue_max_retries:
+            transaction.delete(f"{self.queue_path}/{name}", version=task_version)
+            status = "failed"
+        else:
+            updated = {**task, "attempts": attempts, "last_error": error}
+            transaction.set_data(f"{self.queue_path}/{name}", json.dumps(updated).encode("utf-8"), version=task_version)
+            status = "queued"
+        transaction.delete(f"{self.lease_path}/{name}")
+        results = transaction.commit()
+        if any(isinstance(result, Exception) for result in results):
+            return False
+        self._count("failed" if status == "failed" else "retried")
+        self._record(task_id, status, task, f"Attempt {attempts} failed: {error}")
+        return True
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopping.wait(SETTINGS.task_queue_heartbeat_interval):
+            with self._lock:
+                held = list(self._leases)
+            for lease in held:
+                with self._heartbeat_lock:
+                    # Re-read under the lock: the slot may have finished since.
+                    with self._lock:
+                        version = self._leases.get(lease)
+                    if version is None:
+                        continue
+                    try:
+                        stat = self._client.set(lease, self._lease_data(), version=version)
+                    except (NoNodeError, BadVersionError):
+                        with self._lock:
+                            self._leases.pop(lease, None)
+                        continue
+                    except Exception as exc:
+                        logger.debug("Heartbeat for %s failed: %s", lease, exc)
+                        continue
+                    with self._lock:
+                        self._leases[lease] = stat.version
+            try:
+                self._reap_expired()
+            except Exception as exc:
+                logger.debug("Lease reaper on %s failed: %s", self.worker_id, exc)
+
+    def _reap_expired(self) -> None:
+        client = self._client
+        cutoff = time.time() - SETTINGS.task_queue_lease_timeout
+        for name in client.get_children(self.lease_path):
+            lease = f"{self.lease_path}/{name}"
+            try:
+                lease_data, lease_stat = client.get(lease)
+                task_data, task_stat = client.get(f"{self.queue_path}/{name}")
+            except NoNodeError:
+                continue
+            if float(_decode(lease_data).get("heartbeat", 0)) >= cutoff:
+                continue
+            if self._release(name, _decode(task_data), lease_stat.version, "lease timed out", task_version=task_stat.version):
+                self._count("reaped")
+
+    def _delete_quietly(self, path: str) -> None:
+        try:
+            self._client.delete(path)
+        except NoNodeError:
+            pass
+
+    def _record(self, task_id: str, status: str, task: Dict[str, Any], details: str) -> None:
+        if not self._record_tasks:
+            return
+        try:
+            db.upsert_task_record(task_id=task_id, node=self.host, status=status, payload=task.get("payload"), details=details)
+        except Exception as exc:
+            logger.debug("Unable to record task %s state: %s", task_id, exc)
+
+
+def enqueue_task(payload: Dict[str, Any], *, client: Optional[KazooClient] = None, base_path: str = QUEUE_ROOT, record: bool = True) -> Dict[str, Any]:
+    client = client or zookeeper_utils.get_kazoo_client()
+    task_id = f"zk-task-{uuid4().hex[:8]}"
+    body = {"task_id": task_id, "payload": payload, "attempts": 0, "created_at": datetime.utcnow().isoformat()}
+    znode = client.create(f"{base_path}/queue/task-", json.dumps(body).encode("utf-8"), sequence=True, makepath=True)
+    if record:
+        db.upsert_task_record(task_id=task_id, node=None, status="queued", payload=payload, details=f"Enqueued as {znode}")
+    return {"task_id": task_id, "znode": znode}
+
+
+def queue_depth(*, client: Optional[KazooClient] = None, base_path: str = QUEUE_ROOT) -> Dict[str, int]:
+    client = client or zookeeper_utils.get_kazoo_client()
+    try:
+        queued = len(client.get_children(f"{base_path}/queue"))
+    except NoNodeError:
+        queued = 0
+    try:
+        leased = len(client.get_children(f"{base_path}/leases"))
+    except NoNodeError:
+        leased = 0
+    return {"pending": max(queued - leased, 0), "leased": leased, "total": queued}
+
+
+class TaskQueueManager:
+    """Own one queue worker per configured ZooKeeper node."""
+
+    def __init__(self) -> None:
+        self._workers: List[QueueWorker] = []
+
+    @property
+    def running(self) -> bool:
+        return any(worker.running for worker in self._workers)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._workers = []
+        for node in SETTINGS.zk_nodes:
+            worker = QueueWorker(node)
+            try:
+                worker.start()
+            except Exception as exc:
+                logger.warning("Unable to start task worker on %s: %s", node, exc)
+                continue
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        try:
+            depth = queue_depth()
+        except Exception as exc:
+            logger.debug("Unable to read task queue depth: %s", exc)
+            depth = {"pending": 0, "leased": 0, "total": 0}
+        return {
+            "enabled": SETTINGS.task_queue_enabled,
+            "running": self.running,
+            "queue": depth,
+            "workers": [worker.snapshot() for worker in self._workers],
+        }
+
+
+def run_benchmark(*, tasks: int, concurrency: int, task_duration_ms: int = 0, timeout: float = 120.0) -> Dict[str, Any]:
+    """Push ``tasks`` no-op tasks through a throwaway queue and measure throughput."""
+    base_path = f"{QUEUE_ROOT}/bench-{uuid4().hex[:6]}"
+    client = zookeeper_utils.get_kazoo_client()
+    client.ensure_path(f"{base_path}/queue")
+    client.ensure_path(f"{base_path}/leases")
+    claim_latencies: List[float] = []
+    latencies_lock = threading.Lock()
+
+    def on_claim(latency_ms: float) -> None:
+        with latencies_lock:
+            claim_latencies.append(latency_ms)
+
+    def handler(_task: Dict[str, Any]) -> None:
+        if task_duration_ms > 0:
+            time.sleep(task_duration_ms / 1000.0)
+
+    workers = [
+        QueueWorker(node, base_path=base_path, concurrency=concurrency, handler=handler, record_tasks=False, on_claim=on_claim)
+        for node in SETTINGS.zk_nodes
+    ]
+    completed = 0
+    try:
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        body = json.dumps({"payload": {"job": "benchmark"}, "attempts": 0}).encode("utf-8")
+        pending = [client.create_async(f"{base_path}/queue/task-", body, sequence=True) for _ in range(tasks)]
+        for result in pending:
+            result.get(timeout=SETTINGS.zk_command_timeout * 4)
+        enqueue_seconds = time.perf_counter() - started
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            completed = sum(worker.snapshot()["succeeded"] for worker in workers)
+            if completed >= tasks:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        snapshots = [worker.snapshot() for worker in workers]
+        for worker in workers:
+            worker.stop()
+        try:
+            client.delete(base_path, recursive=True)
+        except Exception as exc:
+            logger.warning("Unable to clean up benchmark queue %s: %s", base_path, exc)
+
+    with latencies_lock:
+        claims = stats.summarize_latencies(claim_latencies)
+    return {
+        "tasks": tasks,
+        "completed": completed,
+        "timed_out": completed < tasks,
+        "workers": len(workers),
+        "concurrency": concurrency,
+        "task_duration_ms": task_duration_ms,
+        "enqueue_seconds": round(enqueue_seconds, 4),
+        "enqueue_per_second": round(tasks / enqueue_seconds, 2) if enqueue_seconds > 0 else 0.0,
+        "elapsed_seconds": round(elapsed, 4),
+        "tasks_per_second": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+        "claim_latency_ms": claims,
+        "per_worker": snapshots,
+    }
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from . import stats, zookeeper_utils
+from .config import get_settings
+
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+WATCH_TYPES = ("data", "child")
+
+
+class WatchFanoutBenchmark:
+    """Arm many watches across many sessions, mutate the watched znodes, time notifications.
+
+    Every znode under a throwaway ``workload/watch-<id>`` subtree is watched by
+    ``fanout`` sessions. Data watches fire on ``set``; child watches fire when a
+    child is created or deleted beneath the znode. Watches are one-shot, so each
+    callback re-arms with the matching ``*_async`` call without blocking kazoo's
+    event thread. Latency is measured from just before the mutation is sent to the
+    moment each session's callback runs.
+    """
+
+    def __init__(
+        self,
+        *,
+        sessions: int,
+        znodes: int,
+        fanout: int,
+        watch_types: List[str],
+        mutation_rate: float,
+        duration: float,
+        hosts: Optional[str] = None,
+    ) -> None:
+        self.watch_types = [kind for kind in WATCH_TYPES if kind in watch_types]
+        if not self.watch_types:
+            raise ValueError("at least one watch type is required")
+        self.sessions = sessions
+        self.znodes = znodes
+        self.fanout = max(1, min(fanout, sessions))
+        self.mutation_rate = mutation_rate
+        self.duration = duration
+        self.hosts = hosts or ",".join(SETTINGS.zk_nodes)
+        self.run_id = uuid4().hex[:8]
+        self.base_path = f"{SETTINGS.zk_root_path}/{zookeeper_utils.WORKLOAD_CHILD}/watch-{self.run_id}"
+        self.paths = [f"{self.base_path}/w{index:05d}" for index in range(znodes)]
+        self._clients: List[KazooClient] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sent: Dict[tuple, float] = {}
+        self._histograms = {kind: stats.LatencyHistogram() for kind in self.watch_types}
+        self._expected = {kind: 0 for kind in self.watch_types}
+        self._mutations = {kind: 0 for kind in self.watch_types}
+        self._rearm_errors = 0
+        self.watch_counts: Dict[str, Dict[str, Any]] = {}
+        self.state = "idle"
+        self.phase = "idle"
+        self.error: Optional[str] = None
+        self.setup_seconds = 0.0
+        self.measuring_since: Optional[float] = None
+        self.mutated_until: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def armed_watches(self) -> int:
+        return self.znodes * self.fanout * len(self.watch_types)
+
+    def start(self) -> None:
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, name=f"watch-bench-{self.run_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        from kazoo.client import KazooClient
+
+        writer = KazooClient(hosts=self.hosts, timeout=SETTINGS.zk_session_timeout)
+        try:
+            began = time.perf_counter()
+            self.phase = "setup"
+            writer.start(timeout=SETTINGS.zk_command_timeout * 2)
+            writer.ensure_path(self.base_path)
+            _wait_all([writer.create_async(path, b"0") for path in self.paths])
+            for _ in range(self.sessions):
+                if self._stopping.is_set():
+                    break
+                client = KazooClient(hosts=self.hosts, timeout=SETTINGS.zk_session_timeout)
+                client.start(timeout=SETTINGS.zk_command_timeout * 2)
+                self._clients.append(client)
+            self._arm_all()
+            self.setup_seconds = round(time.perf_counter() - began, 3)
+            self.watch_counts["armed"] = _sample_watch_counts()
+            self.phase = "mutating"
+            self._mutate(writer)
+            self.mutated_until = time.time()
+            # Give the tail of the notifications a moment to arrive.
+            time.sleep(min(1.0, SETTINGS.zk_command_timeout))
+            self.watch_counts["end"] = _sample_watch_counts()
+            self.state = "stopped" if self._stopping.is_set() else "finished"
+        except Exception as exc:
+            logger.exception("Watch fan-out benchmark %s failed: %s", self.run_id, exc)
+            self.state = "error"
+            self.error = str(exc)
+        finally:
+            self.phase = "cleanup"
+            self.finished_at = time.time()
+            for client in self._clients:
+                try:
+                    client.stop()
+                    client.close()
+                except Exception:
+                    pass
+            try:
+                if writer.connected:
+                    writer.delete(self.base_path, recursive=True)
+            except Exception as exc:
+                logger.warning("Unable to clean up watch znodes under %s: %s", self.base_path, exc)
+            writer.stop()
+            writer.close()
+            self.phase = "done"
+
+    def _arm_all(self) -> None:
+        pending = []
+        for index, path in enumerate(self.paths):
+            for offset in range(self.fanout):
+                client = self._clients[(index + offset) % len(self._clients)]
+                for kind in self.watch_types:
+                    pending.append(self._arm(client, kind, path))
+        _wait_all(pending)
+
+    def _arm(self, client: KazooClient, kind: str, path: str) -> Any:
+        watcher = self._watcher(client, kind)
+        if kind == "data":
+            return client.get_async(path, watch=watcher)
+        return client.get_children_async(path, watch=watcher)
+
+    def _watcher(self, client: KazooClient, kind: str) -> Callable[[Any], None]:
+        def on_event(event: Any) -> None:
+            received = time.perf_counter()
+            with self._lock:
+                sent = self._sent.get((kind, event.path))
+                if sent is not None:
+                    self._histograms[kind].record((received - sent) * 1_000_000)
+            if self._stopping.is_set() or self.phase != "mutating":
+                return
+            try:
+                self._arm(client, kind, event.path)
+            except Exception:
+                with self._lock:
+                    self._rearm_errors += 1
+
+        return on_event
+
+    def _mutate(self, writer: KazooClient) -> None:
+        rng = random.Random()
+        interval = 1.0 / self.mutation_rate
+        children: Dict[str, str] = {}
+        self.measuring_since = time.time()
+        deadline = time.perf_counter() + self.duration
+        next_at = time.perf_counter()
+        while not self._stopping.is_set() and time.perf_counter() < deadline:
+            now = time.perf_counter()
+            if next_at > now:
+                time.sleep(min(next_at - now, 0.01))
+                continue
+            path = rng.choice(self.paths)
+            kind = rng.choice(self.watch_types)
+            with self._lock:
+                self._sent[(kind, path)] = time.perf_counter()
+                self._mutations[kind] += 1
+                self._expected[kind] += self.fanout
+            if kind == "data":
+                writer.set_async(path, str(now).encode("utf-8"))
+            elif path in children:
+                writer.delete_async(children.pop(path))
+            else:
+                children[path] = f"{path}/c"
+                writer.create_async(children[path], b"")
+            next_at += interval
+            if now - next_at > 1.0:
+                next_at = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.mutated_until or self.finished_at or time.time()
+        elapsed = max(end - (self.measuring_since or end), 1e-9)
+        with self._lock:
+            per_type = {
+                kind: {
+                    "mutations": self._mutations[kind],
+                    "expected_notifications": self._expected[kind],
+                    "notifications": self._histograms[kind].count,
+                    "notifications_per_second": round(self._histograms[kind].count / elapsed, 2),
+                    "delivery_ratio": round(self._histograms[kind].count / self._expected[kind], 4) if self._expected[kind] else None,
+                    "latency_ms": self._histograms[kind].summary_ms(),
+                }
+                for kind in self.watch_types
+            }
+            rearm_errors = self._rearm_errors
+        return {
+            "run_id": self.run_id,
+            "state": self.state,
+            "phase": self.phase,
+            "error": self.error,
+            "sessions": self.sessions,
+            "connected_sessions": len(self._clients),
+            "znodes": self.znodes,
+            "fanout": self.fanout,
+            "watch_types": self.watch_types,
+            "armed_watches": self.armed_watches,
+            "mutation_rate": self.mutation_rate,
+            "duration": self.duration,
+            "setup_seconds": self.setup_seconds,
+            "elapsed_seconds": round(elapsed, 3),
+            "rearm_errors": rearm_errors,
+            "watch_counts": self.watch_counts,
+            "types": per_type,
+        }
+
+
+def _wait_all(pending: List[Any]) -> None:
+    for result in pending:
+        result.get(timeout=SETTINGS.zk_command_timeout * 4)
+
+
+def _sample_watch_counts() -> Dict[str, Any]:
+    counts: Dict[str, Any] = {}
+    for node in SETTINGS.zk_nodes:
+        try:
+            counts[node.split(":")[0]] = zookeeper_utils.get_node_metrics(node).get("zk_watch_count")
+        except Exception:
+            counts[node.split(":")[0]] = None
+    return counts
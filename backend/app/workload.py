@@ -4,13 +4,17 @@ import asyncio
 import json
 import logging
 import random
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
 from uuid import uuid4
 
-from . import db, storage, zookeeper_utils
+from . import db, file_locks, storage, task_queue, zookeeper_utils
 from .config import get_settings
 
+if TYPE_CHECKING:
+    from .jobs import Job
+
 logger = logging.getLogger(__name__)
 SETTINGS = get_settings()
 
@@ -20,7 +24,7 @@ class DemoWorkload:
 
     def __init__(self) -> None:
         self._running = False
-        self._workload_nodes: List[str] = []
+        self._workload_nodes: Deque[str] = deque()
         self._task: asyncio.Task | None = None
         self._lock = asyncio.Lock()
 
@@ -63,6 +67,32 @@ class DemoWorkload:
                 result["taskMessages"] = task_msgs
             return result
 
+    async def skew_files(self, node: str, count: int, *, size_kb: Optional[int] = None, job: Optional[Job] = None) -> Dict[str, Any]:
+        """Pile ``count`` new files onto one node so the scheduler has a hotspot to fix."""
+        allowed = {item.split(":")[0] for item in SETTINGS.zk_nodes}
+        if node not in allowed:
+            raise ValueError(f"未知节点 {node}")
+        async with self._lock:
+            return await asyncio.to_thread(self._skew_files, node, count, size_kb or SETTINGS.demo_workload_file_size_kb, job)
+
+    def _skew_files(self, node: str, count: int, size_kb: int, job: Optional[Job]) -> Dict[str, Any]:
+        created: List[Dict[str, Any]] = []
+        for _ in range(count):
+            if job is not None:
+                job.check_cancelled()
+            record = self._create_demo_file(node, size_kb, action="demo_stress")
+            created.append(record)
+            if job is not None:
+                job.advance(bytes_written=record["size"], message=f"{record['filename']} -> {node}")
+        # Repeated runs would otherwise grow without bound; only older files are trimmed.
+        trimmed: List[str] = []
+        files = db.get_files()
+        excess = len(files) - (SETTINGS.demo_workload_max_files + count)
+        for oldest in reversed(files[len(files) - excess:] if excess > 0 else []):
+            if self._remove_locked(oldest, f"Removed stale demo file {oldest['filename']} after stress run"):
+                trimmed.append(oldest["filename"])
+        return {"node": node, "created": created, "trimmed": trimmed}
+
     def _generate_files(self, count: int) -> List[str]:
         created: List[str] = []
         for _ in range(count):
@@ -95,60 +125,24 @@ class DemoWorkload:
             other_nodes = [n.split(":")[0] for n in SETTINGS.zk_nodes if n.split(":")[0] != victim["node"]]
             target_node = random.choice(other_nodes) if other_nodes else victim["node"]
             if target_node != victim["node"]:
-                new_path, new_node = storage.migrate_file(victim, target_node)
-                history = self._get_history(victim)
-                history.append({
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "action": "demo_migrate",
-                    "from": victim["node"],
-                    "to": new_node,
-                })
-                db.update_file_record(victim["id"], node=new_node, path=new_path, history=history)
-                zookeeper_utils.register_file_metadata(victim["uuid"], {
-                    "filename": victim["filename"],
-                    "size": victim["size_bytes"],
-                    "node": new_node,
-                    "path": new_path,
-                    "history": history,
-                    "updated_at": datetime.utcnow().isoformat(),
-                })
-                db.record_operation(
-                    action="demo_migrate",
-                    status="success",
-                    node=new_node,
-                    details=f"Synthetic migration {victim['filename']} -> {new_node}",
-                )
-                return f"{victim['filename']} -> {new_node}"
-            else:
-                oldest = files[-1]
-                storage.remove_file(oldest["path"])
-                db.delete_file_record(oldest["id"])
-                zookeeper_utils.delete_file_metadata(oldest["uuid"])
-                db.record_operation(
-                    action="demo_cleanup",
-                    status="success",
-                    node=oldest["node"],
-                    details=f"Removed stale demo file {oldest['filename']}",
-                )
+                return self._migrate_locked(victim, target_node)
+            oldest = files[-1]
+            if self._remove_locked(oldest, f"Removed stale demo file {oldest['filename']}"):
                 return f"Removed {oldest['filename']}"
+            return None
 
         if len(files) >= max_files:
             oldest = files[-1]
-            storage.remove_file(oldest["path"])
-            db.delete_file_record(oldest["id"])
-            zookeeper_utils.delete_file_metadata(oldest["uuid"])
-            db.record_operation(
-                action="demo_cleanup",
-                status="success",
-                node=oldest["node"],
-                details=f"Removed stale demo file {oldest['filename']} to create space",
-            )
+            self._remove_locked(oldest, f"Removed stale demo file {oldest['filename']} to create space")
+
+        record = self._create_demo_file(storage.select_target_node(), SETTINGS.demo_workload_file_size_kb, action="demo_upload")
+        return record["filename"]
 
-        node = storage.select_target_node()
-        path, size, file_uuid, filename = storage.create_demo_file(node, SETTINGS.demo_workload_file_size_kb)
+    def _create_demo_file(self, node: str, size_kb: int, *, action: str) -> Dict[str, Any]:
+        path, size, file_uuid, filename, content_hash = storage.create_demo_file(node, size_kb)
         history = [{
             "timestamp": datetime.utcnow().isoformat(),
-            "action": "demo_upload",
+            "action": action,
             "node": node,
         }]
         file_id = db.create_file_record(
@@ -158,7 +152,9 @@ class DemoWorkload:
             node=node,
             path=path,
             history=history,
+            content_hash=content_hash,
         )
+        replicas = storage.replicate_file(file_id, node, path, content_hash, size)
         payload = {
             "id": file_id,
             "uuid": file_uuid,
@@ -166,45 +162,106 @@ class DemoWorkload:
             "size": size,
             "node": node,
             "path": path,
+            "replicas": replicas,
             "history": history,
             "created_at": datetime.utcnow().isoformat(),
         }
         zookeeper_utils.register_file_metadata(file_uuid, payload)
         db.record_operation(
-            action="demo_upload",
+            action=action,
             status="success",
             node=node,
             details=f"Synthetic upload {filename} ({size} bytes) to {node}",
         )
-        return filename
+        return {"id": file_id, "filename": filename, "node": node, "size": size}
+
+    def _migrate_locked(self, victim: Dict[str, Any], target_node: str) -> Optional[str]:
+        # Synthetic activity never waits: a file that is already locked is skipped.
+        try:
+            with file_locks.file_lock(victim["uuid"], purpose="demo_migrate", timeout=0):
+                victim = file_locks.reload_if_unchanged(victim)
+                if victim is None:
+                    return None
+                new_path, new_node = storage.migrate_file(victim, target_node)
+                storage.drop_replica_on(victim["id"], new_node, new_path)
+                history = self._get_history(victim)
+                history.append({
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "action": "demo_migrate",
+                    "from": victim["node"],
+                    "to": new_node,
+                })
+                db.update_file_record(victim["id"], node=new_node, path=new_path, history=history)
+                zookeeper_utils.register_file_metadata(victim["uuid"], {
+                    "filename": victim["filename"],
+                    "size": victim["size_bytes"],
+                    "node": new_node,
+                    "path": new_path,
+                    "history": history,
+                    "updated_at": datetime.utcnow().isoformat(),
+                })
+        except (file_locks.FileLockTimeout, zookeeper_utils.ZooKeeperUnavailable) as exc:
+            logger.debug("Skipping demo migration of %s: %s", victim["filename"], exc)
+            return None
+        db.record_operation(
+            action="demo_migrate",
+            status="success",
+            node=new_node,
+            source_node=victim["node"],
+            details=f"Synthetic migration {victim['filename']} -> {new_node}",
+        )
+        return f"{victim['filename']} -> {new_node}"
+
+    def _remove_locked(self, record: Dict[str, Any], details: str) -> bool:
+        try:
+            with file_locks.file_lock(record["uuid"], purpose="demo_cleanup", timeout=0):
+                record = file_locks.reload_if_unchanged(record)
+                if record is None:
+                    return False
+                storage.remove_file(record["path"])
+                storage.remove_replicas(record["id"])
+                db.delete_file_record(record["id"])
+                zookeeper_utils.delete_file_metadata(record["uuid"])
+        except (file_locks.FileLockTimeout, zookeeper_utils.ZooKeeperUnavailable) as exc:
+            logger.debug("Skipping demo cleanup of %s: %s", record["filename"], exc)
+            return False
+        db.record_operation(
+            action="demo_cleanup",
+            status="success",
+            node=record["node"],
+            details=details,
+        )
+        return True
 
     def _pulse_znode_activity(self) -> Optional[str]:
         client = zookeeper_utils.get_kazoo_client()
-        base = f"{SETTINGS.zk_root_path}/workload"
+        base = f"{SETTINGS.zk_root_path}/{zookeeper_utils.WORKLOAD_CHILD}"
         client.ensure_path(base)
         znode_path = f"{base}/task-{uuid4().hex[:8]}"
         try:
-            client.create(znode_path, b"demo", makepath=True)
+            client.create_async(znode_path, b"demo").get(timeout=SETTINGS.zk_command_timeout)
             self._workload_nodes.append(znode_path)
         except Exception as exc:
             logger.debug("Unable to create workload znode %s: %s", znode_path, exc)
             return None
+        # Trim without waiting on each delete round trip.
         while len(self._workload_nodes) > SETTINGS.demo_workload_max_znodes:
-            old = self._workload_nodes.pop(0)
-            try:
-                client.delete(old)
-            except Exception:
-                pass
+            client.delete_async(self._workload_nodes.popleft())
         return znode_path
 
     def _simulate_task_workflow(self, force_create: bool = False) -> Optional[str]:
-        tasks = db.list_tasks(limit=SETTINGS.demo_workload_max_tasks + 20)
-        if len(tasks) > SETTINGS.demo_workload_max_tasks:
-            for record in tasks[SETTINGS.demo_workload_max_tasks :][::-1]:
-                if record["status"] in {"succeeded", "failed", "cancelled"}:
-                    db.delete_task(record["task_id"])
-        running = next((t for t in tasks if t["status"] == "running"), None)
-        queued = next((t for t in tasks if t["status"] == "queued"), None)
+        counts = db.count_tasks_by_status()
+        total = sum(counts.values())
+        if total > SETTINGS.demo_workload_max_tasks:
+            total -= db.delete_oldest_tasks(
+                {"succeeded", "failed", "cancelled"},
+                limit=total - SETTINGS.demo_workload_max_tasks,
+            )
+        if SETTINGS.task_queue_enabled:
+            # Real workers drive state transitions; the demo only feeds the queue.
+            return self._enqueue_queue_task(counts, force_create)
+        running = next(iter(db.list_tasks_by_status("running", limit=1)), None)
+        queued = next(iter(db.list_tasks_by_status("queued", limit=1)), None)
 
         def parse_payload(task: Dict[str, Any]) -> Any:
             payload = task.get("payload")
@@ -237,7 +294,7 @@ class DemoWorkload:
             db.record_operation(action="demo_task", status="running", node=node, details=f"Task {task_id} is running")
             return f"Task {task_id} is running"
 
-        if force_create or (len(tasks) < SETTINGS.demo_workload_max_tasks and random.random() < 0.6):
+        if force_create or (total < SETTINGS.demo_workload_max_tasks and random.random() < 0.6):
             node = random.choice([n.split(":")[0] for n in SETTINGS.zk_nodes])
             task_id = f"demo-task-{uuid4().hex[:8]}"
             payload = {
@@ -255,6 +312,24 @@ class DemoWorkload:
 
         return None
 
+    def _enqueue_queue_task(self, counts: Dict[str, int], force_create: bool) -> Optional[str]:
+        active = counts.get("queued", 0) + counts.get("running", 0)
+        if not force_create and (active >= SETTINGS.demo_workload_max_tasks or random.random() >= 0.6):
+            return None
+        payload = {
+            "job": random.choice(["ETL", "Backup", "Report", "Sync"]),
+            "size": random.randint(1, 10),
+            "duration": round(random.uniform(0.5, 3.0), 2),
+            "fail_rate": 0.15,
+        }
+        queued = task_queue.enqueue_task(payload)
+        db.record_operation(
+            action="demo_task",
+            status="queued",
+            details=f"Enqueued task {queued['task_id']} at {queued['znode']}",
+        )
+        return f"Enqueued task {queued['task_id']}"
+
     def stop_auto(self) -> None:
         self._running = False
         if self._task and not self._task.done():
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import heapq
+import json
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from .config import get_settings
+
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+SETTINGS = get_settings()
+
+K = TypeVar("K")
+
+# Simulated wall time allowed per benchmark pass; longer passes read a prefix of
+# the znodes and extrapolate, since the stand-in answers at a steady rate.
+PASS_BUDGET_SECONDS = 5.0
+
+
+def pipeline(
+    submit: Callable[[K], Any],
+    keys: Iterable[K],
+    *,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Iterator[Tuple[K, Any]]:
+    """Issue ``submit(key)`` for every key with at most ``concurrency`` in flight.
+
+    ``submit`` returns a kazoo async result (``get_async``, ``exists_async``...).
+    Results are yielded as ``(key, value)`` in key order while later requests are
+    still outstanding; a session answers in request order, so waiting on the
+    oldest one costs nothing. Nodes that vanished meanwhile yield ``None``; any
+    other error is raised. Stopping iteration early leaves at most one window of
+    requests unread.
+    """
+    from kazoo.exceptions import NoNodeError
+
+    limit = max(concurrency or SETTINGS.zk_bulk_concurrency, 1)
+    timeout = timeout or SETTINGS.zk_command_timeout * 4
+    window: Deque[Tuple[K, Any]] = deque()
+
+    def settle() -> Tuple[K, Any]:
+        key, result = window.popleft()
+        try:
+            return key, result.get(timeout=timeout)
+        except NoNodeError:
+            return key, None
+
+    for key in keys:
+        if len(window) >= limit:
+            yield settle()
+        window.append((key, submit(key)))
+    while window:
+        yield settle()
+
+
+def read_children(
+    client: KazooClient,
+    parent: str,
+    names: Optional[Sequence[str]] = None,
+    *,
+    skip: Iterable[str] = (),
+    concurrency: Optional[int] = None,
+) -> Iterator[Tuple[str, bytes, Any]]:
+    """Stream ``(name, data, stat)`` for the children of ``parent``.
+
+    Children deleted between listing and reading are left out.
+    """
+    if names is None:
+        names = client.get_children(parent)
+    skipped = set(skip)
+    wanted = (name for name in names if name not in skipped)
+    for name, value in pipeline(lambda name: client.get_async(f"{parent}/{name}"), wanted, concurrency=concurrency):
+        if value is not None:
+            data, stat = value
+            yield name, data, stat
+
+
+def decode_metadata(data: Optional[bytes]) -> Dict[str, Any]:
+    try:
+        return json.loads(data.decode("utf-8")) if data else {}
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return {"raw": data.decode("utf-8", errors="ignore")}
+
+
+class _LocalResult:
+    """Just enough of kazoo's IAsyncResult for pipeline() and serial get()."""
+
+    def __init__(self) -> None:
+        self._done = threading.Event()
+        self._value: Any = None
+        self._exception: Optional[BaseException] = None
+
+    def _set(self, value: Any, exception: Optional[BaseException]) -> None:
+        self._value, self._exception = value, exception
+        self._done.set()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("local stand-in did not answer")
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
+class _LocalStat:
+    def __init__(self, created: float) -> None:
+        self.mtime = int(created * 1000)
+        self.version = 0
+
+
+class LocalZooKeeper:
+    """In-process stand-in for one ZooKeeper session, for read benchmarks.
+
+    Each request reaches the server ``rtt_ms / 2`` after it is sent, waits for the
+    single request processor (``service_us`` per read, FIFO like a real session)
+    and its reply arrives another ``rtt_ms / 2`` later. Serial reads therefore pay
+    the whole round trip each time while pipelined ones overlap it, which is the
+    effect the benchmark measures.
+    """
+
+    def __init__(self, *, rtt_ms: float, service_us: float) -> None:
+        self.rtt = rtt_ms / 1000.0
+        self.service = service_us / 1_000_000.0
+        self.nodes: Dict[str, Tuple[bytes, Any]] = {}
+        self._queue: List[Tuple[float, int, _LocalResult, Any]] = []
+        self._sequence = 0
+        self._server_free_at = 0.0
+        self._lock = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._deliver, name="local-zk", daemon=True)
+        self._thread.start()
+
+    def create(self, path: str, data: bytes) -> None:
+        self.nodes[path] = (data, _LocalStat(time.time()))
+
+    def get_children(self, parent: str) -> List[str]:
+        prefix = f"{parent}/"
+        return [path[len(prefix):] for path in self.nodes if path.startswith(prefix)]
+
+    def get_async(self, path: str) -> _LocalResult:
+        from kazoo.exceptions import NoNodeError
+
+        result = _LocalResult()
+        now = time.perf_counter()
+        with self._lock:
+            start = max(now + self.rtt / 2, self._server_free_at)
+            self._server_free_at = start + self.service
+            node = self.nodes.get(path)
+            outcome = (node, None) if node is not None else (None, NoNodeError(path))
+            self._sequence += 1
+            heapq.heappush(self._queue, (self._server_free_at + self.rtt / 2, self._sequence, result, outcome))
+            self._lock.notify()
+        return result
+
+    def get(self, path: str) -> Tuple[bytes, Any]:
+        return self.get_async(path).get(timeout=SETTINGS.zk_command_timeout * 4)
+
+    def _deliver(self) -> None:
+        with self._lock:
+            while not self._stopping:
+                if not self._queue:
+                    self._lock.wait()
+                    continue
+                due = self._queue[0][0] - time.perf_counter()
+                if due > 0:
+                    self._lock.wait(due)
+                    continue
+                _, _, result, (value, exception) = heapq.heappop(self._queue)
+                result._set(value, exception)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+
+
+def benchmark(
+    *, znodes: int, concurrency: Sequence[int], rtt_ms: float, service_us: float, payload_bytes: int = 256
+) -> Dict[str, Any]:
+    """Read ``znodes`` children serially (one blocking get each, the old
+    list_registered_files) and pipelined at each concurrency level.
+
+    A pass that would take longer than ``PASS_BUDGET_SECONDS`` of simulated time
+    (serial reads cost a full round trip each) reads only as many znodes as fit
+    in the budget; its rate is measured on those and ``estimated_seconds`` is the
+    time the whole set would take.
+    """
+    server = LocalZooKeeper(rtt_ms=rtt_ms, service_us=service_us)
+    parent = "/bench"
+    try:
+        payload = json.dumps({"filename": "x" * max(payload_bytes - 16, 0)}).encode("utf-8")
+        for index in range(znodes):
+            server.create(f"{parent}/{index:08d}", payload)
+        names = server.get_children(parent)
+        results: Dict[str, Dict[str, Any]] = {}
+
+        sample = names[: _pass_size(znodes, 1, server)]
+        began = time.perf_counter()
+        for name in sample:
+            data, _ = server.get(f"{parent}/{name}")
+            decode_metadata(data)
+        results["serial"] = _rate(len(sample), time.perf_counter() - began, znodes)
+
+        for level in concurrency:
+            sample = names[: _pass_size(znodes, level, server)]
+            began = time.perf_counter()
+            read = 0
+            for _, data, _ in read_children(server, parent, sample, concurrency=level):
+                decode_metadata(data)
+                read += 1
+            results[f"pipelined_{level}"] = _rate(read, time.perf_counter() - began, znodes)
+    finally:
+        server.stop()
+    serial = results["serial"]["reads_per_second"]
+    for result in results.values():
+        result["speedup"] = round(result["reads_per_second"] / serial, 2) if serial else None
+    return {"znodes": znodes, "rtt_ms": rtt_ms, "service_us": service_us, "results": results}
+
+
+def _pass_size(znodes: int, concurrency: int, server: LocalZooKeeper) -> int:
+    # Each read holds the server for `service` and overlaps its round trip with
+    # the other requests in flight.
+    per_read = max(server.service, (server.rtt + server.service) / concurrency)
+    if per_read <= 0:
+        return znodes
+    return min(znodes, max(1, int(PASS_BUDGET_SECONDS / per_read)))
+
+
+def _rate(count: int, seconds: float, total: int) -> Dict[str, Any]:
+    seconds = max(seconds, 1e-9)
+    rate = count / seconds
+    return {
+        "reads": count,
+        "sampled": count < total,
+        "seconds": round(seconds, 4),
+        "reads_per_second": round(rate, 1),
+        "estimated_seconds": round(total / rate, 4) if rate else None,
+    }
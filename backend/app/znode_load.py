@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from uuid import uuid4
+
+from . import stats, zookeeper_utils
+from .config import get_settings
+
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+logger = logging.getLogger(__name__)
+SETTINGS = get_settings()
+
+OPERATIONS = ("create", "get", "set", "delete", "exists")
+DEFAULT_MIX = {"create": 20, "get": 40, "set": 20, "delete": 10, "exists": 10}
+PREFILL_BATCH = 500
+
+
+class KeySpace:
+    """Live znode names with O(1) random pick and removal (swap-remove)."""
+
+    def __init__(self) -> None:
+        self._items: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, name: str) -> None:
+        if name not in self._positions:
+            self._positions[name] = len(self._items)
+            self._items.append(name)
+
+    def discard(self, name: str) -> None:
+        position = self._positions.pop(name, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def pick(self, rng: random.Random) -> Optional[str]:
+        return self._items[rng.randrange(len(self._items))] if self._items else None
+
+
+class ZnodeLoadGenerator:
+    """Open-loop znode load at a target rate using kazoo's *_async calls.
+
+    A pacing thread issues one operation every 1/rate seconds while fewer than
+    ``concurrency`` requests are in flight; completions are timed in kazoo's
+    callback thread into one LatencyHistogram per operation type.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: int,
+        duration: float,
+        mix: Optional[Dict[str, int]] = None,
+        payload_bytes: int = 128,
+        concurrency: int = 64,
+        prefill: int = 200,
+        hosts: Optional[str] = None,
+    ) -> None:
+        self.rate = rate
+        self.duration = duration
+        self.mix = {op: weight for op, weight in (mix or DEFAULT_MIX).items() if op in OPERATIONS and weight > 0}
+        if not self.mix:
+            raise ValueError("operation mix has no positive weights")
+        self.payload = os.urandom(payload_bytes)
+        self.concurrency = concurrency
+        self.prefill = prefill
+        self.hosts = hosts or ",".join(SETTINGS.zk_nodes)
+        self.run_id = uuid4().hex[:8]
+        self.base_path = f"{SETTINGS.zk_root_path}/{zookeeper_utils.WORKLOAD_CHILD}/load-{self.run_id}"
+        self._rng = random.Random()
+        self._keys = KeySpace()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._histograms = {op: stats.LatencyHistogram() for op in OPERATIONS}
+        self._errors = {op: 0 for op in OPERATIONS}
+        self._issued = 0
+        self._saturated = 0
+        self._sequence = 0
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.measuring_since: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> None:
+        self.state = "running"
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"znode-load-{self.run_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        from kazoo.client import KazooClient
+
+        client = KazooClient(hosts=self.hosts, timeout=SETTINGS.zk_session_timeout)
+        try:
+            client.start(timeout=SETTINGS.zk_command_timeout * 2)
+            client.ensure_path(self.base_path)
+            self._prefill(client)
+            self._drive(client)
+            self.state = "stopped" if self._stopping.is_set() else "finished"
+        except Exception as exc:
+            logger.exception("Znode load run %s failed: %s", self.run_id, exc)
+            self.state = "error"
+            self.error = str(exc)
+        finally:
+            self.finished_at = time.time()
+            try:
+                if client.connected:
+                    client.delete(self.base_path, recursive=True)
+            except Exception as exc:
+                logger.warning("Unable to clean up load znodes under %s: %s", self.base_path, exc)
+            client.stop()
+            client.close()
+
+    def _next_name(self) -> str:
+        self._sequence += 1
+        return f"n{self._sequence:09d}"
+
+    def _prefill(self, client: KazooClient) -> None:
+        remaining = self.prefill
+        while remaining > 0 and not self._stopping.is_set():
+            batch = [self._next_name() for _ in range(min(PREFILL_BATCH, remaining))]
+            pending = [client.create_async(f"{self.base_path}/{name}", self.payload) for name in batch]
+            for name, result in zip(batch, pending):
+                result.get(timeout=SETTINGS.zk_command_timeout * 4)
+                self._keys.add(name)
+            remaining -= len(batch)
+
+    def _choose(self) -> str:
+        ops = list(self.mix)
+        op = self._rng.choices(ops, weights=[self.mix[item] for item in ops])[0]
+        # Reads and deletes need an existing node; fall back to create when empty.
+        if op != "create" and not len(self._keys):
+            return "create"
+        return op
+
+    def _drive(self, client: KazooClient) -> None:
+        interval = 1.0 / self.rate
+        self.measuring_since = time.time()
+        deadline = time.perf_counter() + self.duration
+        next_at = time.perf_counter()
+        while not self._stopping.is_set():
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if next_at > now:
+                time.sleep(min(next_at - now, 0.01))
+                continue
+            if not self._slots.acquire(blocking=False):
+                self._saturated += 1
+                self._slots.acquire()
+            self._issue(client)
+            next_at += interval
+            # Don't try to "catch up" a long stall with a burst.
+            if now - next_at > 1.0:
+                next_at = now
+        # Let in-flight requests drain so their latencies are counted.
+        for _ in range(self.concurrency):
+            self._slots.acquire(timeout=SETTINGS.zk_command_timeout * 4)
+
+    def _issue(self, client: KazooClient) -> None:
+        with self._lock:
+            op = self._choose()
+            if op == "create":
+                name = self._next_name()
+            else:
+                name = self._keys.pick(self._rng)
+                if op == "delete":
+                    self._keys.discard(name)
+            self._issued += 1
+        path = f"{self.base_path}/{name}"
+        began = time.perf_counter()
+        if op == "create":
+            result = client.create_async(path, self.payload)
+        elif op == "get":
+            result = client.get_async(path)
+        elif op == "set":
+            result = client.set_async(path, self.payload)
+        elif op == "delete":
+            result = client.delete_async(path)
+        else:
+            result = client.exists_async(path)
+
+        def done(async_result: Any) -> None:
+            elapsed_us = (time.perf_counter() - began) * 1_000_000
+            ok = async_result.successful()
+            with self._lock:
+                self._histograms[op].record(elapsed_us)
+                if not ok:
+                    self._errors[op] += 1
+                elif op == "create":
+                    self._keys.add(name)
+            self._slots.release()
+
+        result.rawlink(done)
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = max(end - (self.measuring_since or end), 1e-9)
+        with self._lock:
+            operations = {}
+            total = stats.LatencyHistogram()
+            for op in OPERATIONS:
+                histogram = self._histograms[op]
+                if not histogram.count and op not in self.mix:
+                    continue
+                total.merge(histogram)
+                operations[op] = {
+                    "ops_per_second": round(histogram.count / elapsed, 2),
+                    "errors": self._errors[op],
+                    "latency_ms": histogram.summary_ms(),
+                }
+            live_keys = len(self._keys)
+        return {
+            "run_id": self.run_id,
+            "state": self.state,
+            "error": self.error,
+            "target_rate": self.rate,
+            "duration": self.duration,
+            "concurrency": self.concurrency,
+            "payload_bytes": len(self.payload),
+            "mix": self.mix,
+            "elapsed_seconds": round(elapsed, 3),
+            "issued": self._issued,
+            "completed": total.count,
+            "ops_per_second": round(total.count / elapsed, 2),
+            "saturated": self._saturated,
+            "live_znodes": live_keys,
+            "latency_ms": total.summary_ms(),
+            "operations": operations,
+        }
@@ -1,33 +1,226 @@
 from __future__ import annotations
 
 import json
+import logging
 import socket
+import threading
 import time
+from collections import OrderedDict
 from contextlib import closing
-from typing import Any, Dict, List, Optional
-
-from kazoo.client import KazooClient
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
 
+from . import node_health, zk_bulk
 from .config import get_settings
 
+if TYPE_CHECKING:
+    from kazoo.client import KazooClient
+
+logger = logging.getLogger(__name__)
 SETTINGS = get_settings()
+# Children of zk_root_path used for coordination rather than file metadata.
+WORKLOAD_CHILD = "workload"
+TASKS_CHILD = "tasks"
+ELECTION_CHILD = "owner-election"
+LOCKS_CHILD = "locks"
+CONFIG_CHILD = "runtime-config"
+RESERVED_CHILDREN = {WORKLOAD_CHILD, TASKS_CHILD, ELECTION_CHILD, LOCKS_CHILD, CONFIG_CHILD}
+NODE_HEALTH = node_health.NodeHealthTracker(
+    down_after=SETTINGS.zk_command_retries,
+    base_backoff=SETTINGS.node_health_base_backoff,
+    max_backoff=SETTINGS.node_health_max_backoff,
+)
 _KAZOO_CLIENT: Optional[KazooClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+# Connection state as reported by kazoo's listener: CONNECTING until the first
+# session is established, then CONNECTED / SUSPENDED / LOST.
+SESSION_STATES = ("CONNECTING", "CONNECTED", "SUSPENDED", "LOST")
+_SESSION: Dict[str, Any] = {
+    "state": "CONNECTING",
+    "since": time.time(),
+    "connects": 0,
+    "reconnects": 0,
+    "suspensions": 0,
+    "losses": 0,
+    "fast_failures": 0,
+    "replayed_writes": 0,
+    "dropped_writes": 0,
+}
+_SESSION_LOCK = threading.Lock()
+# Metadata writes issued while the session is down, keyed by znode so only the
+# latest value (or a delete) is replayed once the client reconnects.
+_PENDING_WRITES: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+_REPLAY_LOCK = threading.Lock()
+# Striped per-znode guards held from taking a write off the queue until it has been
+# applied, so a replay and a direct write to the same znode cannot interleave.
+_WRITE_GUARDS = [threading.Lock() for _ in range(64)]
+_SESSION_LISTENERS: List[Callable[[str], None]] = []
+
+
+class ZooKeeperUnavailable(RuntimeError):
+    """Raised instead of blocking when the shared session is not connected."""
+
+
+def _on_state_change(state: str) -> None:
+    # Called from kazoo's connection thread: record the transition and return.
+    with _SESSION_LOCK:
+        previous = _SESSION["state"]
+        if state == previous:
+            return
+        _SESSION["state"] = state
+        _SESSION["since"] = time.time()
+        if state == "CONNECTED":
+            _SESSION["connects"] += 1
+            if _SESSION["connects"] > 1:
+                _SESSION["reconnects"] += 1
+        elif state == "SUSPENDED":
+            _SESSION["suspensions"] += 1
+        elif state == "LOST":
+            _SESSION["losses"] += 1
+    logger.info("ZooKeeper session %s -> %s", previous, state)
+    for listener in list(_SESSION_LISTENERS):
+        try:
+            listener(state)
+        except Exception:
+            logger.exception("ZooKeeper session listener failed")
+    if state == "CONNECTED" and _PENDING_WRITES:
+        threading.Thread(target=replay_pending_writes, name="zk-replay", daemon=True).start()
+
 
+def get_kazoo_client(*, require_connected: bool = True) -> KazooClient:
+    """Return the shared client, raising ZooKeeperUnavailable while it is disconnected.
 
-def get_kazoo_client() -> KazooClient:
+    The client keeps reconnecting in the background, so callers never wait on a
+    suspended session; only the very first call waits (briefly) for a connection.
+    """
     global _KAZOO_CLIENT
-    if _KAZOO_CLIENT is None:
-        _KAZOO_CLIENT = KazooClient(hosts=",".join(SETTINGS.zk_nodes), timeout=SETTINGS.zk_command_timeout)
-        _KAZOO_CLIENT.start()
-    return _KAZOO_CLIENT
+    with _CLIENT_LOCK:
+        client = _KAZOO_CLIENT
+        if client is None:
+            from kazoo.client import KazooClient
+
+            client = KazooClient(
+                hosts=",".join(SETTINGS.zk_nodes),
+                timeout=SETTINGS.zk_session_timeout,
+                connection_retry={"max_tries": -1, "max_delay": 5},
+            )
+            client.add_listener(_on_state_change)
+            _KAZOO_CLIENT = client
+            client.start_async().wait(SETTINGS.zk_command_timeout)
+    if require_connected and session_state() != "CONNECTED":
+        with _SESSION_LOCK:
+            _SESSION["fast_failures"] += 1
+        raise ZooKeeperUnavailable(f"ZooKeeper session is {session_state()}")
+    return client
 
 
 def close_kazoo_client() -> None:
     global _KAZOO_CLIENT
-    if _KAZOO_CLIENT is not None:
-        _KAZOO_CLIENT.stop()
-        _KAZOO_CLIENT.close()
-        _KAZOO_CLIENT = None
+    with _CLIENT_LOCK:
+        client, _KAZOO_CLIENT = _KAZOO_CLIENT, None
+    if client is not None:
+        client.remove_listener(_on_state_change)
+        client.stop()
+        client.close()
+        with _SESSION_LOCK:
+            _SESSION["state"] = "CONNECTING"
+            _SESSION["since"] = time.time()
+
+
+def add_session_listener(listener: Callable[[str], None]) -> None:
+    """Call ``listener(state)`` on every session transition; it must not block."""
+    _SESSION_LISTENERS.append(listener)
+
+
+def session_state() -> str:
+    return _SESSION["state"]
+
+
+def session_snapshot() -> Dict[str, Any]:
+    with _SESSION_LOCK:
+        snapshot = dict(_SESSION)
+    snapshot["pending_writes"] = len(_PENDING_WRITES)
+    snapshot["state_age_seconds"] = round(time.time() - snapshot.pop("since"), 3)
+    return snapshot
+
+
+def _queue_write(znode: str, encoded: Optional[bytes]) -> None:
+    with _REPLAY_LOCK:
+        _PENDING_WRITES.pop(znode, None)
+        _PENDING_WRITES[znode] = encoded
+        dropped = 0
+        while len(_PENDING_WRITES) > SETTINGS.zk_pending_writes_limit:
+            _PENDING_WRITES.popitem(last=False)
+            dropped += 1
+    if dropped:
+        with _SESSION_LOCK:
+            _SESSION["dropped_writes"] += dropped
+        logger.warning("Dropped %s queued ZooKeeper writes (limit %s)", dropped, SETTINGS.zk_pending_writes_limit)
+
+
+def _apply_write(client: KazooClient, znode: str, encoded: Optional[bytes]) -> None:
+    from kazoo.exceptions import NodeExistsError, NoNodeError
+
+    path = f"{SETTINGS.zk_root_path}/{znode}"
+    if encoded is None:
+        try:
+            client.delete(path)
+        except NoNodeError:
+            pass
+        return
+    try:
+        client.set(path, encoded)
+    except NoNodeError:
+        try:
+            client.create(path, encoded, makepath=True)
+        except NodeExistsError:
+            client.set(path, encoded)
+
+
+def _write_guard(znode: str) -> threading.Lock:
+    return _WRITE_GUARDS[hash(znode) % len(_WRITE_GUARDS)]
+
+
+def _write_now(client: KazooClient, znode: str, encoded: Optional[bytes]) -> None:
+    # A direct write supersedes anything still waiting for replay.
+    with _write_guard(znode):
+        with _REPLAY_LOCK:
+            _PENDING_WRITES.pop(znode, None)
+        _apply_write(client, znode, encoded)
+
+
+def replay_pending_writes() -> int:
+    """Flush metadata writes queued while the session was down, oldest first."""
+    replayed = 0
+    while True:
+        try:
+            client = get_kazoo_client()
+        except ZooKeeperUnavailable:
+            break
+        with _REPLAY_LOCK:
+            if not _PENDING_WRITES:
+                break
+            znode = next(iter(_PENDING_WRITES))
+        with _write_guard(znode):
+            with _REPLAY_LOCK:
+                if znode not in _PENDING_WRITES:
+                    # A direct write took it while we waited for the guard.
+                    continue
+                encoded = _PENDING_WRITES.pop(znode)
+            try:
+                _apply_write(client, znode, encoded)
+            except Exception as exc:
+                logger.warning("Replaying ZooKeeper write for %s failed: %s", znode, exc)
+                with _REPLAY_LOCK:
+                    _PENDING_WRITES.setdefault(znode, encoded)
+                    _PENDING_WRITES.move_to_end(znode, last=False)
+                break
+        replayed += 1
+    if replayed:
+        with _SESSION_LOCK:
+            _SESSION["replayed_writes"] += replayed
+        logger.info("Replayed %s queued ZooKeeper writes", replayed)
+    return replayed
 
 
 def ensure_zk_paths() -> None:
@@ -75,24 +268,31 @@ def _coerce_value(value: str) -> Any:
         return value
 
 
+class NodeDownError(RuntimeError):
+    """A node is inside its probe backoff window; the cached failure is returned."""
+
+
 def get_node_metrics(node: str) -> Dict[str, Any]:
     host, port_str = node.split(":", 1)
     port = int(port_str)
-    attempt = 0
-    last_error: Optional[Exception] = None
-    while attempt <= SETTINGS.zk_command_retries:
-        try:
-            output = send_four_letter_cmd(host, port, "mntr")
-            metrics = parse_mntr_output(output)
-            metrics["node"] = host
-            metrics["endpoint"] = node
-            metrics.setdefault("timestamp", time.time())
-            return metrics
-        except Exception as exc:  # broad for retries
-            attempt += 1
-            last_error = exc
-            time.sleep(0.5)
-    raise RuntimeError(f"Failed to fetch mntr metrics from {node}: {last_error}")
+    if not NODE_HEALTH.should_probe(node):
+        raise NodeDownError(f"{node} is down: {NODE_HEALTH.last_error(node)}")
+    try:
+        if NODE_HEALTH.state(node) == node_health.DOWN:
+            # Cheap liveness check before paying for a full mntr round trip.
+            reply = send_four_letter_cmd(host, port, "ruok", timeout=SETTINGS.zk_probe_timeout)
+            if reply.strip() != "imok":
+                raise RuntimeError(f"ruok returned {reply.strip()!r}")
+        output = send_four_letter_cmd(host, port, "mntr")
+        metrics = parse_mntr_output(output)
+    except Exception as exc:
+        NODE_HEALTH.record_failure(node, str(exc))
+        raise RuntimeError(f"Failed to fetch mntr metrics from {node}: {exc}") from exc
+    NODE_HEALTH.record_success(node)
+    metrics["node"] = host
+    metrics["endpoint"] = node
+    metrics.setdefault("timestamp", time.time())
+    return metrics
 
 
 def get_cluster_status(nodes: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -104,6 +304,7 @@ def get_cluster_status(nodes: Optional[List[str]] = None) -> Dict[str, Any]:
             metrics = get_node_metrics(node)
             state = str(metrics.get("zk_server_state") or metrics.get("zk_server_state", "unknown"))
             metrics["state"] = state
+            metrics["health"] = NODE_HEALTH.state(node)
             if str(state).lower() == "leader":
                 leader = metrics.get("node")
             node_metrics.append(metrics)
@@ -113,6 +314,7 @@ def get_cluster_status(nodes: Optional[List[str]] = None) -> Dict[str, Any]:
                     "node": node.split(":", 1)[0],
                     "endpoint": node,
                     "state": "down",
+                    "health": NODE_HEALTH.state(node),
                     "error": str(exc),
                 }
             )
@@ -125,35 +327,36 @@ def get_cluster_status(nodes: Optional[List[str]] = None) -> Dict[str, Any]:
 
 
 def register_file_metadata(znode: str, payload: Dict[str, Any]) -> None:
-    client = get_kazoo_client()
+    """Write file metadata, queueing it for replay if the session is down."""
     encoded = json.dumps(payload).encode("utf-8")
-    path = f"{SETTINGS.zk_root_path}/{znode}"
-    if client.exists(path):
-        client.set(path, encoded)
-    else:
-        client.create(path, encoded, makepath=True)
+    try:
+        client = get_kazoo_client()
+    except ZooKeeperUnavailable:
+        _queue_write(znode, encoded)
+        return
+    _write_now(client, znode, encoded)
 
 
 def delete_file_metadata(znode: str) -> None:
-    client = get_kazoo_client()
-    path = f"{SETTINGS.zk_root_path}/{znode}"
-    if client.exists(path):
-        client.delete(path)
+    try:
+        client = get_kazoo_client()
+    except ZooKeeperUnavailable:
+        _queue_write(znode, None)
+        return
+    _write_now(client, znode, None)
 
 
-def list_registered_files() -> List[Dict[str, Any]]:
+def iter_registered_files() -> Iterator[Dict[str, Any]]:
+    """Stream file metadata znodes, read with pipelined get_async calls."""
     client = get_kazoo_client()
     if not client.exists(SETTINGS.zk_root_path):
-        return []
-    entries: List[Dict[str, Any]] = []
-    for child in client.get_children(SETTINGS.zk_root_path):
-        path = f"{SETTINGS.zk_root_path}/{child}"
-        data, stat = client.get(path)
-        try:
-            payload = json.loads(data.decode("utf-8")) if data else {}
-        except json.JSONDecodeError:
-            payload = {"raw": data.decode("utf-8", errors="ignore")}
-        payload["znode"] = path
+        return
+    for child, data, stat in zk_bulk.read_children(client, SETTINGS.zk_root_path, skip=RESERVED_CHILDREN):
+        payload = zk_bulk.decode_metadata(data)
+        payload["znode"] = f"{SETTINGS.zk_root_path}/{child}"
         payload["mtime"] = stat.mtime / 1000.0
-        entries.append(payload)
-    return entries
+        yield payload
+
+
+def list_registered_files() -> List[Dict[str, Any]]:
+    return list(iter_registered_files())
@@ -56,4 +56,11 @@ export const computedDefinitions = {
     });
     return cards;
   },
+  watchBenchRunning() {
+    return this.watchBench?.state === 'running';
+  },
+  watchBenchPhaseLabel() {
+    const labels = { setup: '注册 watch 中…', mutating: '修改中…', cleanup: '清理中…' };
+    return labels[this.watchBench?.phase] || '运行中…';
+  },
 };
@@ -1,6 +1,7 @@
 export function mountedHook() {
   this.initChart();
   this.refreshAll();
+  this.refreshWatchBench();
   this._autoRefreshTimer = setInterval(() => this.refreshAll(), 8000);
 }
 
@@ -9,4 +10,5 @@ export function beforeUnmountHook() {
     clearInterval(this._autoRefreshTimer);
     this._autoRefreshTimer = null;
   }
+  clearTimeout(this._watchBenchTimer);
 }
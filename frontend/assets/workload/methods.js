@@ -22,6 +22,7 @@ export const methodDefinitions = {
       demo_migrate: '演示迁移',
       bulk_upload_batch: '批量上传',
       stress_upload: '热点制造',
+      demo_stress: '热点制造',
       stop: '停止节点',
       start: '启动节点',
       restart: '重启节点',
@@ -29,7 +30,8 @@ export const methodDefinitions = {
       undrain: '恢复节点',
       demo_task: '演示任务',
       demo_upload: '演示上传',
-      demo_cleanup: '清理文件'
+      demo_cleanup: '清理文件',
+      runtime_config: '在线配置'
     };
     return labels[action] || action;
   },
@@ -682,10 +684,9 @@ export const methodDefinitions = {
     this.stressLoading = true;
     this.stressMessage = '';
     try {
-      const res = await fetchJson(`${API_BASE}/demo/stress`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(this.stressForm),
+      const res = await this.runJob('/demo/stress', this.stressForm, (job) => {
+        this.stressJob = job;
+        this.stressMessage = this.jobProgressText(job);
       });
       const created = res?.result?.created?.length || 0;
       const trimmed = res?.result?.trimmed?.length || 0;
@@ -713,6 +714,7 @@ export const methodDefinitions = {
     } catch (err) {
       this.stressMessage = `执行失败：${err.message}`;
     } finally {
+      this.stressJob = null;
       this.stressLoading = false;
     }
   },
@@ -737,10 +739,10 @@ export const methodDefinitions = {
     this.bulkMessage = '';
     try {
       const payload = { ...this.bulkForm };
-      const res = await fetchJson(`${API_BASE}/files/bulk-generate`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
+      const res = await this.runJob('/files/bulk-generate', payload, (job) => {
+        this.bulkJob = job;
+        this.bulkProgress = job.percent;
+        this.bulkProgressText = this.jobProgressText(job);
       });
       const parts = [`新增 ${res.created_count || 0} 个文件`];
       if (res.per_node_created) {
@@ -774,6 +776,7 @@ export const methodDefinitions = {
     } catch (err) {
       this.bulkMessage = `执行失败：${err.message}`;
     } finally {
+      this.bulkJob = null;
       this.bulkLoading = false;
     }
   },
@@ -853,17 +856,9 @@ export const methodDefinitions = {
     this.bulkLoading = true;
     this.bulkMessage = '';
     this.bulkProgress = 0;
-    this.bulkProgressText = '准备生成文件...';
+    this.bulkProgressText = '正在提交任务...';
 
     try {
-      // 模拟进度更新
-      this.bulkProgress = 10;
-      this.bulkProgressText = '正在连接服务器...';
-      await new Promise(resolve => setTimeout(resolve, 200));
-
-      this.bulkProgress = 30;
-      this.bulkProgressText = '正在生成 50 个测试文件...';
-
       const payload = {
         count: 50,
         size_kb: Math.floor(Math.random() * 400) + 100, // 100-500KB 随机大小
@@ -871,19 +866,12 @@ export const methodDefinitions = {
         trigger_scheduler: false,
       };
 
-      this.bulkProgress = 50;
-      this.bulkProgressText = '正在上传文件到 ZooKeeper 集群...';
-
-      const res = await fetchJson(`${API_BASE}/files/bulk-generate`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
+      const res = await this.runJob('/files/bulk-generate', payload, (job) => {
+        this.bulkJob = job;
+        this.bulkProgress = job.percent;
+        this.bulkProgressText = this.jobProgressText(job);
       });
 
-      this.bulkProgress = 80;
-      this.bulkProgressText = '正在分配文件到各节点...';
-      await new Promise(resolve => setTimeout(resolve, 300));
-
       this.bulkProgress = 100;
       this.bulkProgressText = '✅ 生成完成！';
 
@@ -910,6 +898,7 @@ export const methodDefinitions = {
       this.bulkMessage = `❌ 生成失败：${err.message}`;
       this.bulkProgressText = '❌ 生成失败';
     } finally {
+      this.bulkJob = null;
       // 延迟隐藏进度条，让用户看到完成状态
       setTimeout(() => {
         this.bulkLoading = false;
@@ -918,6 +907,79 @@ export const methodDefinitions = {
       }, 1000);
     }
   },
+  async runJob(path, body, onProgress) {
+    // 批量操作在后台任务中执行，请求只负责提交，进度通过事件流（或轮询）获取
+    const job = await fetchJson(`${API_BASE}${path}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body),
+    });
+    onProgress(job);
+    const final = await this.followJob(job, onProgress);
+    if (final.state === 'cancelled') {
+      throw new Error(`任务已取消（已完成 ${final.done}/${final.total}）`);
+    }
+    if (final.state !== 'succeeded') {
+      throw new Error(final.error || '任务失败');
+    }
+    return final.result;
+  },
+  followJob(job, onProgress) {
+    const finished = snapshot => ['succeeded', 'failed', 'cancelled'].includes(snapshot.state);
+    return new Promise((resolve, reject) => {
+      const poll = async () => {
+        try {
+          const snapshot = await fetchJson(`${API_BASE}/jobs/${job.id}`);
+          onProgress(snapshot);
+          if (finished(snapshot)) {
+            resolve(snapshot);
+          } else {
+            setTimeout(poll, 1000);
+          }
+        } catch (err) {
+          reject(err);
+        }
+      };
+      if (typeof EventSource === 'undefined') {
+        poll();
+        return;
+      }
+      const source = new EventSource(`${API_BASE}/jobs/${job.id}/events`);
+      source.onmessage = (event) => {
+        const snapshot = JSON.parse(event.data);
+        onProgress(snapshot);
+        if (finished(snapshot)) {
+          source.close();
+          resolve(snapshot);
+        }
+      };
+      // 事件流中断（代理不支持等）时退回到轮询
+      source.onerror = () => {
+        source.close();
+        poll();
+      };
+    });
+  },
+  async cancelJob(job) {
+    if (!job) return;
+    try {
+      await fetchJson(`${API_BASE}/jobs/${job.id}`, { method: 'DELETE' });
+    } catch (err) {
+      this.bulkMessage = `取消失败：${err.message}`;
+    }
+  },
+  jobProgressText(job) {
+    if (job.state === 'queued') return '排队等待执行...';
+    const phases = {
+      cancelling: '正在取消...',
+      'refreshing metrics': '正在刷新集群指标...',
+      'running scheduler': '正在执行调度...',
+    };
+    if (phases[job.message]) return phases[job.message];
+    const rate = job.items_per_second ? ` · ${job.items_per_second} 个/秒 · ${job.mb_per_second} MB/s` : '';
+    const eta = job.eta_seconds != null ? ` · 剩余约 ${Math.ceil(job.eta_seconds)} 秒` : '';
+    return `已生成 ${job.done}/${job.total} 个文件${rate}${eta}`;
+  },
   async uploadFile() {
     const input = this.$refs.uploadInput;
     if (!input || !input.files.length) return;
@@ -939,4 +1001,43 @@ export const methodDefinitions = {
       this.uploading = false;
     }
   },
+  async refreshWatchBench() {
+    try {
+      this.watchBench = await fetchJson(`${API_BASE}/workload/watch-bench`);
+    } catch (err) {
+      this.watchBench = null;
+    }
+    if (this.watchBenchRunning) {
+      this.scheduleWatchBenchPoll();
+    }
+  },
+  scheduleWatchBenchPoll() {
+    clearTimeout(this._watchBenchTimer);
+    this._watchBenchTimer = setTimeout(() => this.refreshWatchBench(), 1000);
+  },
+  async startWatchBench() {
+    if (!this.watchBenchForm.watch_types.length) {
+      this.watchBenchMessage = '请至少选择一种 watch 类型';
+      return;
+    }
+    this.watchBenchMessage = '';
+    try {
+      this.watchBench = await fetchJson(`${API_BASE}/workload/watch-bench`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(this.watchBenchForm),
+      });
+      this.scheduleWatchBenchPoll();
+    } catch (err) {
+      this.watchBenchMessage = `启动失败：${err.message}`;
+    }
+  },
+  async stopWatchBench() {
+    try {
+      this.watchBench = await fetchJson(`${API_BASE}/workload/watch-bench`, { method: 'DELETE' });
+      this.watchBenchMessage = '压测已停止';
+    } catch (err) {
+      this.watchBenchMessage = `停止失败：${err.message}`;
+    }
+  },
 };
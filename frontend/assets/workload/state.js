@@ -24,6 +24,8 @@ export function createInitialState() {
     uploadMessage: '',
     bulkProgress: 0,
     bulkProgressText: '',
+    bulkJob: null,
+    stressJob: null,
     schedulerProgress: 0,
     schedulerProgressText: '',
     chart: null,
@@ -42,6 +44,17 @@ export function createInitialState() {
     lastUpdateTime: '未更新',
     loadHistory: [],
     maxHistoryPoints: 20,
+    watchBenchForm: {
+      sessions: 20,
+      znodes: 200,
+      fanout: 10,
+      mutation_rate: 50,
+      duration_seconds: 30,
+      watch_types: ['data', 'child']
+    },
+    watchBench: null,
+    watchBenchMessage: '',
     _autoRefreshTimer: null,
+    _watchBenchTimer: null,
   };
 }